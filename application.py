@@ -1,36 +1,78 @@
 import datetime
+import itertools
 import json
+import os
+from typing import Iterable, Iterator, Optional
 
+import eventlog
+from checkpoint import Watermark, load_checkpoint, save_checkpoint
+from eventstore import EventStore
+from parallel import bill_in_parallel
 from contract import MTMContract, PrepaidContract, TermContract
 from customer import Customer
+from ledger import BillLedger
 from phoneline import PhoneLine
-from visualizer import Visualizer
+from registry import PhoneRegistry, registry_for, shared_registry
+from snapshot import load_snapshot, save_snapshot
 from call import Call
+from callhistory import CallHistory
 
 
-def import_data() -> dict[str, list[dict]]:
-    """ Open the file <dataset.json> which stores the json data, and return
-    a dictionary that stores this data in a format as described in the A1
-    handout.
+def import_data(path: str = "dataset.json") -> dict[str, list[dict]]:
+    """ Open the file <path> (<dataset.json> by default) which stores the json
+    data, and return a dictionary that stores this data in a format as
+    described in the A1 handout.
 
     Precondition: the dataset file must be in the json format.
     """
-    with open("dataset.json") as o:
+    with open(path) as o:
         log = json.load(o)
         return log
 
 
-def create_customers(log: dict[str, list[dict]]) -> list[Customer]:
+def import_customers(path: str = "dataset.json") -> dict[str, list[dict]]:
+    """ Return a dictionary that stores only the customers from the dataset
+    file <path>, in the same format as the one returned by import_data().
+
+    The file is read incrementally, so the events stored in it are never all
+    loaded into memory at once. Use it together with stream_events() to
+    process datasets which are too large for import_data().
+
+    Precondition: the dataset file must be in the json format.
+    """
+    return {'customers': list(eventlog.iter_array(path, 'customers'))}
+
+
+def stream_events(path: str = "dataset.json",
+                  buffer_size: int = eventlog.BUFFER_SIZE) -> Iterator[dict]:
+    """ Return an iterator over the events from the dataset file <path>, in
+    the order they are stored in the file. The file is read lazily, about
+    <buffer_size> characters at a time.
+
+    Precondition: the dataset file must be in the json format.
+    """
+    return eventlog.iter_array(path, 'events', buffer_size)
+
+
+def create_customers(log: dict[str, list[dict]],
+                     history: type[CallHistory] = CallHistory) \
+        -> list[Customer]:
     """ Returns a list of Customer instances for each customer from the input
     dataset from the dictionary <log>.
 
+    The phone lines record their calls in instances of <history>, e.g.
+    columnar.ColumnarCallHistory.
+
     Precondition:
     - The <log> dictionary contains the input data in the correct format,
     matching the expected input format described in the handout.
     """
+    registry = PhoneRegistry()
+    # the bills of all the phone lines are stored together
+    ledger = BillLedger()
     customer_list = []
     for cust in log['customers']:
-        customer = Customer(cust['id'])
+        customer = Customer(cust['id'], registry)
         for line in cust['lines']:
 
             contract = None
@@ -45,7 +87,7 @@ def create_customers(log: dict[str, list[dict]]) -> list[Customer]:
             else:
                 print("ERROR: unknown contract type")
 
-            line = PhoneLine(line['number'], contract)
+            line = PhoneLine(line['number'], contract, history(), ledger)
             customer.add_phone_line(line)
         customer_list.append(customer)
     return customer_list
@@ -57,19 +99,23 @@ def find_customer_by_number(number: str, customer_list: list[Customer]) \
     customers <customer_list>.
     If the number does not belong to any customer, return None.
     """
-    cust = None
+    registry = shared_registry(customer_list)
+    if registry is not None:
+        return registry.find_customer(number)
     for customer in customer_list:
         if number in customer:
-            cust = customer
-    return cust
+            return customer
+    return None
 
 
 def new_month(customer_list: list[Customer], month: int, year: int) -> None:
     """ Advance all customers in <customer_list> to a new month of their
     contract, as specified by the <month> and <year> arguments.
+
+    The phone lines are advanced lazily: each of them creates the bill for the
+    new month the next time it is used, or its bills are accessed.
     """
-    for cust in customer_list:
-        cust.new_month(month, year)
+    registry_for(customer_list).advance(month, year)
 
 
 def process_event_history(log: dict[str, list[dict]],
@@ -93,44 +139,238 @@ def process_event_history(log: dict[str, list[dict]],
     handout.
     - The <customer_list> already contains all the customers from the <log>.
     """
-    billing_date = datetime.datetime.strptime(log['events'][0]['time'],
-                                              "%Y-%m-%d %H:%M:%S")
-    billing_month = billing_date.month
-    # start recording the bills from this date
-    # Note: uncomment the following lines when you're ready to implement this
+    process_event_stream(log['events'], customer_list)
+
+
+def process_event_history_parallel(log: dict[str, list[dict]],
+                                   customer_list: list[Customer],
+                                   workers: Optional[int] = None) -> None:
+    """ Process the calls from the <log> dictionary exactly like
+    process_event_history(), but billing the customers in parallel, using
+    <workers> processes (as many as there are CPUs if <workers> is None).
+
+    Raise a ValueError if <workers> is not a positive number.
+
+    Preconditions: the same as for process_event_history().
+    """
+    bill_in_parallel(log['events'], customer_list, workers)
+
+
+def process_event_history_batch(log: dict[str, list[dict]],
+                                customer_list: list[Customer]) -> None:
+    """ Process the calls from the <log> dictionary like
+    process_event_history(), but billing all the calls of each month at once,
+    with batchbilling.BillingEngine.
+
+    The bills and contracts are identical to the ones of
+    process_event_history().
+
+    Preconditions: the same as for process_event_history().
+    """
+    # NumPy is only imported by the jobs which need it
+    from batchbilling import bill_in_batches
+
+    bill_in_batches(_decode_events(log['events']), customer_list)
+
+
+def process_event_stream(events: Iterable[dict],
+                         customer_list: list[Customer]) -> None:
+    """ Process the calls from <events>, in the same way as
+    process_event_history(), but consuming the events one at a time so that
+    <events> can be a generator such as the one returned by stream_events().
+    The bills for a month are complete as soon as the first event of the
+    next month has been consumed.
+
+    Preconditions:
+    - <events> satisfies the preconditions of the "events" list of the log
+    dictionary given to process_event_history().
+    - The <customer_list> already contains all the customers from <events>.
+    """
+    process_calls(_decode_events(events), customer_list)
+
+
+def process_new_events(path: str, customer_list: list[Customer],
+                       watermark: Watermark,
+                       buffer_size: int = eventlog.BUFFER_SIZE) -> None:
+    """ Process the events from the dataset file <path> which come after the
+    <watermark>, in the same way as process_event_stream(), and advance the
+    <watermark> past them.
+
+    The dataset file is an append-only event log, and <customer_list> is in
+    the state left by processing the events before the <watermark>: the file
+    is only read from the offset of the last processed event, so the events
+    before it are neither read nor processed again, and the customers are
+    advanced to a new month only when the month of the new events changes.
+
+    Raise a ValueError if the last event recorded by the <watermark> is not
+    at its offset in the file, e.g. if the log was rewritten instead of
+    appended to.
 
-    new_month(customer_list, billing_date.month, billing_date.year)
+    Preconditions:
+    - the dataset file must be in the json format, and its events satisfy the
+    preconditions of process_event_history().
+    - The <customer_list> already contains all the customers from the file.
+    """
+    entries = eventlog.iter_entries(path, 'events', watermark.offset,
+                                    buffer_size)
+    if watermark.offset is not None:
+        # the last processed event is read again, to check that it is still
+        # there: the offset may be anywhere in a rewritten log
+        _, last_event = next(entries, (None, None))
+        if not isinstance(last_event, dict) or last_event.get('time') != \
+                watermark.time.strftime(eventlog.TIME_FORMAT):
+            raise ValueError('the event log does not extend the processed '
+                             'events')
+
+    process_calls(_advance_watermark(entries, watermark), customer_list)
+
+
+def update_checkpoint(checkpoint_path: str, path: str = "dataset.json") \
+        -> list[Customer]:
+    """ Bring the checkpoint file <checkpoint_path> up to date with the events
+    of the dataset file <path>, and return its customers.
+
+    Only the events appended to the dataset since the checkpoint was saved are
+    processed. If there is no checkpoint yet, the customers are created from the
+    dataset and all of its events are processed.
+
+    Preconditions:
+    - the dataset file must be in the json format, and its events satisfy the
+    preconditions of process_event_history().
+    - the customers of the dataset have not changed since the checkpoint was
+    first created.
+    """
+    if os.path.exists(checkpoint_path):
+        customer_list, watermark = load_checkpoint(checkpoint_path)
+    else:
+        customer_list = create_customers(import_customers(path))
+        watermark = Watermark()
+    process_new_events(path, customer_list, watermark)
+    save_checkpoint(checkpoint_path, customer_list, watermark)
+    return customer_list
+
+
+def load_customers(snapshot_path: str, path: str = "dataset.json") \
+        -> list[Customer]:
+    """ Return the customers from the dataset file <path>, after processing
+    its event history.
 
-    for event_data in log['events']:
-        # check for a new month and advance
-        if billing_month != datetime.datetime.strptime(
-                event_data['time'], "%Y-%m-%d %H:%M:%S").month:
-            billing_month = datetime.datetime.strptime(
-                event_data['time'], "%Y-%m-%d %H:%M:%S").month
+    The customers are restored from the snapshot file <snapshot_path> when it
+    exists and is newer than the dataset. Otherwise the event history is
+    processed, and the resulting customers are saved into <snapshot_path> for
+    the next time.
 
-            new_month(customer_list, billing_month, billing_date.year)
+    Precondition: the dataset file must be in the json format.
+    """
+    if os.path.exists(snapshot_path) and \
+            os.path.getmtime(snapshot_path) >= os.path.getmtime(path):
+        try:
+            return load_snapshot(snapshot_path)
+        except ValueError:
+            # a snapshot from another version of the code, or corrupted:
+            # build it again below
+            pass
+
+    customer_list = create_customers(import_customers(path))
+    process_event_stream(stream_events(path), customer_list)
+    save_snapshot(snapshot_path, customer_list)
+    return customer_list
+
+
+def _advance_watermark(entries: Iterable[tuple[int, dict]],
+                       watermark: Watermark) \
+        -> Iterator[tuple[datetime.datetime, Optional[Call]]]:
+    """ Yield the events from <entries>, each in a tuple with its byte offset
+    in the log file, decoded as by _decode_events(), advancing the
+    <watermark> past each of them.
+    """
+    entries, events = itertools.tee(entries)
+    for (offset, _), event in zip(
+            entries, _decode_events(event for _, event in events)):
+        watermark.advance(event[0], offset)
+        yield event
+
+
+def process_event_store(store: EventStore,
+                        customer_list: list[Customer]) -> None:
+    """ Process the calls from the event <store>, in the same way as
+    process_event_history(), reading the events directly from the columns
+    of the store.
+
+    Preconditions:
+    - The events of <store> satisfy the preconditions of the "events" list of
+    the log dictionary given to process_event_history().
+    - The <customer_list> already contains all the customers from <store>.
+    """
+    process_calls(store.iter_events(), customer_list)
+
+
+def _decode_events(events: Iterable[dict]) \
+        -> Iterator[tuple[datetime.datetime, Optional[Call]]]:
+    """ Yield the date and time of each event from <events>, in a tuple with a
+    new Call object if the event is a call, or with None otherwise.
+    """
+    for event_data in events:
+        # decode the timestamp only once per event
+        time = eventlog.decode_timestamp(event_data['time'])
 
         # if the event is a call make a call object from the data
         if event_data["type"] == "call":
-            time = datetime.datetime.strptime(event_data['time'],
-                                              "%Y-%m-%d %H:%M:%S")
+            yield time, Call(event_data["src_number"],
+                             event_data["dst_number"],
+                             time, event_data["duration"],
+                             tuple(event_data["src_loc"]),
+                             tuple(event_data["dst_loc"]))
+        else:
+            yield time, None
+
 
-            call = Call(event_data["src_number"], event_data["dst_number"],
-                        time, event_data["duration"],
-                        tuple(event_data["src_loc"]),
-                        tuple(event_data["dst_loc"]))
+def process_calls(events: Iterable[tuple[datetime.datetime, Optional[Call]]],
+                  customer_list: list[Customer]) -> None:
+    """ Register the calls from <events> into the call history of the
+    customers from <customer_list>, advancing all customers to a new month
+    every time the month of an event changes.
 
+    Each event is a tuple containing its date and time, and the corresponding
+    Call object if the event is a call (None otherwise).
+
+    Preconditions:
+    - <events> are ordered chronologically, and there is no "gap" month
+    with zero events.
+    - The <customer_list> already contains all the customers from <events>.
+    """
+    events = iter(events)
+    first_event = next(events, None)
+    if first_event is None:
+        return
+
+    registry = registry_for(customer_list)
+    billing_date = first_event[0]
+    # start recording the bills from this date
+    billing_key = (billing_date.year, billing_date.month)
+    registry.advance(billing_date.month, billing_date.year)
+
+    for time, call in itertools.chain([first_event], events):
+        # check for a new month by comparing its (year, month) key with the
+        # current one
+        if billing_key != (time.year, time.month):
+            billing_key = (time.year, time.month)
+            registry.advance(time.month, time.year)
+
+        if call is not None:
             # register call into customer history (incoming/outgoing)
-            src_cust = find_customer_by_number(event_data["src_number"],
-                                               customer_list)
-            dst_cust = find_customer_by_number(event_data["dst_number"],
-                                               customer_list)
+            src_cust = registry.find_customer(call.src_number)
+            dst_cust = registry.find_customer(call.dst_number)
 
             src_cust.make_call(call)
             dst_cust.receive_call(call)
 
 
 if __name__ == '__main__':
+    # the GUI libraries are only loaded when the visualizer is started, so that
+    # the functions above can be used without them
+    from visualizer import Visualizer
+
     v = Visualizer()
     print("Toronto map coordinates:")
     print("  Lower-left corner: -79.697878, 43.576959")
@@ -180,8 +420,10 @@ if __name__ == '__main__':
 
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'json', 'datetime',
-            'visualizer', 'customer', 'call', 'contract', 'phoneline'
+            'python_ta', 'typing', 'json', 'datetime', 'itertools', 'os',
+            'batchbilling', 'checkpoint', 'eventlog', 'eventstore', 'parallel',
+            'registry', 'snapshot', 'visualizer', 'customer', 'ledger', 'call',
+            'callhistory', 'contract', 'phoneline'
         ],
         'allowed-io': [
             'create_customers', 'import_data'
@@ -0,0 +1,251 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the batch version of the billing of the event history.
+
+Instead of billing each call through Contract.bill_call, the BillingEngine
+bills a whole month at once: given the phone line and the duration of every
+call of the month, as arrays, it computes the fields of the bill of every
+phone line (minutes, rates, fixed costs, term deposits, and the carried
+balance and top-ups of the prepaid contracts) with NumPy, and only then
+stores the bills into the BillLedgers of the phone lines. The bills are
+identical to the ones created by Contract.new_month and Contract.bill_call:
+like them, the engine computes every amount of money exactly, in integer
+mills.
+"""
+import datetime
+from typing import Iterable, Optional
+
+import numpy as np
+
+from call import Call
+from contract import Contract, MTMContract, PrepaidContract, TermContract, \
+    MTM_MINS_COST, MTM_MONTHLY_FEE, PREPAID_MINS_COST, PREPAID_TOP_UP, \
+    PREPAID_TOP_UP_LIMIT, TERM_DEPOSIT, TERM_MINS, TERM_MINS_COST, \
+    TERM_MONTHLY_FEE
+from customer import Customer
+from ledger import BillLedger, LineBills
+from phoneline import PhoneLine
+from registry import registry_for
+
+# Codes of the contract types, and the type and rate of their bills
+_MTM = 0
+_TERM = 1
+_PREPAID = 2
+_CONTRACTS = [(MTMContract, 'mtm', MTM_MINS_COST),
+              (TermContract, 'term', TERM_MINS_COST),
+              (PrepaidContract, 'PREPAID', PREPAID_MINS_COST)]
+
+
+class BillingEngine:
+    """ The monthly billing of a group of phone lines, one month at a time.
+
+    The engine keeps the state of the contracts of the phone lines in arrays,
+    and writes the bills and the updated contracts back into the phone lines
+    after each month.
+    """
+    # === Private Attributes ===
+    # _bills:
+    #     the bills dictionary of each of the phone lines billed by this engine
+    # _groups:
+    #     the ledgers storing the bills of the phone lines, each with the
+    #     array of the indices of the phone lines whose bills it stores
+    # _contracts:
+    #     the contract of each of the phone lines
+    # _kinds:
+    #     the code of the contract type of each of the phone lines
+    # _starts:
+    #     the (year, month) starting date of the contract of each of the
+    #     phone lines, as year * 12 + month - 1
+    # _balances:
+    #     the balance of each prepaid contract, in mills (0 for the other
+    #     contracts)
+    # _has_bills:
+    #     whether each of the phone lines has a bill
+    # _last_costs:
+    #     the cost of the last bill of each of the phone lines, in mills (0 if
+    #     it has no bill)
+    _bills: list[LineBills]
+    _groups: list[tuple[BillLedger, np.ndarray]]
+    _contracts: list[Contract]
+    _kinds: np.ndarray
+    _starts: np.ndarray
+    _balances: np.ndarray
+    _has_bills: np.ndarray
+    _last_costs: np.ndarray
+
+    def __init__(self, lines: list[PhoneLine]) -> None:
+        """ Create an engine billing the phone <lines>, from the current state
+        of their contracts.
+
+        Raise a ValueError if the contract of one of the <lines> is not a
+        MTMContract, a TermContract or a PrepaidContract.
+        """
+        self._bills = [line.bills for line in lines]
+        groups = {}
+        for i, bills in enumerate(self._bills):
+            groups.setdefault(id(bills.ledger), (bills.ledger, []))[1].append(i)
+        self._groups = [(ledger, np.array(indices, dtype=np.intp))
+                        for ledger, indices in groups.values()]
+        self._contracts = [line.contract for line in lines]
+        kinds, starts, balances, last_costs = [], [], [], []
+        for line, contract in zip(lines, self._contracts):
+            for kind, (contract_type, _, _) in enumerate(_CONTRACTS):
+                if isinstance(contract, contract_type):
+                    kinds.append(kind)
+                    break
+            else:
+                raise ValueError(f'cannot bill the {type(contract).__name__} '
+                                 f'of {line.get_number()} in batches')
+            starts.append(contract.start.year * 12 + contract.start.month - 1)
+            balances.append(contract.balance if kinds[-1] == _PREPAID else 0)
+            last_costs.append(contract.bill.get_cost_mills() if contract.bill
+                              else 0)
+        self._kinds = np.array(kinds, dtype=np.int8)
+        self._starts = np.array(starts, dtype=np.int64)
+        self._balances = np.array(balances, dtype=np.int64)
+        self._has_bills = np.array([contract.bill is not None
+                                    for contract in self._contracts],
+                                   dtype=bool)
+        self._last_costs = np.array(last_costs, dtype=np.int64)
+
+    def bill_month(self, month: int, year: int, line_indices: np.ndarray,
+                   durations: np.ndarray) -> None:
+        """ Start the <month> and <year> billing cycle for all the phone lines
+        of this engine, and bill the outgoing calls made during that month:
+        the i-th call was made from the phone line at index line_indices[i]
+        (in the list given to the engine), and lasted durations[i] seconds.
+
+        Preconditions:
+        - The phone lines have no bill for <month> and <year> yet.
+        - <month> and <year> are after the months already billed.
+        """
+        kinds = self._kinds
+        first = self._starts == year * 12 + month - 1
+        term = kinds == _TERM
+        prepaid = kinds == _PREPAID
+
+        # each call is billed in whole minutes, rounded up
+        minutes = (durations.astype(np.int64) + 59) // 60
+        used = np.bincount(line_indices, weights=minutes,
+                           minlength=len(kinds)).astype(np.int64)
+        # the first TERM_MINS minutes of the month are free in a term contract
+        free = np.where(term, np.minimum(used, TERM_MINS), 0)
+        billed = used - free
+
+        # a prepaid contract carries the cost of its last bill, and is topped
+        # up if it is too low, except in its first month
+        renewed = prepaid & ~first
+        balances = np.where(renewed & self._has_bills, self._last_costs,
+                            self._balances)
+        balances = np.where(renewed & (balances > PREPAID_TOP_UP_LIMIT),
+                            balances - PREPAID_TOP_UP, balances)
+
+        fixed = np.select(
+            [kinds == _MTM, term],
+            [np.int64(MTM_MONTHLY_FEE),
+             np.where(first, np.int64(TERM_DEPOSIT + TERM_MONTHLY_FEE),
+                      np.int64(TERM_MONTHLY_FEE))],
+            balances)
+        rates = np.array([rate for _, _, rate in _CONTRACTS],
+                         dtype=np.int64)[kinds]
+        self._last_costs = rates * billed + fixed
+        self._balances = np.where(prepaid, self._last_costs, 0)
+        self._has_bills[:] = True
+
+        self._write_bills(month, year, fixed, free, billed)
+
+    def _write_bills(self, month: int, year: int, fixed: np.ndarray,
+                     free: np.ndarray, billed: np.ndarray) -> None:
+        """ Create the bills of the <month> and <year> billing cycle of the
+        phone lines of this engine, with the <fixed> costs, <free> minutes and
+        <billed> minutes of each line, and advance their contracts.
+        """
+        balances = self._balances.tolist()
+        kinds = self._kinds.tolist()
+        for ledger, indices in self._groups:
+            first = ledger.add_bills(
+                [self._bills[i].line_id for i in indices.tolist()], month,
+                year, [_CONTRACTS[kinds[i]][1] for i in indices.tolist()],
+                fixed[indices].tolist(), free[indices].tolist(),
+                billed[indices].tolist(),
+                [_CONTRACTS[kinds[i]][2] for i in indices.tolist()])
+            for row, i in enumerate(indices.tolist(), first):
+                self._bills[i].add_row(month, year, row)
+                contract = self._contracts[i]
+                contract.bill = ledger.get_bill(row)
+                if kinds[i] == _TERM:
+                    contract.date = (year, month)
+                elif kinds[i] == _PREPAID:
+                    contract.balance = balances[i]
+
+
+def bill_in_batches(events: Iterable[tuple[datetime.datetime,
+                                           Optional[Call]]],
+                    customer_list: list[Customer]) -> None:
+    """ Register the calls from <events> into the call history of the
+    customers from <customer_list>, and bill them one month at a time with a
+    BillingEngine.
+
+    The resulting bills and call histories are identical to the ones computed
+    by application.process_calls() on the same arguments.
+
+    Preconditions:
+    - <events> satisfies the preconditions of application.process_calls().
+    - The <customer_list> already contains all the customers from <events>.
+    - The phone lines of the customers have no bill for the months of
+    <events>.
+    """
+    registry = registry_for(customer_list)
+    lines = [registry.lookup(number)[1] for customer in customer_list
+             for number in customer.get_phone_numbers()]
+    slots = {line.get_number(): i for i, line in enumerate(lines)}
+    engine = BillingEngine(lines)
+
+    month = None
+    line_indices = []
+    durations = []
+    for time, call in events:
+        if month != (time.month, time.year):
+            if month is not None:
+                engine.bill_month(*month, np.array(line_indices, dtype=np.intp),
+                                  np.array(durations, dtype=np.int64))
+                registry.advance(*month)
+            month = (time.month, time.year)
+            line_indices = []
+            durations = []
+        if call is not None:
+            registry.lookup(call.src_number)[1].get_call_history() \
+                .register_outgoing_call(call)
+            registry.lookup(call.dst_number)[1].get_call_history() \
+                .register_incoming_call(call)
+            line_indices.append(slots[call.src_number])
+            durations.append(call.duration)
+    if month is not None:
+        engine.bill_month(*month, np.array(line_indices, dtype=np.intp),
+                          np.array(durations, dtype=np.int64))
+        registry.advance(*month)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'datetime', 'numpy', 'call', 'contract',
+            'customer', 'ledger', 'phoneline', 'registry'
+        ],
+        'generated-members': 'pygame.*'
+    })
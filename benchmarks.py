@@ -0,0 +1,577 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains benchmarks for the ingestion, billing and filtering code.
+Run it as a script, giving the names of the benchmarks to run (all of them if
+no name is given), e.g.:
+
+    python benchmarks.py timestamps
+    python benchmarks.py scaling --sizes 10000,100000,1000000
+
+The scaling benchmarks run on synthetic datasets of the given sizes (numbers
+of events), each in a fresh process so that its peak memory is measured on
+its own.
+"""
+import argparse
+import datetime
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+import eventlog
+import synthetic
+from bill import Bill
+from call import Call, Drawable, END_CALL_SPRITE, START_CALL_SPRITE
+from contract import MTMContract
+from ledger import BillLedger, LineBills
+from application import create_customers, import_customers, import_data, \
+    process_event_history, process_event_history_batch, \
+    process_event_history_parallel, process_event_stream, stream_events
+from callset import CallSpace
+from customer import Customer
+from filter import CustomerFilter, DurationFilter, Filter, LocationFilter, \
+    ResetFilter, MAP_LOWER_LEFT, MAP_UPPER_RIGHT, valid_location
+from pipeline import FilterPipeline
+from snapshot import load_snapshot, save_snapshot
+
+DATASET_FILE = 'dataset.json'
+
+# Default sizes of the synthetic datasets
+SIZES = [10 ** 4, 10 ** 5]
+
+# Default number of calls for the call memory benchmark
+CALLS = 10 ** 5
+
+
+def _per_item(seconds: float, count: int) -> str:
+    """ Return a description of the time per item, when processing <count>
+    items took <seconds> seconds.
+    """
+    return f'{seconds:8.3f} s  ({seconds / count * 1e9:8.1f} ns per event)'
+
+
+def bench_timestamps(scale: int = 1000) -> None:
+    """ Compare the cost of parsing the timestamps of the events of the
+    dataset, repeated <scale> times, with strptime (as process_event_history
+    used to do) and with eventlog.decode_timestamp.
+    """
+    events = [(event['time'], event['type'] == 'call')
+              for event in eventlog.iter_array(DATASET_FILE, 'events')]
+    events *= scale
+    print(f'timestamps: {len(events)} events')
+
+    # one strptime to check for a new month, and one more for each call
+    start = time.perf_counter()
+    month = None
+    for text, is_call in events:
+        if month != datetime.datetime.strptime(
+                text, eventlog.TIME_FORMAT).month:
+            month = datetime.datetime.strptime(
+                text, eventlog.TIME_FORMAT).month
+        if is_call:
+            datetime.datetime.strptime(text, eventlog.TIME_FORMAT)
+    print('  strptime:        ', _per_item(time.perf_counter() - start,
+                                           len(events)))
+
+    # one decode per event, and a (year, month) key for the month check
+    start = time.perf_counter()
+    key = None
+    for text, _ in events:
+        moment = eventlog.decode_timestamp(text)
+        if key != (moment.year, moment.month):
+            key = (moment.year, moment.month)
+    print('  decode_timestamp:', _per_item(time.perf_counter() - start,
+                                           len(events)))
+
+
+def bench_snapshot(path: str = DATASET_FILE) -> None:
+    """ Compare the time to build the customers of the dataset file <path> by
+    processing its event history, and by restoring them from a snapshot.
+    """
+    start = time.perf_counter()
+    customers = create_customers(import_customers(path))
+    process_event_stream(stream_events(path), customers)
+    replay = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_path = os.path.join(directory, 'customers.snapshot')
+        start = time.perf_counter()
+        save_snapshot(snapshot_path, customers)
+        save = time.perf_counter() - start
+        start = time.perf_counter()
+        load_snapshot(snapshot_path)
+        restore = time.perf_counter() - start
+        size = os.path.getsize(snapshot_path)
+
+    print(f'snapshot: {path}')
+    print(f'  replay event history: {replay:8.3f} s')
+    print(f'  save snapshot:        {save:8.3f} s  ({size / 2 ** 20:.1f} MiB)')
+    print(f'  restore snapshot:     {restore:8.3f} s')
+
+
+class _DictCall:
+    """ A call with the layout Call used to have: attributes in a dictionary,
+    and the drawables, each with its own copy of the sprite, created as soon
+    as the call is.
+    """
+
+    def __init__(self, src_nr: str, dst_nr: str,
+                 calltime: datetime.datetime, duration: int,
+                 src_loc: tuple[float, float], dst_loc: tuple[float, float]) \
+            -> None:
+        """ Create a new call object with the given parameters.
+        """
+        self.src_number = src_nr
+        self.dst_number = dst_nr
+        self.time = calltime
+        self.duration = duration
+        self.src_loc = src_loc
+        self.dst_loc = dst_loc
+        self.drawables = [_uncached_drawable(START_CALL_SPRITE, src_loc),
+                          _uncached_drawable(END_CALL_SPRITE, dst_loc)]
+        self.connection = Drawable(linelimits=(src_loc, dst_loc))
+
+
+def _uncached_drawable(sprite_file: str, location: tuple[float, float]) \
+        -> Drawable:
+    """ Return a new drawable for <sprite_file> at <location>, with its own
+    copy of the sprite.
+    """
+    import pygame
+
+    drawable = Drawable(location=location)
+    drawable.linelimits = None
+    drawable.loc = location
+    drawable.sprite = pygame.transform.smoothscale(
+        pygame.image.load(os.path.join(os.path.dirname(__file__),
+                                       sprite_file)), (13, 13))
+    return drawable
+
+
+def _current_rss() -> int:
+    """ Return the resident memory of this process, in bytes.
+    """
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize()
+
+
+def _call_memory(kind: str, count: int) -> float:
+    """ Return the memory used per call, in bytes, when creating <count>
+    calls of the <kind> layout ('Call' or 'dict') from the events of the
+    dataset (repeated as needed), as they are created by
+    process_event_history.
+    """
+    events = [event for event in eventlog.iter_array(DATASET_FILE, 'events')
+              if event['type'] == 'call']
+    factory = Call if kind == 'Call' else _DictCall
+    before = _current_rss()
+    calls = []
+    for i in range(count):
+        event = events[i % len(events)]
+        calls.append(factory(
+            # copies of the numbers, as decoded from a large json file
+            ''.join(event['src_number']), ''.join(event['dst_number']),
+            eventlog.decode_timestamp(event['time']), event['duration'],
+            tuple(event['src_loc']), tuple(event['dst_loc'])))
+    return (_current_rss() - before) / count
+
+
+def bench_call_memory(count: int) -> None:
+    """ Compare the memory used per call by <count> Call objects, and by
+    the same calls with the layout Call used to have.
+    """
+    print(f'call memory: {count} calls')
+    results = {}
+    for kind in ['dict', 'Call']:
+        # a fresh process for each layout, to measure its memory alone
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results[kind] = executor.submit(_call_memory, kind, count).result()
+    print(f'  former dict layout, eager drawables: {results["dict"]:8.0f} B')
+    print(f'  Call (slots, lazy drawables):        {results["Call"]:8.0f} B')
+    print(f'  reduction: {results["dict"] / results["Call"]:.1f}x')
+
+
+def bench_history(repeat: int = 20) -> None:
+    """ Compare the time of the first application of the filters which use
+    Customer.get_history (when it builds the histories of the customers), and
+    of <repeat> more applications (when it returns the cached histories).
+    """
+    log = import_data()
+    print(f'history: {DATASET_FILE}, {repeat} repeated applications')
+    for filter_, filter_string in [(ResetFilter(), ''),
+                                   (CustomerFilter(),
+                                    str(log['customers'][0]['id']))]:
+        # new customers, whose histories were never computed
+        customers = create_customers(log)
+        process_event_history(log, customers)
+        calls = [call for customer in customers
+                 for history in customer.get_call_history()
+                 for call in history.get_monthly_history()[0]]
+
+        start = time.perf_counter()
+        filter_.apply(customers, calls, filter_string)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(repeat):
+            filter_.apply(customers, calls, filter_string)
+        cached = (time.perf_counter() - start) / repeat
+        print(f'  {type(filter_).__name__ + ".apply":20} first: '
+              f'{first * 1e3:8.3f} ms  cached: {cached * 1e3:8.3f} ms  '
+              f'({first / cached:.1f}x)')
+
+
+def _bill_memory(kind: str, count: int) -> float:
+    """ Return the memory used per bill, in bytes, when <count> phone numbers
+    with month-to-month contracts are billed for 12 months, with their bills
+    stored in a shared BillLedger, through a LineBills per number (<kind>
+    'ledger'), or as Bill objects in a dictionary per number, as PhoneLine
+    used to ('dict'). Both kinds store the same numbers and contracts.
+    """
+    before = _current_rss()
+    if kind == 'ledger':
+        ledger = BillLedger()
+        lines = [(LineBills(ledger, ledger.add_line(f'{n:07}')),
+                  MTMContract(datetime.date(2017, 12, 25)))
+                 for n in range(count)]
+        for month in range(1, 13):
+            for bills, contract in lines:
+                contract.new_month(month, 2018, bills.add_bill(month, 2018))
+    else:
+        numbers = [f'{n:07}' for n in range(count)]
+        lines = [({}, MTMContract(datetime.date(2017, 12, 25)))
+                 for _ in numbers]
+        for month in range(1, 13):
+            for bills, contract in lines:
+                bills[(month, 2018)] = Bill()
+                contract.new_month(month, 2018, bills[(month, 2018)])
+    return (_current_rss() - before) / (12 * count)
+
+
+def bench_bill_memory(count: int) -> None:
+    """ Compare the memory used per bill by <count> phone lines billed for a
+    year, with a BillLedger and with a Bill object per line and month.
+    """
+    print(f'bill memory: {count} phone lines, 12 months')
+    results = {}
+    for kind in ['dict', 'ledger']:
+        # a fresh process for each layout, to measure its memory alone
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results[kind] = executor.submit(_bill_memory, kind, count).result()
+    print(f'  Bill objects in dictionaries: {results["dict"]:8.0f} B')
+    print(f'  BillLedger:                   {results["ledger"]:8.0f} B')
+    print(f'  reduction: {results["dict"] / results["ledger"]:.1f}x')
+
+
+def _rectangles(side: float, count: int) \
+        -> list[tuple[tuple[float, float], tuple[float, float]]]:
+    """ Return <count> random squares of the map, <side> degrees wide, as
+    (lower_left, upper_right) tuples.
+    """
+    rng = random.Random(148)
+    rectangles = []
+    for _ in range(count):
+        x = rng.uniform(MAP_LOWER_LEFT[0], MAP_UPPER_RIGHT[0] - side)
+        y = rng.uniform(MAP_LOWER_LEFT[1], MAP_UPPER_RIGHT[1] - side)
+        rectangles.append(((x, y), (x + side, y + side)))
+    return rectangles
+
+
+def bench_location(sizes: list[int], queries: int = 200,
+                   chunks: int = 4) -> None:
+    """ Compare the time of LocationFilter queries for small rectangles
+    answered by the LocationGrid of the dataset with the time of a full scan
+    with valid_location, on synthetic datasets of <sizes> events.
+
+    The queries are run as the visualizer runs them: a new LocationFilter is
+    created for each query, and applied to <chunks> slices of the calls (one
+    per thread, see visualizer.NUM_THREADS). The first query also builds the
+    grid.
+
+    The rectangles are 0.01 degree wide, so they hold more calls as the
+    dataset grows, and then narrow enough to hold about 10 calls whatever the
+    size of the dataset.
+    """
+    for size in sizes:
+        log = synthetic.generate_dataset(size, seed=1)
+        customers = create_customers(log)
+        process_event_history(log, customers)
+        calls = ResetFilter().apply(customers, [], '')
+        chunk = -(-len(calls) // chunks)
+
+        def query(lower_left: tuple[float, float],
+                  upper_right: tuple[float, float]) -> int:
+            """ Return the number of calls found by a query of the visualizer
+            for the rectangle from <lower_left> to <upper_right>. """
+            filter_string = ', '.join(str(c) for c in lower_left + upper_right)
+            return sum(len(LocationFilter().apply(
+                customers, calls[i:i + chunk], filter_string))
+                for i in range(0, len(calls), chunk))
+
+        start = time.perf_counter()
+        query(MAP_LOWER_LEFT, MAP_LOWER_LEFT)
+        print(f'location: {len(calls)} calls in {chunks} chunks, first query '
+              f'(grid built) in {time.perf_counter() - start:.3f} s')
+
+        for side in [0.01, 0.01 * (5000 / len(calls)) ** 0.5]:
+            rectangles = _rectangles(side, queries)
+            start = time.perf_counter()
+            matches = sum(query(lower_left, upper_right)
+                          for lower_left, upper_right in rectangles)
+            indexed = (time.perf_counter() - start) / queries
+
+            start = time.perf_counter()
+            for lower_left, upper_right in rectangles[:10]:
+                [call for call in calls
+                 if valid_location(call.src_loc, lower_left, upper_right)
+                 or valid_location(call.dst_loc, lower_left, upper_right)]
+            scan = (time.perf_counter() - start) / 10
+            print(f'  {side:.4f} degree squares: grid query: '
+                  f'{indexed * 1e3:7.3f} ms  full scan: {scan * 1e3:8.3f} ms  '
+                  f'({matches / queries:.1f} calls found)')
+
+
+def bench_bitmaps(sizes: list[int], repeat: int = 100) -> None:
+    """ Report the time to compute the bitmaps of the filters of the query
+    "a customer OR (long calls AND downtown)", and then to evaluate that
+    query on the bitmaps, and on sets of calls, on synthetic datasets of
+    <sizes> events.
+    """
+    for size in sizes:
+        log = synthetic.generate_dataset(size, seed=1)
+        customers = create_customers(log)
+        process_event_history(log, customers)
+        start = time.perf_counter()
+        space = CallSpace(customers)
+        print(f'bitmaps: {len(space)} calls, space created in '
+              f'{time.perf_counter() - start:.3f} s')
+
+        specs = [(CustomerFilter(), str(customers[0].get_id())),
+                 (DurationFilter(), 'G300'),
+                 (LocationFilter(), '-79.42, 43.63, -79.37, 43.67')]
+        bitmaps = []
+        for filter_, filter_string in specs:
+            # the first bitmap of a filter builds the index of the space
+            times = []
+            for _ in range(2):
+                start = time.perf_counter()
+                bitmap = filter_.bitmap(space, filter_string)
+                times.append(time.perf_counter() - start)
+            bitmaps.append(bitmap)
+            print(f'  {type(filter_).__name__ + ".bitmap":24} first: '
+                  f'{times[0] * 1e3:9.3f} ms  indexed: {times[1] * 1e3:8.3f} '
+                  f'ms  ({len(bitmap)} calls)')
+        customer, long_calls, downtown = bitmaps
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = customer | (long_calls & downtown)
+        bitmap_time = (time.perf_counter() - start) / repeat
+        sets = [set(bitmap) for bitmap in bitmaps]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            sets[0] | (sets[1] & sets[2])
+        set_time = (time.perf_counter() - start) / repeat
+        print(f'  query on bitmaps: {bitmap_time * 1e3:8.3f} ms  on sets: '
+              f'{set_time * 1e3:8.3f} ms  ({len(result)} calls)')
+
+
+def _import_time(modules: str, runs: int) -> float:
+    """ Return the shortest time, out of <runs> runs, to start a new Python
+    interpreter which imports the comma-separated <modules>.
+    """
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', f'import {modules}'],
+                       check=True, cwd=os.path.dirname(__file__) or '.',
+                       env={**os.environ,
+                            'PYGAME_HIDE_SUPPORT_PROMPT': '1'})
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_imports(runs: int = 5) -> None:
+    """ Compare the start-up time of a billing and filtering job, which only
+    imports the headless modules, with the start-up time when the GUI modules
+    are imported too (as application used to do).
+    """
+    headless = _import_time('application, filter', runs)
+    with_gui = _import_time('application, filter, visualizer', runs)
+    baseline = _import_time('sys', runs)
+    print('imports: (interpreter start-up included)')
+    print(f'  python alone:                  {baseline:8.3f} s')
+    print(f'  application, filter:           {headless:8.3f} s')
+    print(f'  application, filter + GUI:     {with_gui:8.3f} s')
+    print(f'  saving: {with_gui - headless:.3f} s per start')
+
+
+def _peak_rss() -> int:
+    """ Return the peak resident memory of this process so far, in bytes.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _run_scaling(size: int, directory: str) -> list[tuple[str, float, int]]:
+    """ Time each step of loading, billing and filtering a synthetic dataset
+    of <size> events, written in <directory>. Return the name, duration in
+    seconds and number of items processed of each step.
+    """
+    path = os.path.join(directory, f'synthetic-{size}.json')
+    synthetic.write_dataset(path, size)
+    steps = []
+
+    def step(name: str, items: int, function: Callable, *args: object) \
+            -> object:
+        """ Run function(*args) as the step <name>, processing <items>. """
+        start = time.perf_counter()
+        result = function(*args)
+        steps.append((name, time.perf_counter() - start, items))
+        return result
+
+    log = step('import_data', size, import_data, path)
+    customers = step('create_customers', len(log['customers']),
+                     create_customers, log)
+    step('process_event_history', size, process_event_history, log,
+         customers)
+    step('process_event_history_parallel', size,
+         process_event_history_parallel, log, create_customers(log))
+    step('process_event_history_batch', size, process_event_history_batch,
+         log, create_customers(log))
+
+    calls = ResetFilter().apply(customers, [], '')
+    filters = [(ResetFilter(), ''),
+               (CustomerFilter(), str(customers[0].get_id())),
+               (DurationFilter(), 'L100'),
+               (LocationFilter(), '-79.5, 43.65, -79.45, 43.7')]
+    for filter_, filter_string in filters:
+        step(f'{type(filter_).__name__}.apply', len(calls), filter_.apply,
+             customers, calls, filter_string)
+    # the index is kept for the dataset, so a new filter reuses it, as when
+    # the visualizer creates a filter for each query
+    step('DurationFilter.apply (indexed)', len(calls), DurationFilter().apply,
+         customers, calls, 'R30-300')
+
+    # a chain of filters, applied one after another, and then at once
+    chain = [(DurationFilter(), 'G60'),
+             (LocationFilter(), '-79.6, 43.6, -79.3, 43.75'),
+             (CustomerFilter(), str(customers[0].get_id()))]
+    step('chained Filter.apply', len(calls), _apply_chain, chain, customers,
+         calls)
+    step('FilterPipeline.apply', len(calls), FilterPipeline(chain).apply,
+         customers, calls)
+
+    months = sorted({call.get_bill_date() for call in calls})
+    step('Customer.generate_bill', len(customers) * len(months),
+         lambda: [c.generate_bill(month, year) for c in customers
+                  for month, year in months])
+    steps.append(('peak RSS (MiB)', _peak_rss() / 2 ** 20, 0))
+    return steps
+
+
+def _apply_chain(chain: list[tuple[Filter, str]], customers: list[Customer],
+                 calls: list[Call]) -> list[Call]:
+    """ Return the calls left after applying each filter of <chain> to the
+    calls returned by the previous one, starting from <calls>.
+    """
+    for filter_, filter_string in chain:
+        calls = filter_.apply(customers, calls, filter_string)
+    return calls
+
+
+def bench_scaling(sizes: list[int]) -> None:
+    """ Report the time and throughput of each step of loading, billing and
+    filtering synthetic datasets of <sizes> events, and the peak memory used
+    for each size.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            # a fresh process for each size, to measure its peak memory alone
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                steps = executor.submit(_run_scaling, size, directory).result()
+            print(f'scaling: {size} events')
+            for name, seconds, items in steps:
+                if items:
+                    print(f'  {name:32} {seconds:9.3f} s  '
+                          f'{items / seconds:12.0f} items/s')
+                else:
+                    print(f'  {name:32} {seconds:9.1f}')
+
+
+def bench_parallel(sizes: list[int]) -> None:
+    """ Compare the time of process_event_history with the time of
+    process_event_history_parallel with 1, 2, 4 and as many workers as there
+    are CPUs, on synthetic datasets of <sizes> events.
+
+    The decoding of the events and the recording of the call histories are
+    done by the main process in every case, so they bound the speedup.
+    """
+    cpus = os.cpu_count() or 1
+    for size in sizes:
+        log = synthetic.generate_dataset(size, seed=1)
+        customers = create_customers(log)
+        start = time.perf_counter()
+        process_event_history(log, customers)
+        serial = time.perf_counter() - start
+        print(f'parallel: {size} events, {cpus} CPUs')
+        print(f'  serial:       {_per_item(serial, size)}')
+        for workers in sorted({1, 2, 4, cpus}):
+            customers = create_customers(log)
+            start = time.perf_counter()
+            process_event_history_parallel(log, customers, workers)
+            seconds = time.perf_counter() - start
+            print(f'  {workers:3} workers:  {_per_item(seconds, size)}  '
+                  f'speedup: {serial / seconds:5.2f}')
+
+
+BENCHMARKS: dict[str, Callable[[argparse.Namespace], None]] = {
+    'timestamps': lambda options: bench_timestamps(options.scale),
+    'snapshot': lambda options: bench_snapshot(),
+    'scaling': lambda options: bench_scaling(options.sizes),
+    'calls': lambda options: bench_call_memory(options.calls),
+    'imports': lambda options: bench_imports(),
+    'history': lambda options: bench_history(),
+    'bills': lambda options: bench_bill_memory(options.calls),
+    'location': lambda options: bench_location(options.sizes),
+    'bitmaps': lambda options: bench_bitmaps(options.sizes),
+    'parallel': lambda options: bench_parallel(options.sizes),
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run benchmarks.')
+    parser.add_argument('names', nargs='*',
+                        help='benchmarks to run, among: '
+                             + ', '.join(BENCHMARKS) + ' (default: all)')
+    parser.add_argument('--sizes', default=SIZES,
+                        type=lambda text: [int(n) for n in text.split(',')],
+                        help='comma-separated numbers of events for the '
+                             'scaling benchmarks')
+    parser.add_argument('--scale', type=int, default=1000,
+                        help='number of copies of the dataset events for the '
+                             'timestamps benchmark')
+    parser.add_argument('--calls', type=int, default=CALLS,
+                        help='number of calls for the calls benchmark')
+    arguments = parser.parse_args()
+    for benchmark in arguments.names:
+        if benchmark not in BENCHMARKS:
+            parser.error(f'unknown benchmark: {benchmark}')
+    for benchmark in arguments.names or list(BENCHMARKS):
+        BENCHMARKS[benchmark](arguments)
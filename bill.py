@@ -13,6 +13,29 @@ Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 from typing import Union
 
+# Amounts of money are stored as integer numbers of mills (thousandths of a
+# dollar), which represent every rate and fee exactly, and are only converted
+# to dollars by the methods returning them to the user
+MILLS_PER_DOLLAR = 1000
+
+
+def to_mills(dollars: float) -> int:
+    """ Return the amount of <dollars>, rounded to the nearest mill.
+
+    >>> to_mills(0.025)
+    25
+    """
+    return round(dollars * MILLS_PER_DOLLAR)
+
+
+def to_dollars(mills: int) -> float:
+    """ Return the amount of <mills>, in dollars.
+
+    >>> to_dollars(50050)
+    50.05
+    """
+    return mills / MILLS_PER_DOLLAR
+
 
 class Bill:
     """ A single month's bill for a customer's phone line.
@@ -27,6 +50,10 @@ class Bill:
     The bill does not store the amount due. Instead, the amount due can be
     computed on demand by the get_cost() method.
 
+    The rate and the fixed costs are stored in mills, so the cost of a bill is
+    exact: get_cost_mills() returns it in mills, and get_cost() and
+    get_summary() in dollars.
+
     === Public Attributes ===
     billed_min:
          number of billable minutes used in the month associated with this bill.
@@ -34,10 +61,10 @@ class Bill:
          number of non-billable minutes used in the month associated with this
          bill.
     min_rate:
-         cost for one minute of calling
+         cost for one minute of calling, in mills
     fixed_cost:
          fixed costs for the bill (e.g., fixed monthly cost of the
-         contract, term deposits, etc.)
+         contract, term deposits, etc.), in mills
     type:
          type of contract
 
@@ -49,8 +76,8 @@ class Bill:
     """
     billed_min: int
     free_min: int
-    min_rate: float
-    fixed_cost: float
+    min_rate: int
+    fixed_cost: int
     type: str
 
     def __init__(self) -> None:
@@ -62,16 +89,16 @@ class Bill:
         self.min_rate = 0
         self.type = ""
 
-    def set_rates(self, contract_type: str, min_cost: float) \
+    def set_rates(self, contract_type: str, min_cost: int) \
             -> None:
         """ Set this Bill's contract type to <contract_type>.
-        Set this Bill's calling rate to <min_cost>.
+        Set this Bill's calling rate to <min_cost> mills.
         """
         self.type = contract_type
         self.min_rate = min_cost
 
-    def add_fixed_cost(self, cost: float) -> None:
-        """ Add a fixed one-time cost <cost> onto the bill.
+    def add_fixed_cost(self, cost: int) -> None:
+        """ Add a fixed one-time cost of <cost> mills onto the bill.
         """
         self.fixed_cost += cost
 
@@ -89,6 +116,11 @@ class Bill:
         """ Return bill amount, considering the rates for billable calls for
         this Bill's contract type.
         """
+        return to_dollars(self.get_cost_mills())
+
+    def get_cost_mills(self) -> int:
+        """ Return the exact bill amount, in mills.
+        """
         return self.min_rate * self.billed_min + self.fixed_cost
 
     # ----------------------------------------------------------
@@ -101,10 +133,10 @@ class Bill:
         """ Return a bill summary as a dictionary containing the bill details.
         """
         bill_summary = {'type': self.type,
-                        'fixed': self.fixed_cost,
+                        'fixed': to_dollars(self.fixed_cost),
                         'free_mins': self.free_min,
                         'billed_mins': self.billed_min,
-                        'min_rate': self.min_rate,
+                        'min_rate': to_dollars(self.min_rate),
                         'total': self.get_cost()
                         }
         return bill_summary
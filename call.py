@@ -13,14 +13,41 @@ Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 import datetime
 import os
-from typing import Optional
-import pygame
+import sys
+from typing import TYPE_CHECKING, Optional
+
+# pygame is only imported when a sprite is first loaded, so that calls can be
+# created, billed and filtered without any GUI library (e.g. on a server).
+if TYPE_CHECKING:
+    import pygame
 
 
 # Sprite files to display the start and end of a call
 START_CALL_SPRITE = 'data/call-start-2.png'
 END_CALL_SPRITE = 'data/call-end-2.png'
 
+# Size of the sprites on the screen, in pixels
+SPRITE_SIZE = (13, 13)
+
+# The scaled images of the sprite files loaded so far, by sprite file.
+# Each sprite file is only loaded and scaled once per process: all the
+# drawables with the same sprite file share the same image.
+_sprite_cache: dict[str, 'pygame.Surface'] = {}
+
+
+def load_sprite(sprite_file: str) -> 'pygame.Surface':
+    """ Return the image in <sprite_file>, scaled to SPRITE_SIZE.
+    The returned image is shared, and must not be modified.
+    """
+    sprite = _sprite_cache.get(sprite_file)
+    if sprite is None:
+        import pygame
+        sprite = pygame.transform.smoothscale(
+            pygame.image.load(os.path.join(os.path.dirname(__file__),
+                                           sprite_file)), SPRITE_SIZE)
+        _sprite_cache[sprite_file] = sprite
+    return sprite
+
 
 # ----------------------------------------------------------------------------
 # NOTE: You do not need to understand the implementation of the Drawable class
@@ -40,7 +67,7 @@ class Drawable:
         If none, then must have sprite
     loc: location (longitude/latitude pair)
     """
-    sprite: Optional[pygame.Surface]
+    sprite: Optional['pygame.Surface']
     linelimits: Optional[tuple[float, float]]
     loc: Optional[tuple[float, float]]
 
@@ -57,9 +84,7 @@ class Drawable:
         self.loc = None
 
         if sprite_file is not None and location is not None:
-            self.sprite = pygame.transform.smoothscale(
-                pygame.image.load(os.path.join(os.path.dirname(__file__),
-                                               sprite_file)), (13, 13))
+            self.sprite = load_sprite(sprite_file)
             self.loc = location
         else:
             self.linelimits = linelimits
@@ -103,33 +128,76 @@ class Call:
     === Representation Invariants ===
     -   duration >= 0
     """
+    # Calls are the most numerous objects of the application: storing their
+    # attributes in slots, instead of a per-instance dictionary, keeps them
+    # small.
+    __slots__ = ('src_number', 'dst_number', 'time', 'duration',
+                 'src_loc', 'dst_loc', '_drawables', '_connection')
     src_number: str
     dst_number: str
     time: datetime.datetime
     duration: int
     src_loc: tuple[float, float]
     dst_loc: tuple[float, float]
-    drawables: list[Drawable]
-    connection: Drawable
+    # === Private Attributes ===
+    # _drawables:
+    #     the value of <drawables>, or None if it was not needed yet
+    # _connection:
+    #     the value of <connection>, or None if it was not needed yet
+    _drawables: Optional[list[Drawable]]
+    _connection: Optional[Drawable]
 
     def __init__(self, src_nr: str, dst_nr: str,
                  calltime: datetime.datetime, duration: int,
                  src_loc: tuple[float, float], dst_loc: tuple[float, float]) \
             -> None:
         """ Create a new Call object with the given parameters.
+
+        The drawables of the Call are only created when they are first needed,
+        so that Calls used only for billing and filtering never load sprites.
         """
-        self.src_number = src_nr
-        self.dst_number = dst_nr
+        # many calls share the same numbers: keep a single copy of each
+        self.src_number = sys.intern(src_nr)
+        self.dst_number = sys.intern(dst_nr)
         self.time = calltime
         self.duration = duration
         self.src_loc = src_loc
         self.dst_loc = dst_loc
-        self.drawables = [Drawable(sprite_file=START_CALL_SPRITE,
-                                   location=src_loc),
-                          Drawable(sprite_file=END_CALL_SPRITE,
-                                   location=dst_loc)]
+        self._drawables = None
+        self._connection = None
+
+    @property
+    def drawables(self) -> list[Drawable]:
+        """ Sprites for drawing the source and destination of this Call.
+        """
+        if self._drawables is None:
+            self._drawables = [Drawable(sprite_file=START_CALL_SPRITE,
+                                        location=self.src_loc),
+                               Drawable(sprite_file=END_CALL_SPRITE,
+                                        location=self.dst_loc)]
+        return self._drawables
+
+    @property
+    def connection(self) -> Drawable:
+        """ Connecting line between the two sprites of this Call.
+        """
+        if self._connection is None:
+            self._connection = Drawable(linelimits=(self.src_loc,
+                                                    self.dst_loc))
+        return self._connection
+
+    def __getstate__(self) -> tuple:
+        """ Return the state of this Call to be pickled. The drawables hold
+        pygame surfaces, which cannot be pickled, so they are left out: they
+        are created again when needed.
+        """
+        return (self.src_number, self.dst_number, self.time, self.duration,
+                self.src_loc, self.dst_loc)
 
-        self.connection = Drawable(linelimits=(src_loc, dst_loc))
+    def __setstate__(self, state: tuple) -> None:
+        """ Restore this Call from its pickled <state>.
+        """
+        self.__init__(*state)
 
     def get_bill_date(self) -> tuple[int, int]:
         """ Return the billing date for this Call, as a tuple containing the
@@ -164,7 +232,7 @@ if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'datetime', 'os', 'pygame'
+            'python_ta', 'typing', 'datetime', 'os', 'sys', 'pygame'
         ],
         'disable': ['R0902', 'R0913'],
         'generated-members': 'pygame.*'
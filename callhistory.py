@@ -11,9 +11,91 @@ any changes, are expressly prohibited.
 All of the files in this directory and all subdirectories are:
 Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
+import datetime
+from bisect import bisect_left, bisect_right
+from math import ceil
+from typing import Iterator, Optional
+
 from call import Call
 
 
+class CallUsage:
+    """ The number and duration of the calls of a phone line (or a group of
+    phone lines) over some period, kept up to date as calls are recorded.
+
+    === Public Attributes ===
+    outgoing_count:
+         number of outgoing calls
+    outgoing_seconds:
+         total duration of the outgoing calls, in seconds
+    outgoing_minutes:
+         total duration of the outgoing calls, each rounded up to a whole
+         number of minutes, as calls are billed
+    incoming_count:
+         number of incoming calls
+    incoming_seconds:
+         total duration of the incoming calls, in seconds
+    incoming_minutes:
+         total duration of the incoming calls, each rounded up to a whole
+         number of minutes
+
+    === Representation Invariants ===
+    - all the attributes are >= 0
+    """
+    outgoing_count: int
+    outgoing_seconds: int
+    outgoing_minutes: int
+    incoming_count: int
+    incoming_seconds: int
+    incoming_minutes: int
+
+    def __init__(self) -> None:
+        """ Create a new CallUsage, without any call.
+        """
+        self.outgoing_count = 0
+        self.outgoing_seconds = 0
+        self.outgoing_minutes = 0
+        self.incoming_count = 0
+        self.incoming_seconds = 0
+        self.incoming_minutes = 0
+
+    def add_outgoing_call(self, call: Call) -> None:
+        """ Add the outgoing <call> to this usage.
+        """
+        self.outgoing_count += 1
+        self.outgoing_seconds += call.duration
+        self.outgoing_minutes += ceil(call.duration / 60)
+
+    def add_incoming_call(self, call: Call) -> None:
+        """ Add the incoming <call> to this usage.
+        """
+        self.incoming_count += 1
+        self.incoming_seconds += call.duration
+        self.incoming_minutes += ceil(call.duration / 60)
+
+    def add_usage(self, other: 'CallUsage') -> None:
+        """ Add all the calls of the <other> usage to this usage.
+        """
+        self.outgoing_count += other.outgoing_count
+        self.outgoing_seconds += other.outgoing_seconds
+        self.outgoing_minutes += other.outgoing_minutes
+        self.incoming_count += other.incoming_count
+        self.incoming_seconds += other.incoming_seconds
+        self.incoming_minutes += other.incoming_minutes
+
+    def get_summary(self) -> dict[str, int]:
+        """ Return a usage summary as a dictionary containing the number, the
+        total duration in seconds and the total rounded minutes of the
+        outgoing and incoming calls.
+        """
+        return {'outgoing_count': self.outgoing_count,
+                'outgoing_seconds': self.outgoing_seconds,
+                'outgoing_minutes': self.outgoing_minutes,
+                'incoming_count': self.incoming_count,
+                'incoming_seconds': self.incoming_seconds,
+                'incoming_minutes': self.incoming_minutes}
+
+
 class CallHistory:
     """A class for recording incoming and outgoing calls for a particular number
 
@@ -27,12 +109,31 @@ class CallHistory:
     """
     incoming_calls: dict[tuple[int, int], list[Call]]
     outgoing_calls: dict[tuple[int, int], list[Call]]
+    # === Private Attributes ===
+    # _outgoing_index:
+    #     the times of the outgoing calls, and the outgoing calls themselves,
+    #     as two lists in chronological order
+    # _incoming_index:
+    #     the times of the incoming calls, and the incoming calls themselves,
+    #     as two lists in chronological order
+    # _usage:
+    #     maps each (month, year) with calls to the CallUsage of that month
+    # _total_usage:
+    #     the CallUsage of the whole history
+    _outgoing_index: tuple[list[datetime.datetime], list[Call]]
+    _incoming_index: tuple[list[datetime.datetime], list[Call]]
+    _usage: dict[tuple[int, int], CallUsage]
+    _total_usage: CallUsage
 
     def __init__(self) -> None:
         """ Create an empty CallHistory.
         """
         self.outgoing_calls = {}
         self.incoming_calls = {}
+        self._outgoing_index = ([], [])
+        self._incoming_index = ([], [])
+        self._usage = {}
+        self._total_usage = CallUsage()
 
     def register_outgoing_call(self, call: Call) -> None:
         """ Register a Call <call> into this outgoing call history
@@ -41,6 +142,9 @@ class CallHistory:
             self.outgoing_calls[(call.time.month, call.time.year)].append(call)
         else:
             self.outgoing_calls[(call.time.month, call.time.year)] = [call]
+        _add_to_index(self._outgoing_index, call)
+        self._month_usage(call).add_outgoing_call(call)
+        self._total_usage.add_outgoing_call(call)
 
     def register_incoming_call(self, call: Call) -> None:
         """ Register a Call <call> into this incoming call history
@@ -49,6 +153,55 @@ class CallHistory:
             self.incoming_calls[(call.time.month, call.time.year)].append(call)
         else:
             self.incoming_calls[(call.time.month, call.time.year)] = [call]
+        _add_to_index(self._incoming_index, call)
+        self._month_usage(call).add_incoming_call(call)
+        self._total_usage.add_incoming_call(call)
+
+    def _month_usage(self, call: Call) -> CallUsage:
+        """ Return the CallUsage of the month of <call>, creating it if this is
+        the first call of that month.
+        """
+        key = (call.time.month, call.time.year)
+        if key not in self._usage:
+            self._usage[key] = CallUsage()
+        return self._usage[key]
+
+    def get_call_count(self) -> int:
+        """ Return the number of calls (outgoing and incoming) registered in
+        this call history so far.
+        """
+        return self._total_usage.outgoing_count + \
+            self._total_usage.incoming_count
+
+    def get_usage(self, month: int = None, year: int = None) -> CallUsage:
+        """ Return the usage of the calls of <month> and <year>, as a new
+        CallUsage, in constant time.
+
+        If <month> and <year> are both None, then return the usage of all the
+        calls from this call history.
+
+        Precondition: <month> and <year> are either both specified, or are both
+        missing/None
+        """
+        usage = CallUsage()
+        if month is None and year is None:
+            usage.add_usage(self._total_usage)
+        elif (month, year) in self._usage:
+            usage.add_usage(self._usage[(month, year)])
+        return usage
+
+    def get_calls_between(self, start: Optional[datetime.datetime] = None,
+                          end: Optional[datetime.datetime] = None) \
+            -> tuple[Iterator[Call], Iterator[Call]]:
+        """ Return iterators over the outgoing and incoming calls made at or
+        after <start> and before <end>, in chronological order, as a tuple in
+        the following order: (outgoing calls, incoming calls)
+
+        A missing/None <start> or <end> leaves that side of the range open.
+        This takes O(log n) time, plus constant time per call iterated over.
+        """
+        return _calls_between(self._outgoing_index, start, end), \
+            _calls_between(self._incoming_index, start, end)
     # ----------------------------------------------------------
     # NOTE: You do not need to understand the implementation of
     # the following methods, to be able to solve this assignment
@@ -88,13 +241,39 @@ class CallHistory:
         return monthly_history
 
 
+def _add_to_index(index: tuple[list[datetime.datetime], list[Call]],
+                  call: Call) -> None:
+    """ Add <call> to the time <index> of a call history, after the calls made
+    at the same time or earlier.
+    """
+    times, calls = index
+    if not times or times[-1] <= call.time:
+        times.append(call.time)
+        calls.append(call)
+    else:
+        position = bisect_right(times, call.time)
+        times.insert(position, call.time)
+        calls.insert(position, call)
+
+
+def _calls_between(index: tuple[list[datetime.datetime], list[Call]],
+                   start: Optional[datetime.datetime],
+                   end: Optional[datetime.datetime]) -> Iterator[Call]:
+    """ Return an iterator over the calls of the time <index> of a call
+    history made at or after <start> and before <end>.
+    """
+    times, calls = index
+    low = 0 if start is None else bisect_left(times, start)
+    high = len(times) if end is None else bisect_left(times, end)
+    return map(calls.__getitem__, range(low, high))
+
+
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'datetime', 'call'
-                                               ''
+            'python_ta', 'typing', 'datetime', 'bisect', 'math', 'call'
         ],
         'disable': ['R0902', 'R0913'],
         'generated-members': 'pygame.*'
@@ -0,0 +1,257 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the indexes the filters build over the calls of a
+dataset, so that a query does not scan all the calls.
+
+An index refers to the calls by their position in the indexed list, and
+returns the matching calls in the order of that list. It is only valid for
+the list it was built for, as long as that list is not modified: the filters
+build their indexes over the calls of a CallSpace (see CallSpace.get_index),
+where the position of a call is its call id.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from math import isqrt
+from typing import Optional
+
+from call import Call
+
+# The average number of call locations per cell a LocationGrid aims for, and
+# the largest number of cells on each side of the grid
+GRID_CELL_POINTS = 8
+GRID_MAX_SIDE = 1024
+
+
+class CallIndex:
+    """ An index over a list of calls.
+
+    This is an abstract class. Only subclasses should be instantiated.
+
+    === Public Attributes ===
+    calls:
+         the indexed list of calls
+    """
+    calls: list[Call]
+
+    def __init__(self, calls: list[Call]) -> None:
+        """ Create an index over <calls>.
+        """
+        self.calls = calls
+
+    def _select(self, positions: list[int]) -> list[Call]:
+        """ Return the calls at the <positions> of the indexed list, in the
+        order of that list.
+        """
+        calls = self.calls
+        return [calls[position] for position in sorted(positions)]
+
+
+class DurationIndex(CallIndex):
+    """ An index of a list of calls by duration.
+
+    Each call is only indexed once, at its first position in the list, so
+    the queries return each call once, even if the list contains it several
+    times.
+    """
+    # === Private Attributes ===
+    # _positions:
+    #     the positions of the indexed calls in the list, sorted by the
+    #     duration of their call
+    # _durations:
+    #     the duration of the call at each of the _positions, in increasing
+    #     order
+    _positions: list[int]
+    _durations: list[int]
+
+    def __init__(self, calls: list[Call]) -> None:
+        """ Create an index of <calls> by duration.
+        """
+        super().__init__(calls)
+        seen = set()
+        positions = []
+        for position, call in enumerate(calls):
+            if id(call) not in seen:
+                seen.add(id(call))
+                positions.append(position)
+        positions.sort(key=lambda p: calls[p].duration)
+        self._positions = positions
+        self._durations = [calls[p].duration for p in positions]
+
+    def between(self, low: Optional[float] = None,
+                high: Optional[float] = None) -> list[Call]:
+        """ Return the calls lasting at least <low> and at most <high>
+        seconds. A missing/None bound leaves that side of the range open.
+        """
+        return self._select(self.positions_between(low, high))
+
+    def positions_between(self, low: Optional[float] = None,
+                          high: Optional[float] = None) -> list[int]:
+        """ Return the positions in the indexed list of the calls returned by
+        between(<low>, <high>), in no particular order.
+        """
+        start = 0 if low is None else bisect_left(self._durations, low)
+        stop = len(self._durations) if high is None \
+            else bisect_right(self._durations, high)
+        return self._positions[start:max(start, stop)]
+
+
+class LocationGrid(CallIndex):
+    """ A spatial index of a list of calls, by the locations of their source
+    and destination, as a uniform grid over a rectangular area.
+
+    The grid has about GRID_CELL_POINTS locations per cell, so a query for a
+    small rectangle only looks at the few locations of the cells it covers,
+    however many calls are indexed. The locations outside of the area are
+    not indexed, and never match a query. Like a DurationIndex, each call is
+    only indexed once, at its first position in the list.
+
+    === Public Attributes ===
+    lower_left:
+         the (longitude, latitude) of the lower left corner of the area
+    upper_right:
+         the (longitude, latitude) of the upper right corner of the area
+    """
+    lower_left: tuple[float, float]
+    upper_right: tuple[float, float]
+    # === Private Attributes ===
+    # _side:
+    #     the number of cells on each side of the grid
+    # _cell_starts:
+    #     the index in _positions, _xs and _ys of the first location of each
+    #     cell, numbered row by row from the lower left corner, followed by
+    #     the number of locations
+    # _positions, _xs, _ys:
+    #     the position in the list of the call of each indexed location, and
+    #     its longitude and latitude, sorted by cell
+    _side: int
+    _cell_starts: array
+    _positions: array
+    _xs: array
+    _ys: array
+
+    def __init__(self, calls: list[Call], lower_left: tuple[float, float],
+                 upper_right: tuple[float, float]) -> None:
+        """ Create a spatial index of <calls> over the rectangle from
+        <lower_left> to <upper_right>.
+        """
+        super().__init__(calls)
+        self.lower_left = lower_left
+        self.upper_right = upper_right
+
+        seen = set()
+        points = []
+        for position, call in enumerate(calls):
+            if id(call) not in seen:
+                seen.add(id(call))
+                for x, y in (call.src_loc, call.dst_loc):
+                    if self._contains(x, y):
+                        points.append((position, x, y))
+        self._side = max(1, min(GRID_MAX_SIDE,
+                                isqrt(len(points) // GRID_CELL_POINTS)))
+
+        # sort the locations by cell, with a counting sort
+        cells = [self._cell(x, y) for _, x, y in points]
+        counts = [0] * (self._side * self._side + 1)
+        for cell in cells:
+            counts[cell + 1] += 1
+        for cell in range(1, len(counts)):
+            counts[cell] += counts[cell - 1]
+        self._cell_starts = array('l', counts)
+        order = [0] * len(points)
+        for index, cell in enumerate(cells):
+            order[counts[cell]] = index
+            counts[cell] += 1
+        self._positions = array('l', [points[i][0] for i in order])
+        self._xs = array('d', [points[i][1] for i in order])
+        self._ys = array('d', [points[i][2] for i in order])
+
+    def _contains(self, x: float, y: float) -> bool:
+        """ Return whether the location (<x>, <y>) is in the area of this grid,
+        boundary included.
+        """
+        return self.lower_left[0] <= x <= self.upper_right[0] and \
+            self.lower_left[1] <= y <= self.upper_right[1]
+
+    def _column(self, x: float) -> int:
+        """ Return the column of the cells containing the longitude <x>, which
+        is in the area of this grid.
+        """
+        width = self.upper_right[0] - self.lower_left[0]
+        if width <= 0:
+            return 0
+        return min(self._side - 1,
+                   int((x - self.lower_left[0]) / width * self._side))
+
+    def _row(self, y: float) -> int:
+        """ Return the row of the cells containing the latitude <y>, which is
+        in the area of this grid.
+        """
+        height = self.upper_right[1] - self.lower_left[1]
+        if height <= 0:
+            return 0
+        return min(self._side - 1,
+                   int((y - self.lower_left[1]) / height * self._side))
+
+    def _cell(self, x: float, y: float) -> int:
+        """ Return the number of the cell containing the location (<x>, <y>),
+        which is in the area of this grid.
+        """
+        return self._row(y) * self._side + self._column(x)
+
+    def within(self, lower_left: tuple[float, float],
+               upper_right: tuple[float, float]) -> list[Call]:
+        """ Return the calls whose source or destination is in the rectangle
+        from <lower_left> to <upper_right> (boundary included), and in the
+        area of this grid.
+        """
+        return self._select(list(self.positions_within(lower_left,
+                                                       upper_right)))
+
+    def positions_within(self, lower_left: tuple[float, float],
+                         upper_right: tuple[float, float]) -> set[int]:
+        """ Return the positions in the indexed list of the calls returned by
+        within(<lower_left>, <upper_right>).
+        """
+        low_x = max(lower_left[0], self.lower_left[0])
+        low_y = max(lower_left[1], self.lower_left[1])
+        high_x = min(upper_right[0], self.upper_right[0])
+        high_y = min(upper_right[1], self.upper_right[1])
+        if not (low_x <= high_x and low_y <= high_y):
+            return set()
+
+        first_column = self._column(low_x)
+        last_column = self._column(high_x)
+        xs, ys, positions = self._xs, self._ys, self._positions
+        matches = set()
+        for row in range(self._row(low_y), self._row(high_y) + 1):
+            # the cells of a row are contiguous
+            start = self._cell_starts[row * self._side + first_column]
+            stop = self._cell_starts[row * self._side + last_column + 1]
+            for i in range(start, stop):
+                if low_x <= xs[i] <= high_x and low_y <= ys[i] <= high_y:
+                    matches.add(positions[i])
+        return matches
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'array', 'bisect', 'math', 'call'
+        ],
+        'generated-members': 'pygame.*'
+    })
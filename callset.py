@@ -0,0 +1,339 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the CallSpace and CallSet classes, which represent the
+results of the filters as bitmaps, so that they can be combined with any set
+operation, and not only narrowed one filter after another.
+
+A CallSpace numbers all the calls of the customers once, from 0, in the order
+ResetFilter returns them: these numbers are the call ids. A CallSet is a set
+of calls of a CallSpace, stored as a bitmap whose bit i is set if the call
+with id i is in the set. The bitmap is a Python int, so the set operations
+(& for AND, | for OR, ^ for XOR, - for difference and ~ for NOT) run in C, a
+machine word at a time, and a set of a million calls takes 125 kB at most.
+Filter.bitmap() returns the CallSet of the calls matching a filter.
+
+The customers of a dataset share the CallSpace returned by space_for(), which
+is kept by their PhoneRegistry, so that the indexes of its calls are built
+once for the whole dataset, and not for each list of calls a filter is
+applied to.
+"""
+import sys
+import threading
+from array import array
+from typing import Callable, Iterable, Iterator, Optional
+
+from call import Call
+from callhistory import CallHistory
+from callindex import CallIndex
+from customer import Customer
+from registry import shared_registry
+
+# Serializes the creation of the spaces and of their indexes, as the
+# visualizer applies a filter to parts of the calls in several threads
+_LOCK = threading.Lock()
+
+
+class CallSpace:
+    """ The numbering of all the calls of the customers by call id.
+
+    The space also keeps the indexes built over its calls by the filters, so
+    that they are built once, whatever the number of queries.
+
+    === Public Attributes ===
+    customers:
+         all the customers from the input dataset
+    calls:
+         all the calls of the customers, each at the index of its call id
+    """
+    customers: list[Customer]
+    calls: list[Call]
+    # === Private Attributes ===
+    # _ids:
+    #     maps the id() of each call of the space to its call id
+    # _indexes:
+    #     the indexes built over the calls, by name
+    # _histories:
+    #     the call histories of the phone lines of the customers
+    # _call_count:
+    #     the number of calls in the _histories when the space was created
+    _ids: dict[int, int]
+    _indexes: dict[str, CallIndex]
+    _histories: list[CallHistory]
+    _call_count: int
+
+    def __init__(self, customers: list[Customer]) -> None:
+        """ Create the space of the calls of the <customers>.
+        """
+        self.customers = customers
+        # only take outgoing calls, to include each call once, as ResetFilter
+        self.calls = [call for customer in customers
+                      for call in customer.get_history()[0]]
+        self._ids = {id(call): i for i, call in enumerate(self.calls)}
+        self._indexes = {}
+        self._histories = [history for customer in customers
+                           for history in customer.get_call_history()]
+        self._call_count = sum(map(CallHistory.get_call_count,
+                                   self._histories))
+
+    def is_current(self) -> bool:
+        """ Return whether no call was added to the histories of the phone
+        lines of the customers since this space was created. The phone lines
+        themselves must not have changed.
+
+        This takes time proportional to the number of phone lines, and not to
+        the number of calls.
+        """
+        return sum(map(CallHistory.get_call_count, self._histories)) == \
+            self._call_count
+
+    def __len__(self) -> int:
+        """ Return the number of calls in this space.
+        """
+        return len(self.calls)
+
+    def get_index(self, name: str,
+                  build: Callable[[list[Call]], CallIndex]) -> CallIndex:
+        """ Return the index called <name> over the calls of this space,
+        creating it with build(calls) the first time it is requested.
+        """
+        index = self._indexes.get(name)
+        if index is None:
+            with _LOCK:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = build(self.calls)
+                    self._indexes[name] = index
+        return index
+
+    def get_call_id(self, call: Call) -> int:
+        """ Return the call id of <call>, or -1 if it is not in this space.
+        """
+        return self._ids.get(id(call), -1)
+
+    def get_call_ids(self, calls: list[Call]) -> list[int]:
+        """ Return the call id of each of the <calls>, or -1 for the calls
+        which are not in this space.
+        """
+        ids = self._ids
+        return [ids.get(id(call), -1) for call in calls]
+
+    def everything(self) -> 'CallSet':
+        """ Return the set of all the calls of this space.
+        """
+        return CallSet(self, (1 << len(self.calls)) - 1)
+
+    def nothing(self) -> 'CallSet':
+        """ Return the empty set of calls of this space.
+        """
+        return CallSet(self, 0)
+
+    def from_call_ids(self, call_ids: Iterable[int]) -> 'CallSet':
+        """ Return the set of the calls with <call_ids>.
+
+        This takes time proportional to the number of <call_ids>, plus the
+        time to create a bitmap of the size of this space.
+        """
+        buffer = bytearray((len(self.calls) + 7) // 8)
+        for i in call_ids:
+            buffer[i >> 3] |= 1 << (i & 7)
+        return CallSet(self, int.from_bytes(buffer, 'little'))
+
+    def from_calls(self, calls: Iterable[Call]) -> 'CallSet':
+        """ Return the set of the <calls> which are in this space.
+        """
+        ids = self._ids
+        return self.from_call_ids(ids[id(call)] for call in calls
+                                  if id(call) in ids)
+
+    def where(self, predicate: Callable[[Call], bool]) -> 'CallSet':
+        """ Return the set of the calls of this space which match
+        <predicate>.
+        """
+        return self.from_call_ids(i for i, call in enumerate(self.calls)
+                                  if predicate(call))
+
+
+def space_for(customers: list[Customer]) -> Optional[CallSpace]:
+    """ Return the CallSpace of all the calls of the <customers>, or None if
+    they do not share a PhoneRegistry (see registry.shared_registry).
+
+    The space is kept by the registry, and only created again once calls were
+    added to the histories of the <customers>, or their phone lines changed,
+    so that its indexes are reused by all the filters applied to the calls of
+    the same dataset.
+    """
+    registry = shared_registry(customers)
+    if registry is None:
+        return None
+    with _LOCK:
+        version = registry.get_lines_version()
+        if registry.call_space is None or \
+                registry.call_space[0] != version or \
+                not registry.call_space[1].is_current():
+            registry.call_space = (version, CallSpace(customers))
+    return registry.call_space[1]
+
+
+class CallSet:
+    """ An immutable set of calls of a CallSpace, as a bitmap over their call
+    ids.
+
+    === Public Attributes ===
+    space:
+         the space of the calls of this set
+    bits:
+         the bitmap of the call ids of the calls of this set
+    """
+    space: CallSpace
+    bits: int
+    # === Private Attributes ===
+    # _bytes:
+    #     the bitmap as bytes, in little-endian order, so that the bit of
+    #     call id i is bit i % 8 of byte i // 8, or None until it is needed
+    _bytes: Optional[bytes]
+
+    def __init__(self, space: CallSpace, bits: int) -> None:
+        """ Create the set of the calls of <space> whose call ids are set in
+        the bitmap <bits>.
+        """
+        self.space = space
+        self.bits = bits
+        self._bytes = None
+
+    def _get_bytes(self) -> bytes:
+        """ Return the bitmap of this set as bytes, so that testing a bit
+        takes constant time, and not time proportional to the size of the
+        bitmap as shifting <bits> does.
+        """
+        if self._bytes is None:
+            self._bytes = self.bits.to_bytes((len(self.space) + 7) // 8,
+                                             'little')
+        return self._bytes
+
+    def _check_space(self, other: 'CallSet') -> None:
+        """ Raise a ValueError if <other> is not a set of the same space as
+        this set.
+        """
+        if other.space is not self.space:
+            raise ValueError('cannot combine sets of calls of different '
+                             'spaces')
+
+    def __and__(self, other: 'CallSet') -> 'CallSet':
+        """ Return the set of the calls which are in both sets.
+        """
+        self._check_space(other)
+        return CallSet(self.space, self.bits & other.bits)
+
+    def __or__(self, other: 'CallSet') -> 'CallSet':
+        """ Return the set of the calls which are in either set.
+        """
+        self._check_space(other)
+        return CallSet(self.space, self.bits | other.bits)
+
+    def __xor__(self, other: 'CallSet') -> 'CallSet':
+        """ Return the set of the calls which are in exactly one of the sets.
+        """
+        self._check_space(other)
+        return CallSet(self.space, self.bits ^ other.bits)
+
+    def __sub__(self, other: 'CallSet') -> 'CallSet':
+        """ Return the set of the calls of this set which are not in <other>.
+        """
+        self._check_space(other)
+        return CallSet(self.space, self.bits & ~other.bits)
+
+    def __invert__(self) -> 'CallSet':
+        """ Return the set of the calls of the space which are not in this
+        set.
+        """
+        return CallSet(self.space,
+                       self.bits ^ ((1 << len(self.space)) - 1))
+
+    def __eq__(self, other: object) -> bool:
+        """ Return whether <other> is a set of the same calls of the same
+        space.
+        """
+        return isinstance(other, CallSet) and other.space is self.space and \
+            other.bits == self.bits
+
+    def __hash__(self) -> int:
+        """ Return a hash of this set.
+        """
+        return hash(self.bits)
+
+    def __len__(self) -> int:
+        """ Return the number of calls in this set.
+        """
+        return self.bits.bit_count()
+
+    def __contains__(self, call: Call) -> bool:
+        """ Return whether <call> is in this set.
+        """
+        i = self.space.get_call_id(call)
+        return i >= 0 and self._get_bytes()[i >> 3] >> (i & 7) & 1 == 1
+
+    def call_ids(self) -> Iterator[int]:
+        """ Return an iterator over the call ids of the calls of this set, in
+        increasing order.
+        """
+        words = array('Q')
+        words.frombytes(self.bits.to_bytes(
+            (self.bits.bit_length() + 63) // 64 * words.itemsize,
+            sys.byteorder))
+        for position, word in enumerate(words):
+            while word:
+                low = word & -word
+                yield position * 64 + low.bit_length() - 1
+                word ^= low
+
+    def __iter__(self) -> Iterator[Call]:
+        """ Return an iterator over the calls of this set, in the order of
+        their call ids.
+        """
+        calls = self.space.calls
+        for i in self.call_ids():
+            yield calls[i]
+
+    def to_list(self) -> list[Call]:
+        """ Return a list of the calls of this set, in the order of their call
+        ids, which is the order ResetFilter returns them in.
+        """
+        return list(self)
+
+    def select(self, data: list[Call]) -> list[Call]:
+        """ Return the calls of <data> which are in this set, in the order of
+        <data>.
+        """
+        ids = self.space.get_call_id
+        bitmap = self._get_bytes()
+        selected = []
+        for call in data:
+            i = ids(call)
+            if i >= 0 and bitmap[i >> 3] >> (i & 7) & 1:
+                selected.append(call)
+        return selected
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'sys', 'threading', 'array', 'call',
+            'callhistory', 'callindex', 'customer', 'registry'
+        ],
+        'generated-members': 'pygame.*'
+    })
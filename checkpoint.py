@@ -0,0 +1,109 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the checkpoints used for the incremental processing of a
+growing event log: the billing state of all the customers (bills, contracts
+and call histories), saved together with the Watermark recording how much of
+the log has been processed, so that the next run only processes the events
+appended to the log since then. Checkpoints are stored as snapshots.
+"""
+import datetime
+from typing import Optional
+
+from customer import Customer
+from snapshot import read_snapshot, write_snapshot
+
+
+class Watermark:
+    """ The position in an append-only event log up to which the events have
+    been processed.
+
+    === Public Attributes ===
+    count:
+         the number of events from the start of the log processed so far
+    time:
+         date and time of the last processed event, or None if no event has
+         been processed
+    offset:
+         byte offset in the log file of the last processed event, or None if
+         no event has been processed
+
+    === Representation Invariants ===
+    - count >= 0
+    - time is None if and only if count == 0
+    - offset is None if and only if count == 0
+    """
+    count: int
+    time: Optional[datetime.datetime]
+    offset: Optional[int]
+
+    def __init__(self, count: int = 0,
+                 time: Optional[datetime.datetime] = None,
+                 offset: Optional[int] = None) -> None:
+        """ Create a new Watermark after the first <count> events of a log, the
+        last of which happened at <time> and is at the byte <offset> of the
+        log file.
+        """
+        self.count = count
+        self.time = time
+        self.offset = offset
+
+    def advance(self, time: datetime.datetime, offset: int) -> None:
+        """ Record that one more event, which happened at <time> and is at the
+        byte <offset> of the log file, has been processed.
+        """
+        self.count += 1
+        self.time = time
+        self.offset = offset
+
+    def __eq__(self, other: object) -> bool:
+        """ Return whether <other> is a Watermark at the same position.
+        """
+        return isinstance(other, Watermark) and \
+            (self.count, self.time, self.offset) == \
+            (other.count, other.time, other.offset)
+
+
+def save_checkpoint(path: str, customers: list[Customer],
+                    watermark: Watermark) -> None:
+    """ Save the <customers>, with their bills, contracts and call histories,
+    and the <watermark> up to which their events were processed, into the
+    checkpoint file <path>.
+    """
+    write_snapshot(path, (customers, watermark))
+
+
+def load_checkpoint(path: str) -> tuple[list[Customer], Watermark]:
+    """ Return the customers and the watermark saved in the checkpoint file
+    <path>.
+
+    Raise a ValueError if <path> is not a valid snapshot.
+
+    Precondition: <path> was written by save_checkpoint(), from a trusted
+    source.
+    """
+    customers, watermark = read_snapshot(path)
+    return customers, watermark
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'datetime', 'customer', 'snapshot'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,365 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the ColumnarCallHistory class, a CallHistory which stores
+the outgoing and incoming calls of a phone line in columns sorted by time:
+the Call objects themselves, and NumPy arrays of their times and durations.
+Since the calls are sorted, the calls of each month are a contiguous range of
+the columns, and the history only records the offsets of each month.
+
+get_monthly_view() returns CallViews: read-only sequences over a range of the
+columns, whose times and durations are NumPy views, without copying any call.
+The CallHistory interface (register_outgoing_call, register_incoming_call,
+get_monthly_history and the outgoing_calls and incoming_calls dictionaries)
+is still available, for the code which expects lists of calls.
+"""
+import datetime
+from typing import Iterator, Mapping, Optional, Sequence, Union, overload
+
+import numpy as np
+
+from call import Call
+from callhistory import CallHistory, CallUsage
+
+# Initial number of calls the columns have room for
+_INITIAL_CAPACITY = 16
+
+
+class CallView(Sequence[Call]):
+    """ A read-only view of a range of the calls of a call history, in
+    chronological order, which does not copy the calls.
+
+    The view covers the calls registered when it was created. It must not be
+    used after a call older than the last one of the history is registered.
+
+    === Public Attributes ===
+    start:
+         index of the first call of the view in its columns
+    stop:
+         index after the last call of the view in its columns
+    """
+    start: int
+    stop: int
+    # === Private Attributes ===
+    # _columns:
+    #     the columns this view is a range of
+    _columns: '_CallColumns'
+
+    def __init__(self, columns: '_CallColumns', start: int, stop: int) \
+            -> None:
+        """ Create a view of the calls of <columns> from index <start> to
+        index <stop> (excluded).
+        """
+        self._columns = columns
+        self.start = start
+        self.stop = stop
+
+    @property
+    def times(self) -> np.ndarray:
+        """ The times of the calls of this view, as a datetime64 array view.
+        """
+        return self._columns.times[self.start:self.stop]
+
+    @property
+    def durations(self) -> np.ndarray:
+        """ The durations of the calls of this view, in seconds, as an array
+        view.
+        """
+        return self._columns.durations[self.start:self.stop]
+
+    def __len__(self) -> int:
+        """ Return the number of calls in this view.
+        """
+        return self.stop - self.start
+
+    @overload
+    def __getitem__(self, index: int) -> Call:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> 'CallView':
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) \
+            -> Union[Call, 'CallView']:
+        """ Return the call at <index> in this view, or a narrower view if
+        <index> is a slice (without a step).
+        """
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError('CallView slices cannot have a step')
+            return CallView(self._columns, self.start + start,
+                            self.start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('CallView index out of range')
+        return self._columns.calls[self.start + index]
+
+    def __iter__(self) -> Iterator[Call]:
+        """ Return an iterator over the calls of this view, in order.
+        """
+        calls = self._columns.calls
+        for index in range(self.start, self.stop):
+            yield calls[index]
+
+    def to_list(self) -> list[Call]:
+        """ Return a new list of the calls of this view.
+        """
+        return self._columns.calls[self.start:self.stop]
+
+
+class _CallColumns:
+    """ The calls of one direction (outgoing or incoming) of a call history,
+    sorted by time, in columns.
+
+    === Public Attributes ===
+    calls:
+         the Call objects, in chronological order
+    times:
+         the times of the calls (datetime64, in seconds); only the first
+         len(calls) entries are used
+    durations:
+         the durations of the calls, in seconds; only the first len(calls)
+         entries are used
+    months:
+         maps each (month, year) to the range of indices of its calls, as a
+         (start, stop) tuple
+    """
+    calls: list[Call]
+    times: np.ndarray
+    durations: np.ndarray
+    months: dict[tuple[int, int], tuple[int, int]]
+
+    def __init__(self) -> None:
+        """ Create empty columns.
+        """
+        self.calls = []
+        self.times = np.empty(_INITIAL_CAPACITY, dtype='datetime64[s]')
+        self.durations = np.empty(_INITIAL_CAPACITY, dtype=np.int32)
+        self.months = {}
+
+    def add(self, call: Call) -> None:
+        """ Add <call> to these columns, keeping them sorted by time.
+
+        This takes constant amortized time if <call> is not older than the
+        calls already added. Otherwise, the calls after it are moved in the
+        columns, and only the ranges of the months after it are updated.
+        """
+        size = len(self.calls)
+        if size == len(self.times):
+            self.times = np.resize(self.times, 2 * size)
+            self.durations = np.resize(self.durations, 2 * size)
+        key = call.get_bill_date()
+        if not self.calls or self.calls[-1].time <= call.time:
+            self.calls.append(call)
+            self.times[size] = call.time
+            self.durations[size] = call.duration
+            start, _ = self.months.get(key, (size, size))
+            self.months[key] = (start, size + 1)
+            return
+
+        # an older call: insert it at its place, and shift the ranges of the
+        # months after it
+        position = int(np.searchsorted(self.times[:size],
+                                       np.datetime64(call.time, 's'),
+                                       side='right'))
+        self.calls.insert(position, call)
+        self.times[position + 1:size + 1] = self.times[position:size]
+        self.durations[position + 1:size + 1] = self.durations[position:size]
+        self.times[position] = call.time
+        self.durations[position] = call.duration
+        for month, (start, stop) in self.months.items():
+            if month == key:
+                self.months[month] = (start, stop + 1)
+            elif start >= position:
+                self.months[month] = (start + 1, stop + 1)
+        if key not in self.months:
+            # a new month, which must be iterated over in chronological order
+            self.months[key] = (position, position + 1)
+            self.months = dict(sorted(self.months.items(),
+                                      key=lambda item: item[1]))
+
+    def view(self, month: Optional[int] = None,
+             year: Optional[int] = None) -> CallView:
+        """ Return a view of the calls of <month> and <year>, or of all the
+        calls if they are both None.
+        """
+        if month is None and year is None:
+            return CallView(self, 0, len(self.calls))
+        start, stop = self.months.get((month, year), (0, 0))
+        return CallView(self, start, stop)
+
+    def between(self, start: Optional[datetime.datetime],
+                end: Optional[datetime.datetime]) -> CallView:
+        """ Return a view of the calls made at or after <start> and before
+        <end>, where a None bound leaves that side of the range open.
+        """
+        times = self.times[:len(self.calls)]
+        low = 0 if start is None else int(np.searchsorted(
+            times, np.datetime64(start, 'us'), side='left'))
+        high = len(times) if end is None else int(np.searchsorted(
+            times, np.datetime64(end, 'us'), side='left'))
+        return CallView(self, low, max(low, high))
+
+
+class _MonthlyCalls(Mapping[tuple[int, int], list[Call]]):
+    """ A read-only dictionary of the calls of some columns, by (month, year),
+    as CallHistory.outgoing_calls and CallHistory.incoming_calls are.
+    """
+    # === Private Attributes ===
+    # _columns:
+    #     the columns of the calls
+    _columns: _CallColumns
+
+    def __init__(self, columns: _CallColumns) -> None:
+        """ Create a dictionary of the calls of <columns>.
+        """
+        self._columns = columns
+
+    def __getitem__(self, key: tuple[int, int]) -> list[Call]:
+        """ Return a list of the calls of the (month, year) <key>.
+        """
+        start, stop = self._columns.months[key]
+        return self._columns.calls[start:stop]
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        """ Return an iterator over the months with calls, in order.
+        """
+        return iter(self._columns.months)
+
+    def __len__(self) -> int:
+        """ Return the number of months with calls.
+        """
+        return len(self._columns.months)
+
+
+class ColumnarCallHistory(CallHistory):
+    """ A CallHistory storing its calls in columns sorted by time.
+
+    outgoing_calls and incoming_calls are read-only dictionaries, computed
+    from the columns: calls must be added with register_outgoing_call and
+    register_incoming_call.
+    """
+    # === Private Attributes ===
+    # _outgoing:
+    #     the columns of the outgoing calls
+    # _incoming:
+    #     the columns of the incoming calls
+    _outgoing: _CallColumns
+    _incoming: _CallColumns
+
+    def __init__(self) -> None:
+        """ Create an empty ColumnarCallHistory.
+        """
+        # outgoing_calls and incoming_calls are properties here, and the
+        # columns are sorted by time already, so neither the dictionaries nor
+        # the time index of CallHistory.__init__ are created
+        # pylint: disable=super-init-not-called
+        self._outgoing = _CallColumns()
+        self._incoming = _CallColumns()
+        self._usage = {}
+        self._total_usage = CallUsage()
+
+    @property
+    def outgoing_calls(self) -> Mapping[tuple[int, int], list[Call]]:
+        """ The outgoing calls, by (month, year).
+        """
+        return _MonthlyCalls(self._outgoing)
+
+    @property
+    def incoming_calls(self) -> Mapping[tuple[int, int], list[Call]]:
+        """ The incoming calls, by (month, year).
+        """
+        return _MonthlyCalls(self._incoming)
+
+    def register_outgoing_call(self, call: Call) -> None:
+        """ Register a Call <call> into this outgoing call history
+        """
+        self._outgoing.add(call)
+        self._month_usage(call).add_outgoing_call(call)
+        self._total_usage.add_outgoing_call(call)
+
+    def register_incoming_call(self, call: Call) -> None:
+        """ Register a Call <call> into this incoming call history
+        """
+        self._incoming.add(call)
+        self._month_usage(call).add_incoming_call(call)
+        self._total_usage.add_incoming_call(call)
+
+    def get_monthly_view(self, month: int = None, year: int = None) -> \
+            tuple[CallView, CallView]:
+        """ Return views of all outgoing and incoming calls for <month> and
+        <year>, in chronological order, as a tuple in the following order:
+        (outgoing calls, incoming calls)
+
+        If <month> and <year> are both None, then return views of all the calls
+        from this call history.
+
+        Precondition: <month> and <year> are either both specified, or are both
+        missing/None
+        """
+        return self._outgoing.view(month, year), \
+            self._incoming.view(month, year)
+
+    def get_calls_between(self, start: Optional[datetime.datetime] = None,
+                          end: Optional[datetime.datetime] = None) \
+            -> tuple[Iterator[Call], Iterator[Call]]:
+        """ Return iterators over the outgoing and incoming calls made at or
+        after <start> and before <end>, in chronological order, as a tuple in
+        the following order: (outgoing calls, incoming calls)
+
+        A missing/None <start> or <end> leaves that side of the range open.
+        This takes O(log n) time, plus constant time per call iterated over.
+        """
+        outgoing, incoming = self.get_views_between(start, end)
+        return iter(outgoing), iter(incoming)
+
+    def get_views_between(self, start: Optional[datetime.datetime] = None,
+                          end: Optional[datetime.datetime] = None) \
+            -> tuple[CallView, CallView]:
+        """ Return views of the outgoing and incoming calls made at or after
+        <start> and before <end>, like get_calls_between().
+        """
+        return self._outgoing.between(start, end), \
+            self._incoming.between(start, end)
+
+    def get_monthly_history(self, month: int = None, year: int = None) -> \
+            tuple[list[Call], list[Call]]:
+        """ Return all outgoing and incoming calls for <month> and <year>,
+        as a Tuple containing two lists in the following order:
+        (outgoing calls, incoming calls)
+
+        If <month> and <year> are both None, then return all calls from this
+        call history.
+
+        Precondition:
+        - <month> and <year> are either both specified, or are both missing/None
+        """
+        outgoing, incoming = self.get_monthly_view(month, year)
+        return outgoing.to_list(), incoming.to_list()
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'datetime', 'numpy', 'call',
+            'callhistory'
+        ],
+        'generated-members': 'pygame.*'
+    })
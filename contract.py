@@ -14,25 +14,32 @@ Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 import datetime
 from math import ceil
 from typing import Optional
-from bill import Bill
+from bill import Bill, to_dollars, to_mills
 from call import Call
 
+# All the amounts of money are in mills (thousandths of a dollar), see bill.py
+
 # Constants for the month-to-month contract monthly fee and term deposit
-MTM_MONTHLY_FEE = 50.00
-TERM_MONTHLY_FEE = 20.00
-TERM_DEPOSIT = 300.00
+MTM_MONTHLY_FEE = 50000
+TERM_MONTHLY_FEE = 20000
+TERM_DEPOSIT = 300000
 
 # Constants for the included minutes and SMSs in the term contracts (per month)
 TERM_MINS = 100
 
 # Cost per minute and per SMS in the month-to-month contract
-MTM_MINS_COST = 0.05
+MTM_MINS_COST = 50
 
 # Cost per minute and per SMS in the term contract
-TERM_MINS_COST = 0.1
+TERM_MINS_COST = 100
 
 # Cost per minute and per SMS in the prepaid contract
-PREPAID_MINS_COST = 0.025
+PREPAID_MINS_COST = 25
+
+# The balance over which a prepaid contract is topped up, and the amount of a
+# top-up (balances are negative when the customer has credit)
+PREPAID_TOP_UP_LIMIT = -10000
+PREPAID_TOP_UP = 25000
 
 
 class Contract:
@@ -86,7 +93,7 @@ class Contract:
         exists for the right month+year when the cancelation is requested.
         """
         self.start = None
-        return self.bill.get_cost()
+        return to_dollars(self.bill.get_cost_mills())
 
 
 class TermContract(Contract):
@@ -171,11 +178,11 @@ class TermContract(Contract):
         self.start = None
 
         if self.date > (self.end.year, self.end.month):
-            return self.bill.get_cost() - TERM_DEPOSIT
+            return to_dollars(self.bill.get_cost_mills() - TERM_DEPOSIT)
 
         # early cancel / no deposit refund
         else:
-            return self.bill.get_cost()
+            return to_dollars(self.bill.get_cost_mills())
 
 
 class MTMContract(Contract):
@@ -224,18 +231,18 @@ class PrepaidContract(Contract):
          bill for this contract for the last month of call records loaded from
          the input dataset
     balance:
-         the amount of money that the customer owes.
+         the amount of money that the customer owes, in mills.
     """
     start: datetime.date
     bill: Optional[Bill]
-    balance: float
+    balance: int
 
     def __init__(self, start: datetime.date, balance: float) -> None:
-        """ Create a new Contract with the <start> date and balance.
-        Starts as inactive
+        """ Create a new Contract with the <start> date and a credit of
+        <balance> dollars. Starts as inactive
         """
         super().__init__(start)
-        self.balance = -balance
+        self.balance = -to_mills(balance)
         self.bill = None
 
     def new_month(self, month: int, year: int, bill: Bill) -> None:
@@ -249,12 +256,12 @@ class PrepaidContract(Contract):
         if self.start.month != month or self.start.year != year:
             # Carry balance
             if self.bill:
-                self.balance = self.bill.get_cost()
+                self.balance = self.bill.get_cost_mills()
             # top up
-            if self.balance > -10:
-                self.balance -= 25
+            if self.balance > PREPAID_TOP_UP_LIMIT:
+                self.balance -= PREPAID_TOP_UP
         self.bill = bill
-        self.bill.set_rates("PREPAID", 0.025)
+        self.bill.set_rates("PREPAID", PREPAID_MINS_COST)
         self.bill.add_fixed_cost(self.balance)
 
     def bill_call(self, call: Call) -> None:
@@ -279,7 +286,7 @@ class PrepaidContract(Contract):
         exists for the right month+year when the cancelation is requested.
         """
         self.start = None
-        return max(self.balance, 0)
+        return to_dollars(max(self.balance, 0))
 
 
 if __name__ == '__main__':
@@ -11,10 +11,16 @@ any changes, are expressly prohibited.
 All of the files in this directory and all subdirectories are:
 Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
-from typing import Union
+import datetime
+from heapq import merge
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, Union
 from phoneline import PhoneLine
+from bill import to_dollars
 from call import Call
-from callhistory import CallHistory
+from callhistory import CallHistory, CallUsage
+
+if TYPE_CHECKING:
+    from registry import PhoneRegistry
 
 
 class Customer:
@@ -24,16 +30,43 @@ class Customer:
     # === Private Attributes ===
     # _id:
     #     this customer's 4 digit Customer id
-    # _phone_lines:
-    #     this customer's phone lines
+    # _lines:
+    #     maps the number of each of this customer's phone lines to that
+    #     PhoneLine, in the order the lines were added
+    # _registry:
+    #     the PhoneRegistry this customer keeps up to date with its phone
+    #     lines, or None
+    # _lines_version:
+    #     the number of times a phone line was added or cancelled
+    # _history:
+    #     the last result of get_history(), with the version of the phone
+    #     lines and the number of calls in their histories it was computed
+    #     for, or None
     _id: int
-    _phone_lines: list[PhoneLine]
+    _lines: dict[str, PhoneLine]
+    _registry: Optional['PhoneRegistry']
+    _lines_version: int
+    _history: Optional[tuple[tuple[int, int],
+                             tuple[tuple[Call, ...], tuple[Call, ...]]]]
 
-    def __init__(self, cid: int) -> None:
-        """ Create a new Customer with the <cid> id
+    def __init__(self, cid: int, registry: Optional['PhoneRegistry'] = None) \
+            -> None:
+        """ Create a new Customer with the <cid> id, which records its phone
+        lines in <registry>, if any.
         """
         self._id = cid
-        self._phone_lines = []
+        self._lines = {}
+        self._registry = registry
+        self._lines_version = 0
+        self._history = None
+        if registry is not None:
+            registry.add_customer(self)
+
+    @property
+    def _phone_lines(self) -> Iterable[PhoneLine]:
+        """ This customer's phone lines, in the order they were added.
+        """
+        return self._lines.values()
 
     def new_month(self, month: int, year: int) -> None:
         """ Advance to a new month (specified by <month> and <year>) in the
@@ -52,10 +85,9 @@ class Customer:
         <call>, is owned by this customer
         """
         # find the correct phone line
-        for phoneline in self._phone_lines:
-            if call.src_number == phoneline.get_number():
-                # make call
-                phoneline.make_call(call)
+        phoneline = self._lines.get(call.src_number)
+        if phoneline is not None:
+            phoneline.make_call(call)
 
     def receive_call(self, call: Call) -> None:
         """ Record that a call was made to the destination phone number of
@@ -64,22 +96,22 @@ class Customer:
         Precondition: The phone line associated with the destination phone
         number of <call>, is owned by this customer
         """
-        for phoneline in self._phone_lines:
-            if call.dst_number == phoneline.get_number():
-                # make call
-                phoneline.receive_call(call)
+        phoneline = self._lines.get(call.dst_number)
+        if phoneline is not None:
+            phoneline.receive_call(call)
 
     def cancel_phone_line(self, number: str) -> Union[float, None]:
         """ Remove PhoneLine with number <number> from this customer and return
         the amount still owed by this customer.
         Return None if <number> is not owned by this customer.
         """
-        fee = None
-        for pl in self._phone_lines:
-            if pl.get_number() == number:
-                self._phone_lines.remove(pl)
-                fee = pl.cancel_line()
-        return fee
+        pl = self._lines.pop(number, None)
+        if pl is None:
+            return None
+        self._lines_version += 1
+        if self._registry is not None:
+            self._registry.unregister(number)
+        return pl.cancel_line()
 
     # ----------------------------------------------------------
     # NOTE: You do not need to understand the implementation of
@@ -90,15 +122,36 @@ class Customer:
     def add_phone_line(self, pline: PhoneLine) -> None:
         """ Add a new PhoneLine to this customer.
         """
-        self._phone_lines.append(pline)
+        self._lines[pline.get_number()] = pline
+        self._lines_version += 1
+        if self._registry is not None:
+            self._registry.register(self, pline)
+
+    def get_registry(self) -> Optional['PhoneRegistry']:
+        """ Return the PhoneRegistry this customer records its phone lines in,
+        or None if there is no such registry.
+        """
+        return self._registry
+
+    def set_registry(self, registry: 'PhoneRegistry') -> None:
+        """ Record this customer and all of its phone lines in <registry>, and
+        keep it up to date from now on.
+        """
+        self._registry = registry
+        registry.add_customer(self)
+        for line in self._phone_lines:
+            registry.register(self, line)
+
+    def get_phone_line(self, number: str) -> Optional[PhoneLine]:
+        """ Return the phone line with <number> of this customer, or None if
+        this customer does not own <number>.
+        """
+        return self._lines.get(number)
 
     def get_phone_numbers(self) -> list[str]:
         """ Return a list of all the numbers this customer owns
         """
-        numbers = []
-        for line in self._phone_lines:
-            numbers.append(line.get_number())
-        return numbers
+        return list(self._lines)
 
     def get_id(self) -> int:
         """ Return the id for this customer
@@ -108,17 +161,15 @@ class Customer:
     def __contains__(self, item: str) -> bool:
         """ Check if this customer owns the phone number <item>
         """
-        contains = False
-        for line in self._phone_lines:
-            if line.get_number() == item:
-                contains = True
-        return contains
+        return item in self._lines
 
     def generate_bill(self, month: int, year: int) \
             -> tuple[int, float, list[dict]]:
         """ Return a bill summary for the <month> and <year> billing cycle,
         as a Tuple containing the customer id, total cost for all phone lines,
         and a List of bill summaries generated for each phone line.
+
+        The total is the exact sum of the bills, which are added in mills.
         """
         bills = []
         total = 0
@@ -126,8 +177,8 @@ class Customer:
             line_bill = line.get_bill(month, year)
             if line_bill is not None:
                 bills.append(line_bill)
-                total += line_bill['total']
-        return self._id, total, bills
+                total += line.get_bill_cost(month, year)
+        return self._id, to_dollars(total), bills
 
     def print_bill(self, month: int, year: int) -> None:
         """ Print the bill for the <month> and <year> billing cycle, to the
@@ -148,38 +199,83 @@ class Customer:
         print("==========================")
 
     def get_history(self) \
-            -> tuple[list[Call], list[Call]]:
+            -> tuple[tuple[Call, ...], tuple[Call, ...]]:
         """ Return all the calls from the call history of this
         customer, as a tuple in the following format:
         (outgoing calls, incoming calls)
+
+        The result is cached until a call is registered in the history of one
+        of the phone lines, or a phone line is added or cancelled.
         """
-        history = ([], [])
+        key = (self._lines_version,
+               sum(line.get_call_history().get_call_count()
+                   for line in self._phone_lines))
+        if self._history is None or self._history[0] != key:
+            outgoing = []
+            incoming = []
+            for line in self._phone_lines:
+                line_history = line.get_monthly_history()
+                outgoing.extend(line_history[0])
+                incoming.extend(line_history[1])
+            self._history = (key, (tuple(outgoing), tuple(incoming)))
+        return self._history[1]
+
+    def get_calls_between(self, start: Optional[datetime.datetime] = None,
+                          end: Optional[datetime.datetime] = None) \
+            -> tuple[Iterator[Call], Iterator[Call]]:
+        """ Return iterators over the calls made and received by the phone
+        lines of this customer at or after <start> and before <end>, in
+        chronological order, as a tuple in the following format:
+        (outgoing calls, incoming calls)
+
+        A missing/None <start> or <end> leaves that side of the range open.
+        """
+        ranges = [line.get_calls_between(start, end)
+                  for line in self._phone_lines]
+        return merge(*[outgoing for outgoing, _ in ranges],
+                     key=_call_time), \
+            merge(*[incoming for _, incoming in ranges], key=_call_time)
+
+    def get_usage(self, month: int = None, year: int = None) -> CallUsage:
+        """ Return the number and duration of the calls made and received by
+        all the phone lines of this customer during the <month> month of the
+        <year> year, as a CallUsage. This takes constant time per phone line.
+
+        If month and year are both None, then return the usage of all the
+        calls from the call history of this customer.
+
+        Precondition: <month> and <year> are either both specified, or are both
+        missing/None
+        """
+        usage = CallUsage()
         for line in self._phone_lines:
-            line_history = line.get_monthly_history()
-            history[0].extend(line_history[0])
-            history[1].extend(line_history[1])
-        return history
+            usage.add_usage(line.get_usage(month, year))
+        return usage
 
     def get_call_history(self, number: str = None) -> list[CallHistory]:
         """ Return the call history for <number>, stored into a list.
         If <number> is not provided, return a list of all call histories for all
         phone lines owned by this customer.
         """
-        history = []
-        for line in self._phone_lines:
-            if number is not None:
-                if line.get_number() == number:
-                    history.append(line.get_call_history())
-            else:
-                history.append(line.get_call_history())
-        return history
+        if number is not None:
+            if number in self._lines:
+                return [self._lines[number].get_call_history()]
+            return []
+        return [line.get_call_history() for line in self._phone_lines]
+
+
+def _call_time(call: Call) -> datetime.datetime:
+    """ Return the time of <call>.
+    """
+    return call.time
 
 
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'phoneline', 'call', 'callhistory'
+            'python_ta', 'typing', 'datetime', 'heapq', 'phoneline', 'bill',
+            'call', 'callhistory', 'registry'
         ],
         'allowed-io': ['print_bill'],
         'disable': ['R0902', 'R0913'],
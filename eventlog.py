@@ -0,0 +1,284 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the helpers for reading the input dataset incrementally.
+Instead of loading the whole json file into one dictionary, the entries of
+its top-level lists ("events", "customers") are decoded one at a time from a
+bounded buffer, so that very large event logs can be processed with a
+constant amount of memory. The entries are read along with their offset in
+the file, in bytes, so that a later read can start directly at one of them.
+
+It also contains the decoder for the timestamps of the events.
+"""
+import datetime
+import io
+import json
+from typing import Any, Iterator, Optional, TextIO
+
+# Number of characters read from the dataset file at a time
+BUFFER_SIZE = 64 * 1024
+
+# Layout of the timestamps of the events in the dataset
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class _LogReader:
+    """ A bounded buffer over the text of a json dataset file.
+
+    === Private Attributes ===
+    _file:
+         the open dataset file
+    _buffer_size:
+         number of characters to read from <_file> at a time
+    _buffer:
+         text read from <_file> which may not be consumed yet
+    _pos:
+         index of the first character of <_buffer> not consumed yet
+    _eof:
+         whether the whole file has already been read into <_buffer>
+    _counted:
+         index in <_buffer> of the character at the byte offset <_offset>
+    _offset:
+         byte offset in the file of the character <_counted> of <_buffer>
+    """
+    _file: TextIO
+    _buffer_size: int
+    _buffer: str
+    _pos: int
+    _eof: bool
+    _counted: int
+    _offset: int
+
+    def __init__(self, file: TextIO, buffer_size: int,
+                 offset: int = 0) -> None:
+        """ Create a reader over the open <file>, reading <buffer_size>
+        characters at a time. The <file> is read from the byte <offset>.
+        """
+        self._file = file
+        self._buffer_size = buffer_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._counted = 0
+        self._offset = offset
+
+    def tell(self) -> int:
+        """ Return the byte offset in the file of the next character to be
+        consumed.
+
+        Only the text consumed since the previous call is encoded, so that
+        calling this once per entry takes time proportional to the size of
+        the file overall.
+        """
+        self._offset += len(
+            self._buffer[self._counted:self._pos].encode('utf-8'))
+        self._counted = self._pos
+        return self._offset
+
+    def _fill(self) -> bool:
+        """ Drop the consumed text from the buffer and read the next chunk of
+        the file into it. Return False if the file has no more text.
+        """
+        chunk = self._file.read(self._buffer_size)
+        self.tell()
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        self._counted = 0
+        if not chunk:
+            self._eof = True
+        return bool(chunk)
+
+    def peek(self) -> str:
+        """ Skip any whitespace and return the next character, without
+        consuming it. Return the empty string at the end of the file.
+        """
+        while True:
+            while self._pos < len(self._buffer) and \
+                    self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._fill():
+                return self._buffer[self._pos:self._pos + 1]
+
+    def expect(self, char: str) -> None:
+        """ Consume the next non-whitespace character, which must be <char>.
+        """
+        if self.peek() != char:
+            raise ValueError(f'malformed dataset: expected {char!r} at '
+                             f'{self._buffer[self._pos:self._pos + 20]!r}')
+        self._pos += 1
+
+    def decode(self) -> Any:
+        """ Decode and consume the next json value.
+
+        A value is only accepted once some text after it has been read, so that
+        a value cut by the end of the buffer (e.g. a number) is never decoded
+        partially.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if end < len(self._buffer) or self._eof:
+                self._pos = end
+                return value
+            self._fill()
+
+    def items(self, resumed: bool = False) -> Iterator[tuple[int, Any]]:
+        """ Decode and consume the json list starting at the next character,
+        yielding its entries one at a time, each in a tuple with its byte
+        offset in the file.
+
+        If <resumed>, the next character is instead the start of one of the
+        entries of the list, and the entries from this one are yielded.
+        """
+        if not resumed:
+            self.expect('[')
+            if self.peek() == ']':
+                self._pos += 1
+                return
+        while True:
+            self.peek()
+            offset = self.tell()
+            yield offset, self.decode()
+            separator = self.peek()
+            self._pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError('malformed dataset: expected "," or "]"')
+
+
+def decode_timestamp(text: str) -> datetime.datetime:
+    """ Return the date and time in <text>, a timestamp in the TIME_FORMAT
+    layout of the dataset (e.g. "2018-01-01 09:44:14").
+
+    This gives the same result as datetime.strptime(text, TIME_FORMAT), but
+    is many times faster: the layout of the dataset is a subset of ISO 8601,
+    which datetime parses natively instead of interpreting a format string.
+    """
+    return datetime.datetime.fromisoformat(text)
+
+
+def iter_array(path: str, key: str, buffer_size: int = BUFFER_SIZE) \
+        -> Iterator[Any]:
+    """ Yield, one at a time, the entries of the list stored under <key> in the
+    top-level object of the json file <path>.
+
+    The file is read <buffer_size> characters at a time, and the entries of any
+    list stored before <key> are decoded and discarded one by one, so the memory
+    used does not depend on the size of the file.
+    If <key> is not in the file, or is not a list, nothing is yielded.
+
+    Precondition: the file at <path> contains a json object.
+    """
+    for _, entry in iter_entries(path, key, None, buffer_size):
+        yield entry
+
+
+def iter_entries(path: str, key: str, start: Optional[int] = None,
+                 buffer_size: int = BUFFER_SIZE) -> Iterator[tuple[int, Any]]:
+    """ Yield, one at a time, the entries of the list stored under <key> in the
+    top-level object of the json file <path>, as iter_array() does, each in a
+    tuple with its byte offset in the file.
+
+    If <start> is not None, the file is only read from the byte offset
+    <start>, which must be the offset of one of the entries of the list
+    (e.g. yielded by a previous call on the same file, if the file was only
+    appended to since), and the entries from this one are yielded.
+
+    Raise a ValueError if there is no json value at <start>.
+
+    Precondition: the file at <path> is a json object encoded in UTF-8.
+    """
+    with _open(path, start or 0) as file:
+        reader = _LogReader(file, buffer_size, start or 0)
+        if start is not None:
+            yield from reader.items(resumed=True)
+            return
+        for _, offset, entry in _iter_object(reader, key):
+            yield offset, entry
+
+
+def iter_lists(path: str, buffer_size: int = BUFFER_SIZE) \
+        -> Iterator[tuple[str, Any]]:
+    """ Yield, one at a time, the entries of all the lists stored in the
+    top-level object of the json file <path>, in the order they are stored,
+    each in a tuple with the key of its list, so that the whole file is
+    decoded in a single pass. The values which are not lists are skipped.
+
+    Precondition: the file at <path> is a json object encoded in UTF-8.
+    """
+    with _open(path, 0) as file:
+        for name, _, entry in _iter_object(_LogReader(file, buffer_size),
+                                           None):
+            yield name, entry
+
+
+def _open(path: str, start: int) -> TextIO:
+    """ Open the UTF-8 text file <path> from the byte offset <start>.
+    """
+    # the file is closed by the caller, with the returned wrapper
+    # pylint: disable=consider-using-with
+    binary = open(path, 'rb')
+    binary.seek(start)
+    # no newline translation, so that the offsets are those of the file
+    return io.TextIOWrapper(binary, encoding='utf-8', newline='')
+
+
+def _iter_object(reader: _LogReader, key: Optional[str]) \
+        -> Iterator[tuple[str, int, Any]]:
+    """ Yield the entries of the lists stored in the json object starting at
+    the next character of <reader>, each in a tuple with the key of its list
+    and its byte offset in the file.
+
+    If <key> is not None, the entries of the other lists are decoded and
+    discarded, and nothing is read after the list stored under <key>.
+    """
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.decode()
+        reader.expect(':')
+        if reader.peek() == '[':
+            for offset, entry in reader.items():
+                if key is None or name == key:
+                    yield name, offset, entry
+        else:
+            reader.decode()
+        if name == key:
+            return
+        if reader.peek() != ',':
+            return
+        reader.expect(',')
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'datetime', 'io', 'json'
+        ],
+        'allowed-io': ['_open'],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,301 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the EventStore class, a compact binary copy of the events
+of a dataset which is memory-mapped instead of parsed, and the function to
+convert a json dataset into this format.
+
+An event store file contains, in this order:
+- a header: the magic bytes, the format version, the byte order of the
+  columns, the number of events and the size of the metadata
+- the metadata, as utf-8 json: the list of distinct phone numbers (events
+  refer to a number by its index in this list) and the customers of the
+  dataset, exactly as they appear in its json file
+- one column per event attribute, each aligned to 8 bytes:
+  time (int64 seconds since 1970-01-01), type (byte), src and dst (int32
+  number ids), duration (int32, 0 for SMS), then the source longitude,
+  source latitude, destination longitude and destination latitude (float64)
+"""
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Iterator, Optional
+
+import eventlog
+from call import Call
+
+MAGIC = b'CVEVENTS'
+VERSION = 1
+
+# magic, version, byte order (0 = little, 1 = big), event count, metadata size
+_HEADER = struct.Struct('<8sHHQQ')
+_ALIGNMENT = 8
+
+# Codes stored in the type column
+SMS_EVENT = 0
+CALL_EVENT = 1
+
+# Reference point for the time column (timestamps in the dataset are naive)
+EPOCH = datetime.datetime(1970, 1, 1)
+_SECOND = datetime.timedelta(seconds=1)
+
+# Name and array typecode of each column, in the order they are stored
+COLUMNS = [('times', 'q'), ('types', 'B'), ('src_ids', 'i'),
+           ('dst_ids', 'i'), ('durations', 'i'),
+           ('src_lon', 'd'), ('src_lat', 'd'),
+           ('dst_lon', 'd'), ('dst_lat', 'd')]
+
+
+def _padding(size: int) -> bytes:
+    """ Return the zero bytes needed after <size> bytes to reach the next
+    multiple of _ALIGNMENT.
+    """
+    return bytes(-size % _ALIGNMENT)
+
+
+def _add_event(columns: dict[str, array], number_ids: dict[str, int],
+               event: dict) -> None:
+    """ Append the <event>, in the format of the "events" list of the
+    dataset, to the <columns>, adding its phone numbers to <number_ids> if
+    they are new.
+    """
+    moment = eventlog.decode_timestamp(event['time'])
+    columns['times'].append((moment - EPOCH) // _SECOND)
+    if event['type'] == 'call':
+        columns['types'].append(CALL_EVENT)
+        columns['durations'].append(event['duration'])
+    else:
+        columns['types'].append(SMS_EVENT)
+        columns['durations'].append(0)
+    columns['src_ids'].append(
+        number_ids.setdefault(event['src_number'], len(number_ids)))
+    columns['dst_ids'].append(
+        number_ids.setdefault(event['dst_number'], len(number_ids)))
+    columns['src_lon'].append(event['src_loc'][0])
+    columns['src_lat'].append(event['src_loc'][1])
+    columns['dst_lon'].append(event['dst_loc'][0])
+    columns['dst_lat'].append(event['dst_loc'][1])
+
+
+def convert_dataset(json_path: str, store_path: str) -> int:
+    """ Write the events and customers of the json dataset file <json_path>
+    into a new event store file <store_path>. Return the number of events.
+
+    The json file is decoded once, incrementally, so only the (compact)
+    columns and the customers are held in memory during the conversion.
+
+    Precondition: the dataset file must be in the json format.
+    """
+    columns = {name: array(code) for name, code in COLUMNS}
+    number_ids = {}
+    customers = []
+    for name, entry in eventlog.iter_lists(json_path):
+        if name == 'events':
+            _add_event(columns, number_ids, entry)
+        elif name == 'customers':
+            customers.append(entry)
+
+    metadata = json.dumps({
+        'numbers': list(number_ids),
+        'customers': customers
+    }).encode('utf-8')
+    count = len(columns['times'])
+    with open(store_path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, sys.byteorder == 'big',
+                                count, len(metadata)))
+        file.write(metadata)
+        file.write(_padding(_HEADER.size + len(metadata)))
+        for name, _ in COLUMNS:
+            data = columns[name].tobytes()
+            file.write(data)
+            file.write(_padding(len(data)))
+    return count
+
+
+class EventStore:
+    """ The events of a dataset, read from a memory-mapped event store file.
+
+    The columns are views directly on the file: no Python object is created
+    for an event until it is accessed.
+
+    === Public Attributes ===
+    numbers:
+         the distinct phone numbers of the dataset; the src_ids and dst_ids
+         columns are indices into this list
+    customers:
+         the customers of the dataset, in the same format as the "customers"
+         list of the json dataset
+    times, types, src_ids, dst_ids, durations,
+    src_lon, src_lat, dst_lon, dst_lat:
+         the columns of the events, in chronological order, as described in
+         the module description
+
+    === Representation Invariants ===
+    - all the columns have the same length, which is the number of events
+    """
+    numbers: list[str]
+    customers: list[dict]
+    times: memoryview
+    types: memoryview
+    src_ids: memoryview
+    dst_ids: memoryview
+    durations: memoryview
+    src_lon: memoryview
+    src_lat: memoryview
+    dst_lon: memoryview
+    dst_lat: memoryview
+    # === Private Attributes ===
+    # _map:
+    #     the memory map of the event store file, or None once closed
+    # _views:
+    #     every view created on <_map>, which must be released before closing
+    _map: Optional[mmap.mmap]
+    _views: list[memoryview]
+
+    def __init__(self, path: str) -> None:
+        """ Open the event store file <path>.
+
+        Raise a ValueError if <path> is not an event store file in a format
+        that can be read by this version of the code, or is shorter than its
+        header says.
+        """
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size < _HEADER.size:
+                raise ValueError(f'{path} is not a version {VERSION} event '
+                                 f'store')
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        # the map and the views are released if the file is not valid
+        try:
+            view = self._view(memoryview(self._map))
+            magic, version, big_endian, count, meta_size = \
+                _HEADER.unpack_from(view)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f'{path} is not a version {VERSION} event '
+                                 f'store')
+            if big_endian != (sys.byteorder == 'big'):
+                raise ValueError(f'{path} was written with another byte '
+                                 f'order')
+
+            # the size of the file must hold the metadata and all the columns
+            offset = _HEADER.size + meta_size
+            for _, code in COLUMNS:
+                offset += -offset % _ALIGNMENT + count * array(code).itemsize
+            if offset > len(view):
+                raise ValueError(f'{path} is truncated: {offset} bytes '
+                                 f'expected, {len(view)} found')
+
+            offset = _HEADER.size
+            metadata = json.loads(bytes(view[offset:offset + meta_size]))
+            if not isinstance(metadata, dict) or \
+                    not isinstance(metadata.get('numbers'), list) or \
+                    not isinstance(metadata.get('customers'), list):
+                raise ValueError(f'{path} has invalid metadata')
+            self.numbers = metadata['numbers']
+            self.customers = metadata['customers']
+
+            offset += meta_size
+            for name, code in COLUMNS:
+                offset += -offset % _ALIGNMENT
+                size = count * array(code).itemsize
+                setattr(self, name,
+                        self._view(view[offset:offset + size].cast(code)))
+                offset += size
+        except Exception:
+            self.close()
+            raise
+
+    def _view(self, view: memoryview) -> memoryview:
+        """ Remember the <view> on the memory map, so that it can be released
+        when this store is closed, and return it.
+        """
+        self._views.append(view)
+        return view
+
+    def get_customer_data(self) -> dict[str, list[dict]]:
+        """ Return a dictionary that stores the customers of this store, in the
+        format expected by application.create_customers().
+        """
+        return {'customers': self.customers}
+
+    def get_time(self, index: int) -> datetime.datetime:
+        """ Return the date and time of the event at <index>.
+        """
+        return EPOCH + datetime.timedelta(seconds=self.times[index])
+
+    def get_call(self, index: int) -> Optional[Call]:
+        """ Return a new Call for the event at <index>, or None if that event
+        is not a call.
+        """
+        if self.types[index] != CALL_EVENT:
+            return None
+        return Call(self.numbers[self.src_ids[index]],
+                    self.numbers[self.dst_ids[index]],
+                    self.get_time(index), self.durations[index],
+                    (self.src_lon[index], self.src_lat[index]),
+                    (self.dst_lon[index], self.dst_lat[index]))
+
+    def iter_events(self) \
+            -> Iterator[tuple[datetime.datetime, Optional[Call]]]:
+        """ Yield the events of this store in chronological order, each as a
+        tuple containing its date and time and, for a call, a new Call object
+        (None for any other event).
+        """
+        for index in range(len(self)):
+            yield self.get_time(index), self.get_call(index)
+
+    def close(self) -> None:
+        """ Release the columns and close the memory map of this store.
+        The columns must not be used after the store is closed.
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __len__(self) -> int:
+        """ Return the number of events in this store.
+        """
+        return len(self.times)
+
+    def __enter__(self) -> 'EventStore':
+        """ Return this store, to be used in a with statement.
+        """
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """ Close this store at the end of a with statement.
+        """
+        self.close()
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'datetime', 'json', 'mmap', 'os', 'struct',
+            'sys', 'array', 'eventlog', 'call'
+        ],
+        'allowed-io': ['convert_dataset', '__init__'],
+        'disable': ['R0902'],
+        'generated-members': 'pygame.*'
+    })
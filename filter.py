@@ -13,13 +13,27 @@ Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 import time
 import datetime
+from math import ceil, floor
+from typing import Callable, Collection, Optional
 from call import Call
+from callindex import DurationIndex, LocationGrid
+from callset import CallSet, CallSpace, space_for
 from customer import Customer
+from registry import shared_registry
 
 # Map upper-left and bottom-right coordinates (long, lat).
 MAP_MIN = (-79.697878, 43.799568)
 MAP_MAX = (-79.196382, 43.576959)
 
+# The lower left and upper right corners of the map (long, lat)
+MAP_LOWER_LEFT = (MAP_MIN[0], MAP_MAX[1])
+MAP_UPPER_RIGHT = (MAP_MAX[0], MAP_MIN[1])
+
+# The duration and location filters scan the calls given to them directly,
+# without the indexes of the CallSpace, when there are fewer than one in
+# SCAN_RATIO of the calls of the space
+SCAN_RATIO = 16
+
 
 # from application import find_customer_by_id
 
@@ -59,6 +73,41 @@ class Filter:
         """
         raise NotImplementedError
 
+    def compile(self, customers: list[Customer], filter_string: str) \
+            -> Optional[Callable[[Call], bool]]:
+        """ Return a predicate telling whether a call matches the filter
+        specified in <filter_string>, or None if the <filter_string> is
+        invalid, and this filter then has no effect.
+
+        For a filter with a predicate, apply() returns the calls of its data
+        which match the predicate, once each, in the order they were given;
+        a FilterPipeline evaluates the predicates of several such filters in a
+        single pass over the calls.
+
+        Raise NotImplementedError if this filter does not select calls with a
+        predicate.
+
+        Precondition:
+        - <customers> contains the list of all customers from the input dataset
+        """
+        raise NotImplementedError
+
+    def bitmap(self, space: CallSpace, filter_string: str) -> CallSet:
+        """ Return the set of the calls of <space> which match the filter
+        specified in <filter_string>, as a bitmap, to be combined with the
+        results of other filters.
+
+        If the <filter_string> is invalid, return all the calls of <space>, as
+        apply() returns all the calls it is given.
+
+        Raise NotImplementedError if this filter does not select calls with a
+        predicate.
+        """
+        predicate = self.compile(space.customers, filter_string)
+        if predicate is None:
+            return space.everything()
+        return space.where(predicate)
+
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
         """
@@ -89,6 +138,11 @@ class ResetFilter(Filter):
             filtered_calls.extend(customer_history[0])
         return filtered_calls
 
+    def bitmap(self, space: CallSpace, filter_string: str) -> CallSet:
+        """ Return the set of all the calls of <space>.
+        """
+        return space.everything()
+
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
         """
@@ -115,23 +169,61 @@ class CustomerFilter(Filter):
 
         Do not mutate any of the function arguments!
         """
-        # valid number id
-        if not filter_string.isnumeric():
+        members = self._members(customers, filter_string)
+        if members is None:
             return data
 
-        # find correct customer
-        customer = None
-        for cust in customers:
-            if cust.get_id() == float(filter_string):
-                customer = cust
+        # each call of <data> is looked up in constant time, and removed once
+        # taken, so that it is only returned once
+        calls = []
+        for call in data:
+            if id(call) in members:
+                members.remove(id(call))
+                calls.append(call)
+        return calls
 
+    def compile(self, customers: list[Customer], filter_string: str) \
+            -> Optional[Callable[[Call], bool]]:
+        """ Return a predicate telling whether a call was made or received by
+        the customer with the id specified in <filter_string>, or None if the
+        <filter_string> is invalid.
+        """
+        members = self._members(customers, filter_string)
+        if members is None:
+            return None
+        return lambda call: id(call) in members
+
+    def bitmap(self, space: CallSpace, filter_string: str) -> CallSet:
+        """ Return the set of the calls of <space> made or received by the
+        customer with the id specified in <filter_string>, or of all its calls
+        if the <filter_string> is invalid.
+        """
+        if not filter_string.isdecimal():
+            return space.everything()
+        customer = _find_customer(space.customers, int(filter_string))
         if not customer:
-            return data
+            return space.everything()
+        outgoing, incoming = customer.get_history()
+        return space.from_calls(outgoing + incoming)
+
+    def _members(self, customers: list[Customer], filter_string: str) \
+            -> Optional[set[int]]:
+        """ Return the set of the ids of the calls made or received by the
+        customer with the id specified in <filter_string>, or None if the
+        <filter_string> is invalid.
+        """
+        # valid number id
+        if not filter_string.isdecimal():
+            return None
 
-        calls = list(set(call for call in
-                         customer.get_history()[0] + customer.get_history()[1]
-                         if call in data))
-        return calls
+        customer = _find_customer(customers, int(filter_string))
+        if not customer:
+            return None
+
+        outgoing, incoming = customer.get_history()
+        members = {id(call) for call in outgoing}
+        members.update(id(call) for call in incoming)
+        return members
 
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
@@ -144,7 +236,6 @@ class DurationFilter(Filter):
     A class for selecting only the calls lasting either over or under a
     specified duration.
     """
-
     def apply(self, customers: list[Customer], data: list[Call],
               filter_string: str) -> list[Call]:
         """ Return a list of all unique calls from <data> with a duration
@@ -154,51 +245,69 @@ class DurationFilter(Filter):
 
         The filter string is valid if and only if it contains the following
         input format: either "Lxxx" or "Gxxx", indicating to filter calls less
-        than xxx or greater than xxx seconds, respectively.
+        than xxx or greater than xxx seconds, respectively, or "Rxxx-yyy",
+        indicating to filter calls lasting from xxx to yyy seconds, included.
         - If the filter string is invalid, return the original list <data>
         - If the filter string is invalid, your code must not crash, as
         specified in the handout.
 
+        The calls are looked up in the DurationIndex of the CallSpace of the
+        <customers> (see callset.space_for), which is built once for the
+        whole dataset, unless <data> holds fewer than one in SCAN_RATIO of
+        the calls of the space: the calls of <data> are then checked directly.
+
         Do not mutate any of the function arguments!
         """
-        # Check if the filter string is valid
-        if not filter_string.startswith(('L', 'l', 'G', 'g')):
+        durations = _parse_durations(filter_string)
+        if durations is None:
             return data
 
-        # Extract the filter parameters
-        comparison_operator = filter_string[0].lower()
-        duration = filter_string[1:]
-
-        # Check if duration is a valid number
-        if not duration.isnumeric() or not 0 <= float(duration) <= 999:
-            return data
-
-        duration = float(duration)
-
-        # Filter calls based on duration and comparison operator
-        calls = []
-        for call in data:
-            if comparison_operator == "l" and call.duration < duration and \
-                    call not in calls:
-                calls.append(call)
-            elif comparison_operator == "g" and call.duration > duration and \
-                    call not in calls:
-                calls.append(call)
-
-        return calls
+        space = space_for(customers)
+        if space is None or len(data) * SCAN_RATIO < len(space):
+            predicate = self.compile(customers, filter_string)
+            return _unique([call for call in data if predicate(call)])
+        index = space.get_index('duration', DurationIndex)
+        return _take(data, space, index.positions_between(*durations))
+
+    def compile(self, customers: list[Customer], filter_string: str) \
+            -> Optional[Callable[[Call], bool]]:
+        """ Return a predicate telling whether a call lasts under or over the
+        time indicated in the <filter_string>, or None if the <filter_string>
+        is invalid.
+        """
+        durations = _parse_durations(filter_string)
+        if durations is None:
+            return None
+        low, high = durations
+        if low is None:
+            return lambda call: call.duration <= high
+        if high is None:
+            return lambda call: low <= call.duration
+        return lambda call: low <= call.duration <= high
+
+    def bitmap(self, space: CallSpace, filter_string: str) -> CallSet:
+        """ Return the set of the calls of <space> lasting under or over the
+        time indicated in the <filter_string>, or of all its calls if the
+        <filter_string> is invalid, using a DurationIndex of the space.
+        """
+        durations = _parse_durations(filter_string)
+        if durations is None:
+            return space.everything()
+        index = space.get_index('duration', DurationIndex)
+        return space.from_call_ids(index.positions_between(*durations))
 
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
         """
         return "Filter calls based on duration; " \
-               "L### returns calls less than specified length, G### for greater"
+               "L### returns calls less than specified length, G### for " \
+               "greater, R###-### for the lengths in a range"
 
 
 class LocationFilter(Filter):
     """
     A class for selecting only the calls that took place within a specific area
     """
-
     def apply(self, customers: list[Customer], data: list[Call],
               filter_string: str) -> list[Call]:
         """ Return a list of all unique calls from <data>, which took
@@ -221,24 +330,48 @@ class LocationFilter(Filter):
         - If the filter string is invalid, your code must not crash, as
         specified in the handout.
 
+        The calls are looked up in the LocationGrid of the CallSpace of the
+        <customers> (see callset.space_for), which is built once for the
+        whole dataset, unless <data> holds fewer than one in SCAN_RATIO of
+        the calls of the space: the calls of <data> are then checked directly.
+
         Do not mutate any of the function arguments!
         """
-        positions = filter_string.split(', ')
-        if len(positions) == 4 and positions[0].isnumeric() and \
-                positions[1].isnumeric() and positions[2].isnumeric() and \
-                positions[3].isnumeric():
-            lower_left = (float(positions[0]), float(positions[1]))
-            upper_right = (float(positions[2]), float(positions[3]))
-        else:
+        rectangle = _parse_rectangle(filter_string)
+        if rectangle is None:
             return data
 
-        calls = []
-        for call in data:
-            if (valid_location(call.dst_loc, lower_left, upper_right)) or \
-                    (valid_location(call.src_loc, lower_left, upper_right)) \
-                    and (call not in calls):
-                calls.append(call)
-        return calls
+        space = space_for(customers)
+        if space is None or len(data) * SCAN_RATIO < len(space):
+            predicate = self.compile(customers, filter_string)
+            return _unique([call for call in data if predicate(call)])
+        grid = space.get_index('location', _location_grid)
+        return _take(data, space, grid.positions_within(*rectangle))
+
+    def compile(self, customers: list[Customer], filter_string: str) \
+            -> Optional[Callable[[Call], bool]]:
+        """ Return a predicate telling whether the source or the destination
+        of a call is within the location specified by the <filter_string>, or
+        None if the <filter_string> is invalid.
+        """
+        rectangle = _parse_rectangle(filter_string)
+        if rectangle is None:
+            return None
+        lower_left, upper_right = rectangle
+        return lambda call: \
+            valid_location(call.src_loc, lower_left, upper_right) or \
+            valid_location(call.dst_loc, lower_left, upper_right)
+
+    def bitmap(self, space: CallSpace, filter_string: str) -> CallSet:
+        """ Return the set of the calls of <space> which took place within the
+        location specified by the <filter_string>, or of all its calls if the
+        <filter_string> is invalid, using a LocationGrid of the space.
+        """
+        rectangle = _parse_rectangle(filter_string)
+        if rectangle is None:
+            return space.everything()
+        grid = space.get_index('location', _location_grid)
+        return space.from_call_ids(grid.positions_within(*rectangle))
 
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI
@@ -249,6 +382,129 @@ class LocationFilter(Filter):
                "upperLong, upperLat\" (e.g., -79.6, 43.6, -79.3, 43.7)"
 
 
+def _parse_durations(filter_string: str) \
+        -> Optional[tuple[Optional[float], Optional[float]]]:
+    """ Return the (minimum, maximum) durations of the calls selected by the
+    DurationFilter <filter_string>, inclusive, where None leaves that side of
+    the range open, or None if the <filter_string> is invalid.
+
+    >>> _parse_durations('R30-300')
+    (30.0, 300.0)
+    >>> _parse_durations('G060')
+    (61.0, None)
+    >>> _parse_durations('L100-200') is None
+    True
+    """
+    # Check if the filter string is valid
+    if not filter_string.startswith(('L', 'l', 'G', 'g', 'R', 'r')):
+        return None
+
+    # Extract the filter parameters
+    comparison_operator = filter_string[0].lower()
+    if comparison_operator == 'r':
+        durations = filter_string[1:].split('-')
+    else:
+        durations = [filter_string[1:]]
+
+    # Check if the durations are valid numbers, and the range is not empty
+    if len(durations) != (2 if comparison_operator == 'r' else 1) or \
+            any(not duration.isdecimal() or not 0 <= float(duration) <= 999
+                for duration in durations) or \
+            float(durations[0]) > float(durations[-1]):
+        return None
+
+    # the durations of the calls are whole numbers of seconds
+    if comparison_operator == 'l':
+        return None, float(ceil(float(durations[0])) - 1)
+    elif comparison_operator == 'g':
+        return float(floor(float(durations[0])) + 1), None
+    return float(durations[0]), float(durations[1])
+
+
+def _parse_rectangle(filter_string: str) \
+        -> Optional[tuple[tuple[float, float], tuple[float, float]]]:
+    """ Return the (lower_left, upper_right) corners of the rectangle of the
+    LocationFilter <filter_string>, or None if the <filter_string> is
+    invalid.
+
+    >>> _parse_rectangle('-79.6, 43.6, -79.3, 43.7')
+    ((-79.6, 43.6), (-79.3, 43.7))
+    >>> _parse_rectangle('-79.6, 43.6, -79.3') is None
+    True
+    """
+    positions = filter_string.split(', ')
+    if len(positions) != 4:
+        return None
+    try:
+        coordinates = [float(position) for position in positions]
+    except ValueError:
+        return None
+    lower_left = (coordinates[0], coordinates[1])
+    upper_right = (coordinates[2], coordinates[3])
+    if not (valid_location(lower_left, MAP_LOWER_LEFT, MAP_UPPER_RIGHT)
+            and valid_location(upper_right, MAP_LOWER_LEFT, MAP_UPPER_RIGHT)):
+        return None
+    return lower_left, upper_right
+
+
+def _unique(calls: list[Call]) -> list[Call]:
+    """ Return the calls of <calls>, once each, in order.
+    """
+    seen = set()
+    unique = []
+    for call in calls:
+        if id(call) not in seen:
+            seen.add(id(call))
+            unique.append(call)
+    return unique
+
+
+def _take(data: list[Call], space: CallSpace, positions: Collection[int]) \
+        -> list[Call]:
+    """ Return the calls of <data> which are at one of the <positions> in the
+    calls of <space>, once each, in the order of <data>.
+
+    The smaller of <data> and <positions> is put in a set, which the other is
+    intersected with, so that the set is never larger than <data>.
+    """
+    if len(positions) < len(data):
+        members = {id(space.calls[position]) for position in positions}
+        ids = [id(call) for call in data]
+    else:
+        ids = space.get_call_ids(data)
+        members = set(ids)
+        members.intersection_update(positions)
+    # each call is removed once taken, so that it is only returned once
+    selected = []
+    for call, i in zip(data, ids):
+        if i in members:
+            members.remove(i)
+            selected.append(call)
+    return selected
+
+
+def _location_grid(calls: list[Call]) -> LocationGrid:
+    """ Return a LocationGrid of <calls> over the whole map.
+    """
+    return LocationGrid(calls, MAP_LOWER_LEFT, MAP_UPPER_RIGHT)
+
+
+def _find_customer(customers: list[Customer], cid: int) -> Optional[Customer]:
+    """ Return the customer with the <cid> id from <customers>, or None if
+    there is no such customer.
+
+    The PhoneRegistry shared by the <customers> is used as an index by id
+    (see registry.shared_registry), instead of scanning the list.
+    """
+    registry = shared_registry(customers)
+    if registry is not None:
+        return registry.get_customer(cid)
+    for customer in customers:
+        if customer.get_id() == cid:
+            return customer
+    return None
+
+
 def valid_location(coord: tuple[float, float], lower_left: tuple[float, float],
                    upper_right: tuple[float, float]) -> bool:
     """
@@ -280,7 +536,8 @@ if __name__ == '__main__':
 
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'time', 'datetime', 'call', 'customer'
+            'python_ta', 'typing', 'time', 'datetime', 'math', 'call',
+            'callindex', 'callset', 'customer', 'registry'
         ],
         'max-nested-blocks': 4,
         'allowed-io': ['apply', '__str__'],
@@ -0,0 +1,521 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the BillLedger class, which stores the bills of many phone
+lines as rows of typed columns (phone line, year, month, contract type, fixed
+cost, free minutes, billed minutes and rate per minute), instead of one Bill
+object per phone line and month. As in Bill, the amounts of money are integer
+numbers of mills, so the costs of any number of bills add up exactly.
+
+The rows are accessed through LedgerBill views, which behave as Bill objects
+(the contracts update them with the usual Bill methods), and the bills of one
+phone line through its LineBills, a dictionary from (month, year) to
+LedgerBill, which only stores the months and row numbers of the bills of its
+phone line. Blocks of rows are copied from one ledger to another with
+get_rows() and add_rows().
+"""
+from array import array
+from bisect import bisect_left
+from typing import Iterator, MutableMapping, Optional, Union
+
+from bill import Bill, to_dollars
+
+# A block of rows of a BillLedger, as its columns: the line ids, years,
+# months, contract types, fixed costs, free minutes, billed minutes and rates
+BillRows = tuple[array, array, array, list[str], array, array, array, array]
+
+
+class BillLedger:
+    """ The bills of a group of phone lines, as typed columns.
+
+    Each phone line is identified by a line id, given by add_line(), and each
+    bill by its row number.
+
+    === Public Attributes ===
+    numbers:
+         the phone number of each line id
+    """
+    numbers: list[str]
+    # === Private Attributes ===
+    # _types:
+    #     the contract types of the bills, indexed by their code
+    # _codes:
+    #     maps each contract type of _types to its code
+    # _line_ids, _years, _months, _type_codes, _fixed_costs, _free_mins,
+    # _billed_mins, _min_rates:
+    #     the columns of the bills: the row number of a bill is its index in
+    #     each of these columns. The line id of a removed bill is -1.
+    # _removed:
+    #     the number of removed bills
+    # _cycles:
+    #     the row numbers of the bills of each billing cycle, as
+    #     year * 12 + month - 1, removed bills included
+    _types: list[str]
+    _codes: dict[str, int]
+    _line_ids: array
+    _years: array
+    _months: array
+    _type_codes: array
+    _fixed_costs: array
+    _free_mins: array
+    _billed_mins: array
+    _min_rates: array
+    _removed: int
+    _cycles: dict[int, array]
+
+    def __init__(self) -> None:
+        """ Create a BillLedger without any phone line or bill.
+        """
+        self.numbers = []
+        self._types = ['']
+        self._codes = {'': 0}
+        self._line_ids = array('l')
+        self._years = array('h')
+        self._months = array('b')
+        self._type_codes = array('b')
+        self._fixed_costs = array('q')
+        self._free_mins = array('q')
+        self._billed_mins = array('q')
+        self._min_rates = array('q')
+        self._removed = 0
+        self._cycles = {}
+
+    def add_line(self, number: str) -> int:
+        """ Record the phone line with <number> and return its line id.
+        """
+        self.numbers.append(number)
+        return len(self.numbers) - 1
+
+    def add_bill(self, line_id: int, month: int, year: int,
+                 bill: Optional[Bill] = None) -> int:
+        """ Add a bill for the <month> and <year> billing cycle of the phone
+        line with <line_id>, and return its row number.
+
+        The new bill is a copy of <bill> if given, or an empty bill otherwise.
+        """
+        if bill is None:
+            bill = Bill()
+        self._line_ids.append(line_id)
+        self._years.append(year)
+        self._months.append(month)
+        self._type_codes.append(self.type_code(bill.type))
+        self._fixed_costs.append(bill.fixed_cost)
+        self._free_mins.append(bill.free_min)
+        self._billed_mins.append(bill.billed_min)
+        self._min_rates.append(bill.min_rate)
+        row = len(self._line_ids) - 1
+        self._cycle_rows(month, year).append(row)
+        return row
+
+    def add_bills(self, line_ids: list[int], month: int, year: int,
+                  types: list[str], fixed_costs: list[int],
+                  free_mins: list[int], billed_mins: list[int],
+                  min_rates: list[int]) -> int:
+        """ Add one bill for the <month> and <year> billing cycle of each
+        phone line of <line_ids>, with the corresponding contract type, fixed
+        cost, free minutes, billed minutes and rate. Return the row number of
+        the first of these bills; the others follow it in order.
+        """
+        first = len(self._line_ids)
+        self._line_ids.extend(line_ids)
+        self._years.extend([year] * len(line_ids))
+        self._months.extend([month] * len(line_ids))
+        self._type_codes.extend([self.type_code(t) for t in types])
+        self._fixed_costs.extend(fixed_costs)
+        self._free_mins.extend(free_mins)
+        self._billed_mins.extend(billed_mins)
+        self._min_rates.extend(min_rates)
+        self._cycle_rows(month, year).extend(range(first,
+                                                   len(self._line_ids)))
+        return first
+
+    def get_rows(self, start: int, stop: int) -> BillRows:
+        """ Return a copy of the rows from <start> to <stop> (excluded) of
+        this ledger.
+        """
+        return (self._line_ids[start:stop], self._years[start:stop],
+                self._months[start:stop],
+                [self._types[code] for code in self._type_codes[start:stop]],
+                self._fixed_costs[start:stop], self._free_mins[start:stop],
+                self._billed_mins[start:stop], self._min_rates[start:stop])
+
+    def add_rows(self, rows: BillRows, line_ids: list[int]) -> int:
+        """ Add a copy of the <rows> of another ledger to this ledger, and
+        return the row number of the first of them; the others follow it in
+        order. <line_ids> gives the line id in this ledger of each line id of
+        the other ledger: the rows of the line ids mapped to -1 are added as
+        removed bills.
+        """
+        first = len(self._line_ids)
+        ids, years, months, types, fixed_costs, free_mins, billed_mins, \
+            min_rates = rows
+        ids = array('l', [-1 if line_id == -1 else line_ids[line_id]
+                          for line_id in ids])
+        self._line_ids.extend(ids)
+        self._removed += ids.count(-1)
+        self._years.extend(years)
+        self._months.extend(months)
+        self._type_codes.extend([self.type_code(t) for t in types])
+        self._fixed_costs.extend(fixed_costs)
+        self._free_mins.extend(free_mins)
+        self._billed_mins.extend(billed_mins)
+        self._min_rates.extend(min_rates)
+        cycle = cycle_rows = None
+        for row, (year, month) in enumerate(zip(years, months), first):
+            if (month, year) != cycle:
+                cycle = (month, year)
+                cycle_rows = self._cycle_rows(month, year)
+            cycle_rows.append(row)
+        return first
+
+    def _cycle_rows(self, month: int, year: int) -> array:
+        """ Return the row numbers of the bills of the <month> and <year>
+        billing cycle, creating the entry of that cycle in _cycles if needed.
+        """
+        key = year * 12 + month - 1
+        rows = self._cycles.get(key)
+        if rows is None:
+            rows = array('l')
+            self._cycles[key] = rows
+        return rows
+
+    def set_bill(self, row: int, bill: Bill) -> None:
+        """ Replace the bill at <row> with a copy of <bill>, keeping its phone
+        line and billing cycle.
+        """
+        type_code = self.type_code(bill.type)
+        fixed_cost, free_min = bill.fixed_cost, bill.free_min
+        billed_min, min_rate = bill.billed_min, bill.min_rate
+        self._type_codes[row] = type_code
+        self._fixed_costs[row] = fixed_cost
+        self._free_mins[row] = free_min
+        self._billed_mins[row] = billed_min
+        self._min_rates[row] = min_rate
+
+    def remove_bill(self, row: int) -> None:
+        """ Remove the bill at <row> from this ledger, if it was not already
+        removed. The row numbers of the other bills do not change.
+        """
+        if self._line_ids[row] != -1:
+            self._line_ids[row] = -1
+            self._removed += 1
+
+    def type_code(self, contract_type: str) -> int:
+        """ Return the code of the <contract_type> in the type column.
+        """
+        code = self._codes.get(contract_type)
+        if code is None:
+            code = len(self._types)
+            self._types.append(contract_type)
+            self._codes[contract_type] = code
+        return code
+
+    def get_bill(self, row: int) -> 'LedgerBill':
+        """ Return a view of the bill at <row>.
+        """
+        return LedgerBill(self, row)
+
+    def get_line_id(self, row: int) -> int:
+        """ Return the id of the phone line of the bill at <row>.
+        """
+        return self._line_ids[row]
+
+    def get_bill_date(self, row: int) -> tuple[int, int]:
+        """ Return the (month, year) billing cycle of the bill at <row>.
+        """
+        return self._months[row], self._years[row]
+
+    def get_cost(self, row: int) -> int:
+        """ Return the exact amount of the bill at <row>, in mills.
+        """
+        return self._min_rates[row] * self._billed_mins[row] + \
+            self._fixed_costs[row]
+
+    def get_total_cost(self, month: int, year: int) -> int:
+        """ Return the exact sum of the amounts of all the bills of the
+        <month> and <year> billing cycle in this ledger, in mills.
+
+        Only the bills of that billing cycle are read, and the removed bills
+        are not counted.
+        """
+        line_ids, rates = self._line_ids, self._min_rates
+        billed, fixed = self._billed_mins, self._fixed_costs
+        total = 0
+        for row in self._cycles.get(year * 12 + month - 1, ()):
+            if line_ids[row] != -1:
+                total += rates[row] * billed[row] + fixed[row]
+        return total
+
+    def get_summary(self, row: int) -> dict[str, Union[float, int]]:
+        """ Return the summary of the bill at <row>, as Bill.get_summary()
+        does.
+        """
+        return {'type': self._types[self._type_codes[row]],
+                'fixed': to_dollars(self._fixed_costs[row]),
+                'free_mins': self._free_mins[row],
+                'billed_mins': self._billed_mins[row],
+                'min_rate': to_dollars(self._min_rates[row]),
+                'total': to_dollars(self.get_cost(row))}
+
+    def __len__(self) -> int:
+        """ Return the number of bills in this ledger, not counting the
+        removed bills.
+        """
+        return len(self._line_ids) - self._removed
+
+
+class LedgerBill(Bill):
+    """ A view of a bill stored in a BillLedger, which can be used as a Bill:
+    reading or updating its attributes reads or updates the ledger.
+    """
+    # === Private Attributes ===
+    # _ledger:
+    #     the ledger storing this bill
+    # _row:
+    #     the row number of this bill in the ledger
+    _ledger: BillLedger
+    _row: int
+
+    def __init__(self, ledger: BillLedger, row: int) -> None:
+        """ Create a view of the bill at <row> in <ledger>.
+        """
+        # the attributes of a Bill are stored in the ledger, so they are not
+        # initialized here
+        # pylint: disable=super-init-not-called
+        self._ledger = ledger
+        self._row = row
+
+    @property
+    def billed_min(self) -> int:
+        """ The number of billable minutes of this bill.
+        """
+        return self._ledger._billed_mins[self._row]
+
+    @billed_min.setter
+    def billed_min(self, minutes: int) -> None:
+        self._ledger._billed_mins[self._row] = minutes
+
+    @property
+    def free_min(self) -> int:
+        """ The number of free minutes of this bill.
+        """
+        return self._ledger._free_mins[self._row]
+
+    @free_min.setter
+    def free_min(self, minutes: int) -> None:
+        self._ledger._free_mins[self._row] = minutes
+
+    @property
+    def min_rate(self) -> int:
+        """ The cost for one minute of calling, in mills.
+        """
+        return self._ledger._min_rates[self._row]
+
+    @min_rate.setter
+    def min_rate(self, rate: int) -> None:
+        self._ledger._min_rates[self._row] = rate
+
+    @property
+    def fixed_cost(self) -> int:
+        """ The fixed costs of this bill, in mills.
+        """
+        return self._ledger._fixed_costs[self._row]
+
+    @fixed_cost.setter
+    def fixed_cost(self, cost: int) -> None:
+        self._ledger._fixed_costs[self._row] = cost
+
+    @property
+    def type(self) -> str:
+        """ The contract type of this bill.
+        """
+        return self._ledger._types[self._ledger._type_codes[self._row]]
+
+    @type.setter
+    def type(self, contract_type: str) -> None:
+        self._ledger._type_codes[self._row] = \
+            self._ledger.type_code(contract_type)
+
+    def get_cost_mills(self) -> int:
+        """ Return the exact bill amount, in mills.
+        """
+        return self._ledger.get_cost(self._row)
+
+    def get_summary(self) -> dict[str, Union[float, int]]:
+        """ Return a bill summary as a dictionary containing the bill details.
+        """
+        return self._ledger.get_summary(self._row)
+
+    def get_row(self) -> int:
+        """ Return the row number of this bill in its ledger.
+        """
+        return self._row
+
+    def is_same_bill(self, other: Optional[Bill]) -> bool:
+        """ Return whether <other> is this bill, or another view of it.
+        """
+        return other is self or isinstance(other, LedgerBill) and \
+            other._ledger is self._ledger and other._row == self._row
+
+    def detach(self) -> Bill:
+        """ Return a new Bill, outside of any ledger, which is a copy of this
+        bill.
+        """
+        bill = Bill()
+        bill.set_rates(self.type, self.min_rate)
+        bill.add_fixed_cost(self.fixed_cost)
+        bill.add_free_minutes(self.free_min)
+        bill.add_billed_minutes(self.billed_min)
+        return bill
+
+
+class LineBills(MutableMapping[tuple[int, int], Bill]):
+    """ The bills of one phone line stored in a BillLedger, as a dictionary
+    from (month, year) to the LedgerBill of that billing cycle.
+
+    Bills are added with add_bill() and add_row(). Setting the bill of a
+    billing cycle copies it into the ledger, and deleting it removes its row
+    from the ledger. The months are iterated over in chronological order.
+
+    === Public Attributes ===
+    ledger:
+         the ledger storing the bills
+    line_id:
+         the line id of the phone line in the ledger
+    """
+    ledger: BillLedger
+    line_id: int
+    # === Private Attributes ===
+    # _keys:
+    #     the billing cycles of the bills, as year * 12 + month - 1, in
+    #     increasing order
+    # _rows:
+    #     the row number in the ledger of the bill of each of the _keys
+    _keys: array
+    _rows: array
+
+    def __init__(self, ledger: BillLedger, line_id: int) -> None:
+        """ Create an empty dictionary of the bills of the phone line with
+        <line_id> in <ledger>.
+        """
+        self.ledger = ledger
+        self.line_id = line_id
+        self._keys = array('l')
+        self._rows = array('l')
+
+    def _find(self, month: int, year: int) -> tuple[int, bool]:
+        """ Return the position of the <month> and <year> billing cycle in
+        _keys, and whether this line has a bill for it.
+        """
+        key = year * 12 + month - 1
+        if self._keys and self._keys[-1] == key:
+            return len(self._keys) - 1, True
+        position = bisect_left(self._keys, key)
+        return position, position < len(self._keys) and \
+            self._keys[position] == key
+
+    def add_row(self, month: int, year: int, row: int) -> None:
+        """ Record that the bill of the <month> and <year> billing cycle of
+        this line is at <row> in the ledger, replacing its previous bill for
+        that billing cycle, if any, which is removed from the ledger.
+        """
+        position, found = self._find(month, year)
+        if found:
+            if self._rows[position] != row:
+                self.ledger.remove_bill(self._rows[position])
+            self._rows[position] = row
+        else:
+            self._keys.insert(position, year * 12 + month - 1)
+            self._rows.insert(position, row)
+
+    def add_bill(self, month: int, year: int, bill: Optional[Bill] = None) \
+            -> 'LedgerBill':
+        """ Add a bill for the <month> and <year> billing cycle of this line
+        into the ledger, as a copy of <bill> if given, or an empty bill
+        otherwise, and return it.
+        """
+        row = self.ledger.add_bill(self.line_id, month, year, bill)
+        self.add_row(month, year, row)
+        return LedgerBill(self.ledger, row)
+
+    def get_row(self, month: int, year: int) -> Optional[int]:
+        """ Return the row number of the bill of the <month> and <year> billing
+        cycle in the ledger, or None if there is no such bill.
+        """
+        position, found = self._find(month, year)
+        return self._rows[position] if found else None
+
+    def __getitem__(self, key: tuple[int, int]) -> LedgerBill:
+        """ Return the bill of the (month, year) billing cycle <key>.
+        """
+        row = self.get_row(*key)
+        if row is None:
+            raise KeyError(key)
+        return LedgerBill(self.ledger, row)
+
+    def __setitem__(self, key: tuple[int, int], bill: Bill) -> None:
+        """ Set the bill of the (month, year) billing cycle <key> to a copy of
+        <bill>, in the row of the ledger this line already has for that
+        billing cycle, if any, or in a new row otherwise.
+        """
+        row = self.get_row(*key)
+        if row is None:
+            self.add_bill(key[0], key[1], bill)
+        elif not (isinstance(bill, LedgerBill) and
+                  bill.is_same_bill(LedgerBill(self.ledger, row))):
+            self.ledger.set_bill(row, bill)
+
+    def __delitem__(self, key: tuple[int, int]) -> None:
+        """ Delete the bill of the (month, year) billing cycle <key>, and
+        remove it from the ledger.
+        """
+        position, found = self._find(*key)
+        if not found:
+            raise KeyError(key)
+        self.ledger.remove_bill(self._rows[position])
+        del self._keys[position]
+        del self._rows[position]
+
+    def __contains__(self, key: object) -> bool:
+        """ Return whether there is a bill for the (month, year) billing cycle
+        <key>.
+        """
+        return isinstance(key, tuple) and len(key) == 2 and \
+            self._find(*key)[1]
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        """ Return an iterator over the (month, year) billing cycles of the
+        bills, in chronological order.
+        """
+        for key in self._keys:
+            year, month = divmod(key, 12)
+            yield month + 1, year
+
+    def __len__(self) -> int:
+        """ Return the number of bills of this line.
+        """
+        return len(self._keys)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'array', 'bisect', 'bill'
+        ],
+        'disable': ['W0212'],
+        'generated-members': 'pygame.*'
+    })
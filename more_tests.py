@@ -1,15 +1,39 @@
 import datetime
 import pytest
 import json
+import os
+import random
+import pickle
+import subprocess
+import sys
+import application
 
-from application import create_customers, process_event_history
-from typing import List, Dict
+from application import create_customers, process_event_history, \
+    import_customers, stream_events, process_event_stream, \
+    find_customer_by_number, process_event_store, \
+    process_event_history_parallel, process_new_events, update_checkpoint, \
+    load_customers, process_event_history_batch, new_month
+from snapshot import save_snapshot, load_snapshot
+from synthetic import generate_customers, generate_dataset, generate_events, \
+    write_dataset
+from checkpoint import Watermark, save_checkpoint, load_checkpoint
+from eventstore import EventStore, convert_dataset
+from registry import registry_for
+from eventlog import decode_timestamp, iter_entries, TIME_FORMAT
+from typing import List, Dict, Tuple
 from customer import Customer
 from contract import TermContract, MTMContract, PrepaidContract
 from phoneline import PhoneLine
-from filter import DurationFilter, CustomerFilter, ResetFilter, LocationFilter
+from filter import DurationFilter, CustomerFilter, ResetFilter, LocationFilter, \
+    SCAN_RATIO, valid_location
 from bill import Bill
 from call import Call
+from callhistory import CallUsage
+from columnar import ColumnarCallHistory
+from ledger import BillLedger, LineBills
+from pipeline import FilterPipeline
+from callindex import DurationIndex
+from callset import CallSpace, space_for
 
 
 def test_task1_2_simple() -> None:
@@ -218,6 +242,20 @@ def import_data() -> Dict[str, List[Dict]]:
     return log
 
 
+def load_calls(log: Dict[str, List[Dict]]) \
+        -> Tuple[List[Customer], List[Call]]:
+    """ Return the customers of <log>, after processing all its events, and
+    the list of all their calls, in the reverse of the order ResetFilter
+    returns them in, so that the filters are not given the calls in the order
+    of the customers.
+    """
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    data = ResetFilter().apply(customers, [], '')
+    data.reverse()
+    return customers, data
+
+
 test_dict_small = {'events': [
     {"type": "call",
      "src_number": "111-1111",
@@ -327,5 +365,881 @@ test_dict_medium = {'events': [
     ]
 }
 
+
+def test_entry_offsets(tmp_path) -> None:
+    path = str(tmp_path / 'log.json')
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write('{"names": ["\u00e9t\u00e9"],\r\n "events": '
+                   '[{"a": "\u00e9"},\r\n {"b": 2}, 3]}')
+    entries = list(iter_entries(path, 'events', buffer_size=4))
+    assert [entry for _, entry in entries] == [{'a': '\u00e9'}, {'b': 2}, 3]
+    for i, (offset, _) in enumerate(entries):
+        assert list(iter_entries(path, 'events', offset, 4)) == entries[i:]
+    with pytest.raises(ValueError):
+        list(iter_entries(path, 'events', entries[0][0] + 1))
+
+
+def test_stream_events_matches_import() -> None:
+    log = import_data()
+    assert list(stream_events(buffer_size=100)) == log['events']
+    assert import_customers()['customers'] == log['customers']
+
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    streamed = create_customers(import_customers())
+    process_event_stream(stream_events(buffer_size=100), streamed)
+    for expected, actual in zip(customers, streamed):
+        for month in range(1, 13):
+            assert expected.generate_bill(month, 2018) == \
+                   actual.generate_bill(month, 2018)
+
+
+def test_phone_registry() -> None:
+    customers = create_customers(test_dict_medium)
+    registry = registry_for(customers)
+    assert registry is customers[1].get_registry()
+    customer, line = registry.lookup('555-5555')
+    assert customer is customers[1]
+    assert line.get_number() == '555-5555'
+    assert find_customer_by_number('111-1111', customers) is customers[0]
+
+    customers[1].new_month(1, 2018)
+    assert customers[1].cancel_phone_line('555-5555') == pytest.approx(50)
+    assert registry.lookup('555-5555') is None
+    assert find_customer_by_number('555-5555', customers) is None
+    customers[1].add_phone_line(
+        PhoneLine('777-7777', MTMContract(datetime.date(2017, 12, 25))))
+    assert registry.find_customer('777-7777') is customers[1]
+    assert registry.get_customer(8888) is customers[0]
+
+    # customers built by hand, or only some of the customers, are scanned,
+    # and keep their registry
+    customer = Customer(1234)
+    customer.add_phone_line(
+        PhoneLine('123-4567', MTMContract(datetime.date(2017, 12, 25))))
+    assert find_customer_by_number('123-4567', [customer]) is customer
+    assert customer.get_registry() is None
+    assert find_customer_by_number('777-7777', customers[1:]) is customers[1]
+    assert find_customer_by_number('111-1111', customers[1:]) is None
+    new_month(customers[1:], 2, 2018)
+    assert registry_for(customers[1:]) is not registry
+    assert all(c.get_registry() is registry for c in customers)
+    assert registry.lookup('777-7777')[1].get_bill(2, 2018) is not None
+
+
+def test_decode_timestamp() -> None:
+    for event in import_data()['events']:
+        assert decode_timestamp(event['time']) == \
+               datetime.datetime.strptime(event['time'], TIME_FORMAT)
+
+
+def test_event_store(tmp_path) -> None:
+    log = import_data()
+    path = str(tmp_path / 'dataset.events')
+    assert convert_dataset('dataset.json', path) == len(log['events'])
+
+    with EventStore(path) as store:
+        assert len(store) == len(log['events'])
+        assert store.get_customer_data() == {'customers': log['customers']}
+        event = log['events'][1]
+        assert store.numbers[store.src_ids[1]] == event['src_number']
+        assert store.durations[1] == event['duration']
+        assert store.get_time(1) == decode_timestamp(event['time'])
+        assert (store.dst_lon[1], store.dst_lat[1]) == tuple(event['dst_loc'])
+
+        customers = create_customers(log)
+        process_event_history(log, customers)
+        stored = create_customers(store.get_customer_data())
+        process_event_store(store, stored)
+    for expected, actual in zip(customers, stored):
+        assert [len(calls) for calls in expected.get_history()] == \
+               [len(calls) for calls in actual.get_history()]
+        for month in range(1, 13):
+            assert expected.generate_bill(month, 2018) == \
+                   actual.generate_bill(month, 2018)
+
+    # truncated or corrupt files are rejected
+    with open(path, 'rb') as file:
+        data = file.read()
+    broken = str(tmp_path / 'broken.events')
+    for corrupt in [b'', data[:10], data[:-8],
+                    data[:40] + b'x' * (len(data) - 40)]:
+        with open(broken, 'wb') as file:
+            file.write(corrupt)
+        with pytest.raises(ValueError):
+            EventStore(broken)
+
+
+def test_parallel_billing() -> None:
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    parallel = create_customers(log)
+    process_event_history_parallel(log, parallel, workers=3)
+
+    for expected, actual in zip(customers, parallel):
+        assert [[str(call) for call in calls]
+                for calls in expected.get_history()] == \
+               [[str(call) for call in calls]
+                for calls in actual.get_history()]
+        for month in range(1, 13):
+            assert expected.generate_bill(month, 2018) == \
+                   actual.generate_bill(month, 2018)
+        # the contracts were advanced identically
+        for number in expected.get_phone_numbers():
+            assert expected.cancel_phone_line(number) == \
+                   actual.cancel_phone_line(number)
+
+    # each call is the same object at both ends
+    outgoing = {id(call) for customer in parallel
+                for call in customer.get_history()[0]}
+    assert all(id(call) in outgoing for customer in parallel
+               for call in customer.get_history()[1])
+
+    for workers in [0, -2]:
+        with pytest.raises(ValueError):
+            process_event_history_parallel(log, create_customers(log),
+                                           workers)
+
+
+def test_incremental_ingestion(tmp_path) -> None:
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+
+    # process the log in three runs, as events are appended to it, saving a
+    # checkpoint in between
+    path = str(tmp_path / 'state.pickle')
+    log_path = str(tmp_path / 'log.json')
+    incremental = create_customers(log)
+    watermark = Watermark()
+    for end in [700, 1500, len(log['events'])]:
+        with open(log_path, 'w') as file:
+            json.dump({'events': log['events'][:end]}, file)
+        process_new_events(log_path, incremental, watermark, buffer_size=100)
+        assert watermark.count == end
+        save_checkpoint(path, incremental, watermark)
+        incremental, watermark = load_checkpoint(path)
+    with open(log_path, 'rb') as file:
+        file.seek(watermark.offset)
+        assert json.JSONDecoder().raw_decode(file.read().decode())[0] == \
+               log['events'][-1]
+
+    for expected, actual in zip(customers, incremental):
+        assert [len(calls) for calls in expected.get_history()] == \
+               [len(calls) for calls in actual.get_history()]
+        for month in range(1, 13):
+            assert expected.generate_bill(month, 2018) == \
+                   actual.generate_bill(month, 2018)
+
+    # a log which does not extend the processed events is rejected
+    with open(log_path, 'w') as file:
+        json.dump({'events': log['events'][1:]}, file)
+    with pytest.raises(ValueError):
+        process_new_events(log_path, incremental, watermark)
+
+    # nothing new to process the second time
+    path = str(tmp_path / 'dataset.pickle')
+    update_checkpoint(path)
+    updated = update_checkpoint(path)
+    assert load_checkpoint(path)[1] == watermark
+    assert updated[0].generate_bill(3, 2018) == customers[0].generate_bill(
+        3, 2018)
+
+
+def test_snapshot(tmp_path) -> None:
+    path = str(tmp_path / 'dataset.snapshot')
+    customers = load_customers(path)
+    restored = load_snapshot(path)
+    assert load_customers(path)[0].generate_bill(2, 2018) == \
+           customers[0].generate_bill(2, 2018)
+
+    for expected, actual in zip(customers, restored):
+        assert [[str(call) for call in calls]
+                for calls in expected.get_history()] == \
+               [[str(call) for call in calls]
+                for calls in actual.get_history()]
+        for month in range(1, 13):
+            assert expected.generate_bill(month, 2018) == \
+                   actual.generate_bill(month, 2018)
+    # the restored model keeps working: calls are registered in both ends
+    call = Call('938-6680', '674-6199', datetime.datetime(2018, 8, 30), 60,
+                (-79.5, 43.6), (-79.4, 43.7))
+    find_customer_by_number('938-6680', restored).make_call(call)
+    assert call in find_customer_by_number('938-6680', restored) \
+        .get_history()[0]
+
+    # corrupted snapshots are rejected
+    with open(path, 'r+b') as file:
+        file.seek(-1, 2)
+        file.write(b'?')
+    with pytest.raises(ValueError):
+        load_snapshot(path)
+
+
+def test_snapshot_call_space(tmp_path) -> None:
+    path = str(tmp_path / 'dataset.snapshot')
+    customers, data = load_calls(import_data())
+    customer_id = str(customers[0].get_id())
+    expected = len(CustomerFilter().apply(customers, data, customer_id))
+    space = space_for(customers)
+    assert len(CustomerFilter().bitmap(space, customer_id)) == expected
+    save_snapshot(path, customers)
+
+    restored = load_snapshot(path)
+    assert restored[0].get_registry().call_space is None
+    space = space_for(restored)
+    bitmap = CustomerFilter().bitmap(space, customer_id)
+    assert len(bitmap) == expected
+    assert len(bitmap.select(space.calls)) == expected
+
+
+def test_snapshot_round_trip(tmp_path) -> None:
+    path = str(tmp_path / 'synthetic.snapshot')
+    log = generate_dataset(3000, months=5, seed=13)
+    customers, data = load_calls(log)
+    save_snapshot(path, customers)
+    restored = load_snapshot(path)
+    restored_data = ResetFilter().apply(restored, [], '')[::-1]
+
+    def text(calls: List[Call]) -> List[str]:
+        return [str(call) for call in calls]
+
+    assert text(restored_data) == text(data)
+    for expected, actual in zip(customers, restored):
+        assert [text(calls) for calls in expected.get_history()] == \
+               [text(calls) for calls in actual.get_history()]
+        for month in range(1, 6):
+            assert expected.generate_bill(month, 2018) == \
+                   actual.generate_bill(month, 2018)
+
+    # the restored bills are still stored together
+    ledgers = {id(customer.get_phone_line(number).bills.ledger)
+               for customer in restored
+               for number in customer.get_phone_numbers()}
+    assert len(ledgers) == 1
+
+    # the filters give the same calls after the restore
+    queries = [(CustomerFilter(), str(customers[3].get_id())),
+               (DurationFilter(), 'R30-90'), (DurationFilter(), 'G300'),
+               (LocationFilter(), '-79.6, 43.6, -79.3, 43.75')]
+    for query, filter_string in queries:
+        assert text(query.apply(restored, restored_data, filter_string)) == \
+               text(query.apply(customers, data, filter_string))
+
+    # and both keep billing the same way
+    for model in [customers, restored]:
+        new_month(model, 6, 2018)
+        numbers = [customer.get_phone_numbers()[0] for customer in model[:2]]
+        find_customer_by_number(numbers[0], model).make_call(Call(
+            numbers[0], numbers[1], datetime.datetime(2018, 6, 3), 600,
+            (-79.5, 43.6), (-79.4, 43.7)))
+    for expected, actual in zip(customers, restored):
+        assert expected.generate_bill(6, 2018) == \
+               actual.generate_bill(6, 2018)
+
+
+def test_lazy_new_month() -> None:
+    customers = create_customers(test_dict_medium)
+    eager = create_customers(test_dict_medium)
+    registry = registry_for(customers)
+    for month in [1, 2, 3]:
+        registry.advance(month, 2018)
+        for customer in eager:
+            customer.new_month(month, 2018)
+
+    # no bill is created until the line is used
+    line = registry.lookup('666-6666')[1]
+    assert line._bills == {}
+    assert line.get_bill(3, 2018) == \
+           registry_for(eager).lookup('666-6666')[1].get_bill(3, 2018)
+    assert len(line._bills) == 3
+    for lazy_customer, eager_customer in zip(customers, eager):
+        for month in [1, 2, 3]:
+            assert lazy_customer.generate_bill(month, 2018) == \
+                   eager_customer.generate_bill(month, 2018)
+
+
+def test_synthetic_dataset(tmp_path) -> None:
+    log = generate_dataset(1200, months=6, seed=7)
+    assert log == generate_dataset(1200, months=6, seed=7)
+    assert log != generate_dataset(1200, months=6, seed=8)
+    assert len(log['events']) == 1200
+    times = [event['time'] for event in log['events']]
+    assert times == sorted(times)
+    assert {time[:7] for time in times} == {f'2018-0{m}' for m in range(1, 7)}
+
+    path = str(tmp_path / 'synthetic.json')
+    write_dataset(path, 1200, months=6, seed=7)
+    assert application.import_data(path) == log
+
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    calls = ResetFilter().apply(customers, [], '')
+    assert len(calls) == sum(event['type'] == 'call'
+                             for event in log['events'])
+
+    for num_events, months in [(3, 12), (0, 1), (5, 0)]:
+        with pytest.raises(ValueError):
+            generate_dataset(num_events, months=months)
+
+    # the events need at least two phone lines
+    customers = [{'id': 1, 'lines': [{'number': '111-1111',
+                                      'contract': 'mtm'}]}]
+    with pytest.raises(ValueError):
+        generate_events(customers, 12, 12, random.Random(0))
+    with pytest.raises(ValueError):
+        generate_events([], 12, 12, random.Random(0))
+    seed = next(seed for seed in range(100)
+                if len(generate_customers(1, random.Random(seed))[0]['lines'])
+                == 1)
+    with pytest.raises(ValueError):
+        write_dataset(str(tmp_path / 'lonely.json'), 100, num_customers=1,
+                      seed=seed)
+    assert not os.path.exists(str(tmp_path / 'lonely.json'))
+
+
+def test_lazy_drawables() -> None:
+    first = Call('111-1111', '222-2222', datetime.datetime(2018, 1, 1), 60,
+                 (-79.5, 43.6), (-79.4, 43.7))
+    second = Call('222-2222', '111-1111', datetime.datetime(2018, 1, 2), 60,
+                  (-79.4, 43.7), (-79.5, 43.6))
+    assert first._drawables is None and first._connection is None
+
+    drawables = first.get_drawables()
+    assert first.get_drawables() is drawables
+    assert drawables[0].get_position() == (-79.5, 43.6)
+    assert first.get_connection().get_linelimits() == \
+           ((-79.5, 43.6), (-79.4, 43.7))
+    # each sprite file is loaded once, and shared by all calls
+    assert second.get_drawables()[0].sprite is drawables[0].sprite
+    assert second.get_drawables()[1].sprite is drawables[1].sprite
+    assert drawables[0].sprite is not drawables[1].sprite
+
+
+def test_compact_call() -> None:
+    call = Call(''.join('111-1111'), '222-2222',
+                datetime.datetime(2018, 1, 1), 60, (-79.5, 43.6),
+                (-79.4, 43.7))
+    assert not hasattr(call, '__dict__')
+    assert call.src_number is Call('111-1111', '333-3333', call.time, 1,
+                                   call.src_loc, call.dst_loc).src_number
+    call.get_drawables()
+    copy = pickle.loads(pickle.dumps(call))
+    assert str(copy) == str(call)
+    assert copy.get_bill_date() == (1, 2018)
+    assert copy._drawables is None
+
+
+def test_headless_imports() -> None:
+    code = ('import sys, application, filter, customer, phoneline, contract, '
+            'bill, callhistory, call, parallel, snapshot, registry; '
+            'assert not {"pygame", "tkinter", "visualizer"} & '
+            'set(sys.modules)')
+    subprocess.run([sys.executable, '-c', code], check=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_columnar_call_history() -> None:
+    log = generate_dataset(2000, months=4, seed=3)
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    columnar = create_customers(log, ColumnarCallHistory)
+    process_event_history(log, columnar)
+
+    def text(calls: List[Call]) -> List[str]:
+        return [str(call) for call in calls]
+
+    for expected, actual in zip(customers, columnar):
+        for line, history in zip(expected.get_call_history(),
+                                 actual.get_call_history()):
+            assert list(line.outgoing_calls) == list(history.outgoing_calls)
+            assert list(line.incoming_calls) == list(history.incoming_calls)
+            for month in range(1, 6):
+                assert [text(calls) for calls in
+                        line.get_monthly_history(month, 2018)] == \
+                       [text(calls) for calls in
+                        history.get_monthly_history(month, 2018)]
+                outgoing, _ = history.get_monthly_view(month, 2018)
+                assert text(outgoing) == \
+                       text(line.outgoing_calls.get((month, 2018), []))
+                assert outgoing.durations.tolist() == \
+                       [call.duration for call in outgoing]
+                # views share the columns, they do not copy them
+                assert outgoing.durations.base is not None
+        assert expected.generate_bill(2, 2018) == actual.generate_bill(2, 2018)
+
+    # calls registered out of order are kept sorted
+    history = ColumnarCallHistory()
+    for day in [3, 1, 2, 40]:
+        history.register_outgoing_call(Call(
+            '111-1111', '222-2222', datetime.datetime(2018, 1, 1) +
+            datetime.timedelta(days=day), day, (0, 0), (0, 0)))
+    outgoing, incoming = history.get_monthly_view(1, 2018)
+    assert outgoing.durations.tolist() == [1, 2, 3]
+    assert [call.duration for call in outgoing[1:]] == [2, 3]
+    assert len(incoming) == 0
+    assert list(history.outgoing_calls) == [(1, 2018), (2, 2018)]
+
+    # the ranges of the months are the same as for the calls in order
+    for day in [75, 10, 45, -5, 40, 100, 0]:
+        history.register_outgoing_call(Call(
+            '111-1111', '222-2222', datetime.datetime(2018, 1, 1) +
+            datetime.timedelta(days=day), day, (0, 0), (0, 0)))
+    ordered = ColumnarCallHistory()
+    for day in sorted([3, 1, 2, 40, 75, 10, 45, -5, 40, 100, 0]):
+        ordered.register_outgoing_call(Call(
+            '111-1111', '222-2222', datetime.datetime(2018, 1, 1) +
+            datetime.timedelta(days=day), day, (0, 0), (0, 0)))
+    assert [(month, [call.duration for call in calls])
+            for month, calls in history.outgoing_calls.items()] == \
+           [(month, [call.duration for call in calls])
+            for month, calls in ordered.outgoing_calls.items()]
+
+
+def test_calls_between() -> None:
+    log = generate_dataset(2000, months=4, seed=5)
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    columnar = create_customers(log, ColumnarCallHistory)
+    process_event_history(log, columnar)
+    start = datetime.datetime(2018, 2, 10, 12, 30)
+    end = datetime.datetime(2018, 3, 3)
+
+    for customer, other in zip(customers, columnar):
+        outgoing, incoming = customer.get_history()
+        expected = tuple([str(call) for call in calls
+                          if start <= call.time < end]
+                         for calls in [outgoing, incoming])
+        for ranges in [customer.get_calls_between(start, end),
+                       other.get_calls_between(start, end)]:
+            actual = tuple([str(call) for call in calls] for calls in ranges)
+            assert sorted(actual[0]) == sorted(expected[0])
+            assert sorted(actual[1]) == sorted(expected[1])
+        times = [call.time for call in customer.get_calls_between(start)[0]]
+        assert times == sorted(times)
+        assert all(time >= start for time in times)
+        assert len(list(customer.get_calls_between()[1])) == len(incoming)
+        line = customer.get_call_history()[0]
+        assert list(line.get_calls_between(end, start)[0]) == []
+
+
+def test_call_usage() -> None:
+    log = generate_dataset(2000, months=4, seed=9)
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    columnar = create_customers(log, ColumnarCallHistory)
+    process_event_history(log, columnar)
+
+    def usage_of(calls: List[List[Call]]) -> Dict[str, int]:
+        usage = CallUsage()
+        for call in calls[0]:
+            usage.add_outgoing_call(call)
+        for call in calls[1]:
+            usage.add_incoming_call(call)
+        return usage.get_summary()
+
+    for customer, other in zip(customers, columnar):
+        assert customer.get_usage().get_summary() == \
+               usage_of(customer.get_history())
+        assert other.get_usage().get_summary() == \
+               usage_of(customer.get_history())
+        for month in range(1, 6):
+            monthly = ([], [])
+            for line in customer.get_call_history():
+                history = line.get_monthly_history(month, 2018)
+                monthly[0].extend(history[0])
+                monthly[1].extend(history[1])
+            assert customer.get_usage(month, 2018).get_summary() == \
+                   usage_of(monthly)
+            assert other.get_usage(month, 2018).get_summary() == \
+                   usage_of(monthly)
+
+    line = PhoneLine('111-1111', MTMContract(datetime.date(2017, 12, 25)))
+    line.make_call(Call('111-1111', '222-2222', datetime.datetime(2018, 1, 1),
+                        61, (0, 0), (0, 0)))
+    line.receive_call(Call('222-2222', '111-1111',
+                           datetime.datetime(2018, 1, 2), 60, (0, 0), (0, 0)))
+    assert line.get_usage(1, 2018).get_summary() == {
+        'outgoing_count': 1, 'outgoing_seconds': 61, 'outgoing_minutes': 2,
+        'incoming_count': 1, 'incoming_seconds': 60, 'incoming_minutes': 1}
+    # the usage returned is a copy
+    line.get_usage(1, 2018).add_usage(line.get_usage(1, 2018))
+    assert line.get_usage().outgoing_count == 1
+    assert line.get_usage(2, 2018).get_summary() == \
+           CallUsage().get_summary()
+
+
+def test_customer_line_index() -> None:
+    customer = Customer(1234)
+    numbers = [f'{n:03}-0000' for n in range(500, 0, -1)]
+    for number in numbers:
+        customer.add_phone_line(
+            PhoneLine(number, MTMContract(datetime.date(2017, 12, 25))))
+    customer.new_month(1, 2018)
+    assert customer.get_phone_numbers() == numbers
+
+    call = Call('250-0000', '001-0000', datetime.datetime(2018, 1, 5), 90,
+                (0, 0), (0, 0))
+    customer.make_call(call)
+    customer.receive_call(call)
+    assert customer.get_call_history('250-0000')[0].outgoing_calls == \
+           {(1, 2018): [call]}
+    assert customer.get_call_history('001-0000')[0].incoming_calls == \
+           {(1, 2018): [call]}
+    assert customer.get_call_history('999-9999') == []
+
+    assert customer.cancel_phone_line('250-0000') == \
+           pytest.approx(50 + 2 * 0.05)
+    assert customer.cancel_phone_line('250-0000') is None
+    assert '250-0000' not in customer and '251-0000' in customer
+    numbers.remove('250-0000')
+    assert customer.get_phone_numbers() == numbers
+    assert [line['number'] for line in customer.generate_bill(1, 2018)[2]] \
+           == numbers
+
+
+def test_cached_history() -> None:
+    customers = create_customers(test_dict_medium)
+    process_event_history(test_dict_medium, customers)
+    customer = customers[0]
+    history = customer.get_history()
+    assert customer.get_history() is history
+    assert isinstance(history[0], tuple) and isinstance(history[1], tuple)
+    assert ResetFilter().apply(customers, [], '')[:len(history[0])] == \
+           list(history[0])
+
+    # registering a call invalidates the cache
+    number = customer.get_phone_numbers()[0]
+    call = Call(number, number, datetime.datetime(2018, 1, 10), 30, (0, 0),
+                (0, 0))
+    customer.make_call(call)
+    assert customer.get_history() is not history
+    assert customer.get_history()[0].count(call) == 1
+    assert len(customer.get_history()[0]) == len(history[0]) + 1
+
+    # so do adding and cancelling a phone line
+    history = customer.get_history()
+    customer.add_phone_line(
+        PhoneLine('999-9999', MTMContract(datetime.date(2017, 12, 25))))
+    assert customer.get_history() is not history
+    assert customer.get_history() == history
+    history = customer.get_history()
+    customer.cancel_phone_line(number)
+    assert len(customer.get_history()[0]) < len(history[0])
+
+
+def test_batch_billing() -> None:
+    for log in [import_data(), generate_dataset(6000, months=20, seed=11)]:
+        customers = create_customers(log)
+        process_event_history(log, customers)
+        batch = create_customers(log)
+        process_event_history_batch(log, batch)
+        months = sorted({(int(event['time'][5:7]), int(event['time'][:4]))
+                         for event in log['events']})
+
+        for expected, actual in zip(customers, batch):
+            assert [[str(call) for call in calls]
+                    for calls in expected.get_history()] == \
+                   [[str(call) for call in calls]
+                    for calls in actual.get_history()]
+            for month, year in months:
+                assert expected.generate_bill(month, year) == \
+                       actual.generate_bill(month, year)
+            for number in expected.get_phone_numbers():
+                assert expected.cancel_phone_line(number) == \
+                       actual.cancel_phone_line(number)
+
+
+def test_bill_ledger() -> None:
+    ledger = BillLedger()
+    line1 = PhoneLine('111-1111', MTMContract(datetime.date(2018, 1, 1)),
+                      ledger=ledger)
+    line2 = PhoneLine('222-2222', TermContract(datetime.date(2018, 1, 1),
+                                               datetime.date(2019, 1, 1)),
+                      ledger=ledger)
+    for month in [1, 2, 3]:
+        line1.new_month(month, 2018)
+        line2.new_month(month, 2018)
+    line1.make_call(Call('111-1111', '222-2222',
+                         datetime.datetime(2018, 3, 2), 125, (0, 0), (0, 0)))
+    assert len(ledger) == 6
+    assert list(line1.bills) == [(1, 2018), (2, 2018), (3, 2018)]
+
+    bill = line1.bills[(3, 2018)]
+    assert bill.billed_min == 3
+    assert line1.get_bill(3, 2018)['total'] == pytest.approx(bill.get_cost())
+    bill.add_billed_minutes(2)
+    assert line1.bills[(3, 2018)].billed_min == 5
+
+    copy = PhoneLine('111-1111', MTMContract(datetime.date(2018, 1, 1)))
+    for key, other in line1.bills.items():
+        copy.bills[key] = other
+    assert copy.bills[(3, 2018)].get_summary() == bill.get_summary()
+    assert not copy.bills[(3, 2018)].is_same_bill(bill)
+    assert isinstance(bill.detach(), Bill)
+
+    # setting a bill reuses the row of its billing cycle, and deleting a bill
+    # removes its row
+    copy.bills[(3, 2018)] = Bill()
+    copy.bills[(4, 2018)] = bill
+    del copy.bills[(1, 2018)]
+    assert len(copy.bills.ledger) == 3
+    assert copy.bills[(3, 2018)].billed_min == 0
+    assert copy.bills[(4, 2018)].get_summary() == bill.get_summary()
+    line1.bills[(3, 2018)] = line1.bills[(3, 2018)]
+    assert line1.bills[(3, 2018)].is_same_bill(line1.contract.bill)
+    del line2.bills[(1, 2018)]
+    assert len(ledger) == 5
+    with pytest.raises(KeyError):
+        del line2.bills[(1, 2018)]
+
+    other = BillLedger()
+    line_ids = [other.add_line(number) for number in ledger.numbers]
+    assert other.add_rows(ledger.get_rows(0, 6), line_ids) == 0
+    assert len(other) == 5
+    assert other.get_line_id(1) == -1
+    assert other.get_total_cost(3, 2018) == ledger.get_total_cost(3, 2018)
+    line1.bills.add_row(3, 2018, line2.bills.get_row(3, 2018))
+    assert len(ledger) == 4
+
+
+def test_parallel_ledger_rows() -> None:
+    for months in [[], [(1, 2018), (2, 2018)]]:
+        sizes = []
+        for process in [process_event_history, process_event_history_parallel]:
+            log = import_data()
+            customers = create_customers(log)
+            for month, year in months:
+                new_month(customers, month, year)
+            process(log, customers)
+            for customer in customers:
+                customer.generate_bill(12, 2018)
+            registry = registry_for(customers)
+            sizes.append(len(registry.lookup('576-9648')[1].bills.ledger))
+        assert sizes[0] == sizes[1]
+
+
+def test_exact_money() -> None:
+    contract = MTMContract(datetime.date(2018, 1, 1))
+    bill = Bill()
+    contract.new_month(1, 2018, bill)
+    for _ in range(3):
+        contract.bill_call(gen_call(60))
+    assert bill.get_cost_mills() == 50150
+    assert bill.get_summary()['total'] == 50.15
+    assert bill.get_summary()['min_rate'] == 0.05
+
+    contract = PrepaidContract(datetime.date(2018, 1, 1), 100)
+    contract.new_month(1, 2018, Bill())
+    for _ in range(7):
+        contract.bill_call(gen_call(61))
+    assert contract.balance == -100000 + 7 * 2 * 25
+    assert contract.balance == contract.bill.get_cost_mills()
+
+    log = import_data()
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    ledger = registry_for(customers).lookup('576-9648')[1].bills.ledger
+    for month in range(1, 13):
+        mills = ledger.get_total_cost(month, 2018)
+        assert isinstance(mills, int)
+        total = sum(customer.generate_bill(month, 2018)[1]
+                    for customer in customers)
+        assert total == pytest.approx(mills / 1000)
+
+
+def test_parallel_total_cost() -> None:
+    totals = []
+    for process in [process_event_history, process_event_history_parallel]:
+        log = import_data()
+        customers = create_customers(log)
+        new_month(customers, 1, 2018)
+        process(log, customers)
+        ledger = registry_for(customers).lookup('576-9648')[1].bills.ledger
+        bills = [sum(customer.generate_bill(month, 2018)[1]
+                     for customer in customers) for month in range(1, 13)]
+        costs = [ledger.get_total_cost(month, 2018) for month in range(1, 13)]
+        assert bills == pytest.approx([cost / 1000 for cost in costs])
+        totals.append(costs)
+    assert totals[0] == totals[1]
+    assert totals[0][0] == -2066450
+
+    ledger = BillLedger()
+    bills = LineBills(ledger, ledger.add_line('111-1111'))
+    bills.add_bill(1, 2018).add_fixed_cost(1000)
+    bills.add_bill(1, 2018).add_fixed_cost(2000)
+    assert ledger.get_total_cost(1, 2018) == 2000
+    assert ledger.get_total_cost(2, 2018) == 0
+
+
+def test_customer_filter_order() -> None:
+    customers, data = load_calls(import_data())
+    customer = customers[0]
+    outgoing, incoming = customer.get_history()
+    expected = [call for call in data
+                if any(call is c for c in outgoing + incoming)]
+
+    result = CustomerFilter().apply(customers, data + data,
+                                    str(customer.get_id()))
+    assert [id(call) for call in result] == [id(call) for call in expected]
+    assert CustomerFilter().apply(customers[1:], data,
+                                  str(customer.get_id())) is data
+    assert CustomerFilter().apply(customers, data, '-1') is data
+
+    # as many customers, which do not all share the registry, are scanned
+    other = Customer(customer.get_id())
+    assert CustomerFilter().apply(customers[1:] + [other], data,
+                                  str(customer.get_id())) == []
+
+
+def test_duration_index() -> None:
+    customers, data = load_calls(import_data())
+    duration_filter = DurationFilter()
+
+    def expected(low: float, high: float) -> list:
+        return [id(call) for call in data if low <= call.duration <= high]
+
+    for filter_string, low, high in [('L50', 0, 49), ('G100', 101, 10 ** 6),
+                                     ('R30-300', 30, 300), ('r60-60', 60, 60),
+                                     ('R0-999', 0, 999)]:
+        result = duration_filter.apply(customers, data + [], filter_string)
+        assert [id(call) for call in result] == expected(low, high)
+        result = duration_filter.apply(customers, data, filter_string)
+        assert [id(call) for call in result] == expected(low, high)
+
+    for filter_string in ['R', 'R5', 'R-5', 'R300-30', 'R1-2-3', 'R1-1000',
+                          'L\u00b2', 'R1-\u00b2', 'G\u2155']:
+        assert duration_filter.apply(customers, data, filter_string) is data
+
+    # the index of the dataset is shared by all the filters and lists of
+    # calls, and the calls are returned in the order of the list
+    index = space_for(customers).get_index('duration', DurationIndex)
+    chunk = len(data) // 3
+    for start in range(0, len(data), chunk):
+        part = data[start:start + chunk]
+        result = DurationFilter().apply(customers, part, 'G100')
+        assert [id(call) for call in result] == \
+               [id(call) for call in part if call.duration > 100]
+    data.sort(key=lambda call: call.src_number)
+    result = DurationFilter().apply(customers, data, 'L50')
+    assert [id(call) for call in result] == expected(0, 49)
+    assert space_for(customers).get_index('duration', DurationIndex) is index
+    assert DurationFilter().apply(customers[1:], data, 'L50') == \
+           [call for call in data if call.duration < 50]
+
+
+def test_location_grid() -> None:
+    customers, data = load_calls(generate_dataset(3000, seed=5))
+    location_filter = LocationFilter()
+
+    rectangles = [(-79.5, 43.65, -79.45, 43.7),
+                  (-79.697878, 43.576959, -79.196382, 43.799568),
+                  (-79.6, 43.6, -79.59, 43.61), (-79.3, 43.7, -79.4, 43.6)]
+    for rectangle in rectangles:
+        lower_left, upper_right = rectangle[:2], rectangle[2:]
+        expected = [id(call) for call in data
+                    if valid_location(call.src_loc, lower_left, upper_right)
+                    or valid_location(call.dst_loc, lower_left, upper_right)]
+        filter_string = ', '.join(str(c) for c in rectangle)
+        for calls in [data + data, data]:
+            result = location_filter.apply(customers, calls, filter_string)
+            assert [id(call) for call in result] == expected
+
+    for filter_string in ['-79.5, 43.65, -79.45', 'a, b, c, d',
+                          '-80, 43.65, -79.45, 43.7',
+                          'nan, 43.6, -79.4, 43.7']:
+        assert location_filter.apply(customers, data, filter_string) is data
+
+    # a new filter for each query and each part of the calls, as in the
+    # visualizer, reuses the grid of the dataset until calls are added
+    space = space_for(customers)
+    grid = space.get_index('location', lambda calls: None)
+    filter_string = '-79.6, 43.6, -79.3, 43.75'
+    result = []
+    for start in range(0, len(data), 1000):
+        result.extend(LocationFilter().apply(customers,
+                                             data[start:start + 1000],
+                                             filter_string))
+    predicate = LocationFilter().compile(customers, filter_string)
+    assert result == [call for call in data if predicate(call)]
+    assert space_for(customers) is space
+    assert space.get_index('location', lambda calls: None) is grid
+    customers[0].make_call(Call(customers[0].get_phone_numbers()[0],
+                                customers[1].get_phone_numbers()[0],
+                                datetime.datetime(2018, 12, 31), 60,
+                                (-79.5, 43.66), (-79.5, 43.66)))
+    assert space_for(customers) is not space
+    assert len(space_for(customers)) == len(space) + 1
+
+    # a few calls are checked directly, without building the grid
+    space = space_for(customers)
+    part = data[:len(space) // SCAN_RATIO - 1]
+    assert LocationFilter().apply(customers, part, filter_string) == \
+           [call for call in part if predicate(call)]
+    assert space.get_index('location', lambda calls: None) is None
+
+
+def test_filter_pipeline() -> None:
+    customers, data = load_calls(generate_dataset(3000, seed=8))
+    customer_id = str(customers[3].get_id())
+
+    chains = [
+        [(DurationFilter(), 'G60'), (LocationFilter(),
+                                     '-79.6, 43.6, -79.3, 43.75')],
+        [(CustomerFilter(), customer_id), (DurationFilter(), 'R30-300'),
+         (DurationFilter(), 'bad'), (DurationFilter(), 'L250')],
+        [(DurationFilter(), 'L10'), (ResetFilter(), ''),
+         (CustomerFilter(), customer_id)],
+        [(LocationFilter(), 'x'), (CustomerFilter(), '0')],
+        [],
+    ]
+    for chain in chains:
+        expected = data + data
+        for filter_, filter_string in chain:
+            expected = filter_.apply(customers, expected, filter_string)
+        result = FilterPipeline(chain).apply(customers, data + data)
+        assert [id(call) for call in result] == \
+               [id(call) for call in expected]
+
+
+def test_call_bitmaps() -> None:
+    customers, data = load_calls(generate_dataset(3000, seed=9))
+    space = CallSpace(customers)
+    assert space.calls == data[::-1]
+
+    def ids(calls: list) -> set:
+        return {space.get_call_id(call) for call in calls}
+
+    specs = [(CustomerFilter(), str(customers[5].get_id())),
+             (DurationFilter(), 'G300'), (DurationFilter(), 'R10-20'),
+             (LocationFilter(), '-79.6, 43.6, -79.4, 43.7'),
+             (DurationFilter(), 'bad')]
+    bitmaps = []
+    for filter_, filter_string in specs:
+        bitmap = filter_.bitmap(space, filter_string)
+        assert set(bitmap.call_ids()) == \
+               ids(filter_.apply(customers, space.calls, filter_string))
+        bitmaps.append(bitmap)
+    sets = [set(bitmap.call_ids()) for bitmap in bitmaps]
+
+    query = bitmaps[0] | (bitmaps[1] & bitmaps[3])
+    assert set(query.call_ids()) == sets[0] | (sets[1] & sets[3])
+    assert set((~bitmaps[1]).call_ids()) == set(range(len(space))) - sets[1]
+    assert set((bitmaps[1] ^ bitmaps[3]).call_ids()) == sets[1] ^ sets[3]
+    assert set((bitmaps[3] - bitmaps[1]).call_ids()) == sets[3] - sets[1]
+    assert len(query) == len(sets[0] | (sets[1] & sets[3]))
+    assert bitmaps[4] == space.everything()
+    assert ~space.everything() == space.nothing()
+
+    assert [id(call) for call in query] == \
+           [id(call) for call in space.calls if call in query]
+    reversed_calls = space.calls[::-1]
+    assert [id(call) for call in query.select(reversed_calls)] == \
+           [id(call) for call in reversed_calls if call in query]
+    with pytest.raises(ValueError):
+        query & CallSpace(customers).everything()
+
+
 if __name__ == '__main__':
     pytest.main(['a1_shitchecker_v3.py'])
@@ -0,0 +1,249 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the parallel version of the billing of the event history.
+
+The bills of a phone line only depend on the calls made from that line, so
+the customers are split into partitions which are billed independently, each
+in its own process, through the usual PhoneLine.new_month and
+Contract.bill_call methods. The main process only splits the raw events by
+the partition of the line they were made from: each worker decodes the calls
+of its partition and bills them. The rows of the bills computed by the
+workers are then added to the BillLedger of the phone lines, their contracts
+are put back, and the decoded calls are recorded into the call histories, in
+chronological order, as a call is recorded at both ends, which may be in
+different partitions.
+"""
+import concurrent.futures
+import copy
+import os
+from typing import Optional, Union
+
+import eventlog
+from bill import Bill
+from call import Call
+from contract import Contract
+from customer import Customer
+from ledger import BillLedger, BillRows, LedgerBill
+from phoneline import PhoneLine
+from registry import registry_for
+
+# The state of a phone line sent to a worker: its number, its contract
+# (without its bill), its bills for the billing cycles of the events, and the
+# billing cycle of the bill of its contract among them, or a copy of that bill
+LineState = tuple[str, Contract, dict[tuple[int, int], Bill],
+                  Union[None, tuple[int, int], Bill]]
+# The state of a phone line returned by a worker: its contract (without its
+# bill), the billing cycle and row number of each of its bills in the rows
+# returned along with it, and the row number of the bill of its contract, or
+# that bill if it is not one of these rows
+BilledState = tuple[Contract, list[tuple[tuple[int, int], int]],
+                    Union[None, int, Bill]]
+
+
+def _line_state(line: PhoneLine, months: list[tuple[int, int]]) \
+        -> LineState:
+    """ Return the state of the phone <line> to be billed for the <months>,
+    with copies of its contract and bills outside of its BillLedger, so that
+    the whole ledger is not sent along with them to a worker.
+    """
+    contract = copy.copy(line.contract)
+    current = contract.bill
+    contract.bill = None
+    bills = {}
+    for key in months:
+        if key in line.bills:
+            bill = line.bills[key]
+            bills[key] = bill.detach()
+            if bill.is_same_bill(current):
+                current = key
+    if isinstance(current, LedgerBill):
+        current = current.detach()
+    return line.get_number(), contract, bills, current
+
+
+def _billed_state(line: PhoneLine) -> BilledState:
+    """ Return the state of the phone <line> billed by a worker.
+    """
+    contract = copy.copy(line.contract)
+    current = contract.bill
+    contract.bill = None
+    if isinstance(current, LedgerBill):
+        current = current.get_row()
+    bills = line.bills
+    return contract, [((month, year), bills.get_row(month, year))
+                      for month, year in bills], current
+
+
+def _decode_call(event: dict) -> Call:
+    """ Return a new Call object for the call <event>, in the format of the
+    "events" list of the dataset.
+    """
+    return Call(event['src_number'], event['dst_number'],
+                eventlog.decode_timestamp(event['time']), event['duration'],
+                tuple(event['src_loc']), tuple(event['dst_loc']))
+
+
+def _bill_partition(months: list[tuple[int, int]],
+                    lines: list[LineState],
+                    events: list[tuple[int, int, dict]]) \
+        -> tuple[BillRows, list[BilledState], list[Call]]:
+    """ Decode and bill the call <events> made from the phone <lines> of one
+    partition. Return the rows of the resulting bills, the resulting state of
+    each line, in order, and the calls decoded from the <events>, in order.
+
+    <months> is the sequence of (month, year) billing cycles of the whole event
+    history, and <events> contains the call events made from the <lines>, in
+    chronological order, each in a tuple with the index in <months> of its
+    billing cycle and the index in <lines> of the line it was made from.
+    """
+    ledger = BillLedger()
+    phone_lines = []
+    for number, contract, bills, current in lines:
+        line = PhoneLine(number, contract, ledger=ledger)
+        for key, bill in bills.items():
+            line.bills[key] = bill
+        if isinstance(current, tuple):
+            current = line.bills[current]
+        contract.bill = current
+        phone_lines.append(line)
+
+    calls = []
+    position = 0
+    for index, (month, year) in enumerate(months):
+        for line in phone_lines:
+            # advance every line, exactly as application.new_month does
+            line.new_month(month, year)
+        while position < len(events) and events[position][0] == index:
+            _, slot, event = events[position]
+            call = _decode_call(event)
+            phone_lines[slot].contract.bill_call(call)
+            calls.append(call)
+            position += 1
+    return ledger.get_rows(0, len(ledger)), \
+        [_billed_state(line) for line in phone_lines], calls
+
+
+def _merge_partition(lines: list[PhoneLine], rows: BillRows,
+                     states: list[BilledState]) -> None:
+    """ Put the <rows> of the bills and the <states> returned by a worker
+    back into the phone <lines> of its partition. The bills replaced by the
+    new rows are removed from the ledgers.
+    """
+    firsts = {}
+    for line in lines:
+        ledger = line.bills.ledger
+        if id(ledger) not in firsts:
+            firsts[id(ledger)] = ledger.add_rows(
+                rows, [other.bills.line_id if other.bills.ledger is ledger
+                       else -1 for other in lines])
+    for line, (contract, bills, current) in zip(lines, states):
+        first = firsts[id(line.bills.ledger)]
+        for (month, year), row in bills:
+            line.bills.add_row(month, year, first + row)
+        if isinstance(current, int):
+            current = line.bills.ledger.get_bill(first + current)
+        contract.bill = current
+        line.contract = contract
+
+
+def bill_in_parallel(events: list[dict], customer_list: list[Customer],
+                     workers: Optional[int] = None) -> None:
+    """ Register the calls from <events>, in the format of the "events" list
+    of the dataset, into the call history of the customers from
+    <customer_list> and bill them, using <workers> processes (as many as there
+    are CPUs if <workers> is None).
+
+    The resulting bills, contracts and call histories are identical to the
+    ones computed by application.process_calls() on the same events.
+
+    Raise a ValueError if <workers> is not a positive number.
+
+    Preconditions:
+    - <events> satisfies the preconditions of the "events" list of the log
+    dictionary given to application.process_event_history().
+    - The <customer_list> already contains all the customers from <events>.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f'cannot bill with {workers} workers')
+    registry = registry_for(customer_list)
+
+    # split the phone lines into partitions, keeping each customer's lines
+    # in the same partition
+    partitions = [[] for _ in range(workers)]
+    slots = {}
+    for position, customer in enumerate(customer_list):
+        partition = partitions[position % workers]
+        for number in customer.get_phone_numbers():
+            slots[number] = (position % workers, len(partition))
+            partition.append(registry.lookup(number)[1])
+
+    # the events are only split by the partition of the line they were made
+    # from here: they are decoded by the workers
+    months = []
+    month = None
+    batches = [[] for _ in partitions]
+    indices = [[] for _ in partitions]
+    for index, event in enumerate(events):
+        if event['time'][:7] != month:
+            month = event['time'][:7]
+            months.append((int(month[5:7]), int(month[:4])))
+        if event['type'] == 'call':
+            partition, slot = slots[event['src_number']]
+            batches[partition].append((len(months) - 1, slot, event))
+            indices[partition].append(index)
+    if not months:
+        return
+
+    # the process pool machinery is only loaded on first use (see
+    # concurrent.futures), which keeps importing this module cheap
+    calls = [None] * len(events)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) \
+            as executor:
+        futures = []
+        for i, partition in enumerate(partitions):
+            if partition:
+                lines = [_line_state(line, months) for line in partition]
+                futures.append((i, executor.submit(
+                    _bill_partition, months, lines, batches[i])))
+        for i, future in futures:
+            rows, states, partition_calls = future.result()
+            _merge_partition(partitions[i], rows, states)
+            for index, call in zip(indices[i], partition_calls):
+                calls[index] = call
+
+    # the calls are recorded in chronological order, as each call is
+    # recorded at both ends
+    for call in calls:
+        if call is not None:
+            registry.lookup(call.src_number)[1].get_call_history() \
+                .register_outgoing_call(call)
+            registry.lookup(call.dst_number)[1].get_call_history() \
+                .register_incoming_call(call)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'os', 'concurrent.futures', 'copy',
+            'eventlog', 'bill', 'call', 'contract', 'customer', 'ledger',
+            'phoneline', 'registry'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -11,11 +11,44 @@ any changes, are expressly prohibited.
 All of the files in this directory and all subdirectories are:
 Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
-from typing import Optional, Union
+import datetime
+from typing import Iterator, Optional, Union
 from call import Call
-from callhistory import CallHistory
-from bill import Bill
+from callhistory import CallHistory, CallUsage
 from contract import Contract
+from ledger import BillLedger, LineBills
+
+
+class BillingCalendar:
+    """ The sequence of monthly billing cycles which a group of phone lines has
+    been advanced to.
+
+    Advancing a calendar to a new month takes constant time: each phone line
+    following the calendar only starts the billing cycles it missed the next
+    time it is used (when a call is made or received, or when its bills or
+    contract are accessed).
+
+    === Public Attributes ===
+    cycles:
+         the (month, year) billing cycles, in the order they were started
+    """
+    cycles: list[tuple[int, int]]
+
+    def __init__(self) -> None:
+        """ Create a new BillingCalendar with no billing cycle.
+        """
+        self.cycles = []
+
+    def advance(self, month: int, year: int) -> None:
+        """ Start the billing cycle of <month> and <year>, for all the phone
+        lines following this calendar.
+        """
+        self.cycles.append((month, year))
+
+    def __len__(self) -> int:
+        """ Return the number of billing cycles started in this calendar.
+        """
+        return len(self.cycles)
 
 
 class PhoneLine:
@@ -29,7 +62,9 @@ class PhoneLine:
     bills:
          dictionary containing all the bills for this phoneline
          each key is a (month, year) tuple and the corresponding value is
-         the Bill object for that month+year date.
+         the Bill object for that month+year date. The bills are stored in a
+         BillLedger, which may be shared with other phone lines, and are
+         set or deleted through this LineBills dictionary.
     callhistory:
          call history for this phone line, represented as a CallHistory object
 
@@ -38,17 +73,76 @@ class PhoneLine:
     for dates that are encountered at least in one call from the input dataset.
     """
     number: str
-    contract: Contract
-    bills: dict[tuple[int, int], Bill]
     callhistory: CallHistory
+    # === Private Attributes ===
+    # _contract:
+    #     the value of <contract>
+    # _bills:
+    #     the value of <bills>
+    # _calendar:
+    #     the BillingCalendar this line follows, or None
+    # _synced:
+    #     the number of billing cycles of <_calendar> this line was advanced to
+    _contract: Contract
+    _bills: LineBills
+    _calendar: Optional[BillingCalendar]
+    _synced: int
 
-    def __init__(self, number: str, contract: Contract) -> None:
-        """ Create a new PhoneLine with <number> and <contract>.
+    def __init__(self, number: str, contract: Contract,
+                 callhistory: Optional[CallHistory] = None,
+                 ledger: Optional[BillLedger] = None) -> None:
+        """ Create a new PhoneLine with <number> and <contract>, which records
+        its calls in <callhistory> (a new, empty CallHistory by default) and
+        its bills in <ledger> (a new BillLedger by default).
         """
         self.number = number
-        self.contract = contract
-        self.callhistory = CallHistory()
-        self.bills = {}
+        self._contract = contract
+        if callhistory is None:
+            callhistory = CallHistory()
+        self.callhistory = callhistory
+        if ledger is None:
+            ledger = BillLedger()
+        self._bills = LineBills(ledger, ledger.add_line(number))
+        self._calendar = None
+        self._synced = 0
+
+    @property
+    def contract(self) -> Contract:
+        """ The current contract for this phone line.
+        """
+        self._catch_up()
+        return self._contract
+
+    @contract.setter
+    def contract(self, contract: Contract) -> None:
+        self._contract = contract
+
+    @property
+    def bills(self) -> LineBills:
+        """ All the bills for this phone line, by (month, year).
+        """
+        self._catch_up()
+        return self._bills
+
+    def follow(self, calendar: BillingCalendar) -> None:
+        """ Advance this phone line to every billing cycle started in
+        <calendar> from now on.
+        """
+        if calendar is not self._calendar:
+            self._catch_up()
+            self._calendar = calendar
+            self._synced = len(calendar)
+
+    def _catch_up(self) -> None:
+        """ Advance this phone line to the billing cycles started in the
+        calendar it follows since it was last advanced, in order.
+        """
+        if self._calendar is not None and \
+                self._synced < len(self._calendar):
+            missed = self._calendar.cycles[self._synced:]
+            self._synced = len(self._calendar)
+            for month, year in missed:
+                self._start_month(month, year)
 
     def new_month(self, month: int, year: int) -> None:
         """ Advance to a new month (specified by <month> and <year>) in the
@@ -56,9 +150,16 @@ class PhoneLine:
         If the new month+year does not already exist in the <bills> attribute,
         create a new bill.
         """
-        if (month, year) not in self.bills:
-            self.bills[(month, year)] = Bill()
-            self.contract.new_month(month, year, self.bills[(month, year)])
+        self._catch_up()
+        self._start_month(month, year)
+
+    def _start_month(self, month: int, year: int) -> None:
+        """ Advance to a new month, like new_month(), without first catching up
+        with the calendar this line follows.
+        """
+        if (month, year) not in self._bills:
+            self._contract.new_month(month, year,
+                                     self._bills.add_bill(month, year))
 
     def make_call(self, call: Call) -> None:
         """ Add the <call> to this phone line's callhistory, and bill it
@@ -135,6 +236,30 @@ class PhoneLine:
         """
         return self.callhistory.get_monthly_history(month, year)
 
+    def get_calls_between(self, start: Optional[datetime.datetime] = None,
+                          end: Optional[datetime.datetime] = None) \
+            -> tuple[Iterator[Call], Iterator[Call]]:
+        """ Return iterators over the calls this line has made and received at
+        or after <start> and before <end>, in chronological order, as a tuple
+        in this order: outgoing calls, incoming calls
+
+        A missing/None <start> or <end> leaves that side of the range open.
+        """
+        return self.callhistory.get_calls_between(start, end)
+
+    def get_usage(self, month: int = None, year: int = None) -> CallUsage:
+        """ Return the number and duration of the calls this line has made and
+        received during the <month> month of the <year> year, as a CallUsage,
+        in constant time.
+
+        If month and year are both None, then return the usage of all the
+        calls from the callhistory of this phone line.
+
+        Precondition: <month> and <year> are either both specified, or are both
+        missing/None
+        """
+        return self.callhistory.get_usage(month, year)
+
     def get_bill(self, month: int, year: int) \
             -> Optional[dict[str, Union[float, int]]]:
         """ Return a bill summary for the <month>+<year> billing cycle, as a
@@ -150,21 +275,33 @@ class PhoneLine:
         The values corresponding to each key represent the respective amounts.
         If no bill exists for this month+year, return None.
         """
-        if (month, year) not in self.bills:
+        bills = self.bills
+        row = bills.get_row(month, year)
+        if row is None:
             return None
 
-        bill_summary = self.bills[(month, year)].get_summary()
+        bill_summary = bills.ledger.get_summary(row)
         bill_summary['number'] = self.number
         return bill_summary
 
+    def get_bill_cost(self, month: int, year: int) -> Optional[int]:
+        """ Return the exact amount of the bill for the <month>+<year> billing
+        cycle, in mills, or None if no bill exists for this month+year.
+        """
+        bills = self.bills
+        row = bills.get_row(month, year)
+        if row is None:
+            return None
+        return bills.ledger.get_cost(row)
+
 
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing',
-            'call', 'callhistory', 'bill', 'contract'
+            'python_ta', 'typing', 'datetime',
+            'call', 'callhistory', 'contract', 'ledger'
         ],
         'generated-members': 'pygame.*'
     })
@@ -0,0 +1,131 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the FilterPipeline class, which applies a sequence of
+filters, each with the filter string a user would type for it, to a list of
+calls at once.
+
+Applying the filters one after another creates a new list of calls for each
+of them. Instead, the pipeline compiles the filters into predicates
+(see Filter.compile), and selects the calls matching all of them in a single
+pass, testing the most selective predicates first so that most calls are
+rejected after one test. The result is identical to the one of applying the
+filters one after another.
+"""
+from typing import Callable
+
+from call import Call
+from customer import Customer
+from filter import Filter, ResetFilter
+
+# The number of calls the selectivity of each predicate is estimated on
+SAMPLE_SIZE = 64
+
+
+class FilterPipeline:
+    """ A sequence of filters, applied to a list of calls together.
+
+    === Public Attributes ===
+    specs:
+         the filters, in the order they are applied, each with its filter
+         string
+    """
+    specs: list[tuple[Filter, str]]
+
+    def __init__(self, specs: list[tuple[Filter, str]]) -> None:
+        """ Create a pipeline applying the filters of <specs> in order, each
+        with its filter string.
+        """
+        self.specs = specs
+
+    def apply(self, customers: list[Customer], data: list[Call]) \
+            -> list[Call]:
+        """ Return the list of the calls from <data> which match all the
+        filters of this pipeline, as applying each filter to the calls
+        returned by the previous one would.
+
+        The filters are grouped into stages: a ResetFilter restarts from all
+        the calls of the <customers>, a filter which cannot be compiled is
+        applied on its own, and the filters between them are compiled, and
+        applied in a single pass.
+
+        Precondition:
+        - <customers> contains the list of all customers from the input dataset
+        - all calls included in <data> are valid calls from the input dataset
+        """
+        calls = data
+        predicates = []
+        for filter_, filter_string in self.specs:
+            if isinstance(filter_, ResetFilter):
+                # the filters before a reset have no effect on its result
+                predicates = []
+                calls = filter_.apply(customers, calls, filter_string)
+                continue
+            try:
+                predicate = filter_.compile(customers, filter_string)
+            except NotImplementedError:
+                calls = _select(calls, predicates)
+                predicates = []
+                calls = filter_.apply(customers, calls, filter_string)
+                continue
+            if predicate is not None:
+                predicates.append(predicate)
+        return _select(calls, predicates)
+
+
+def _selectivity(predicate: Callable[[Call], bool], sample: list[Call]) \
+        -> float:
+    """ Return the fraction of the calls of <sample> which match <predicate>.
+    """
+    return sum(1 for call in sample if predicate(call)) / len(sample)
+
+
+def _select(calls: list[Call],
+            predicates: list[Callable[[Call], bool]]) -> list[Call]:
+    """ Return the calls of <calls> which match all the <predicates>, once
+    each, in order, or <calls> itself if there are no <predicates>.
+
+    The predicates are tested from the most selective to the least
+    selective, as estimated on an evenly spaced sample of the calls, and the
+    tests of a call stop at the first predicate it does not match.
+    """
+    if not predicates:
+        return calls
+    if len(predicates) > 1 and calls:
+        sample = calls[::max(1, len(calls) // SAMPLE_SIZE)]
+        predicates = sorted(predicates,
+                            key=lambda p: _selectivity(p, sample))
+    first = predicates[0]
+    others = predicates[1:]
+
+    seen = set()
+    selected = []
+    for call in calls:
+        if first(call) and all(predicate(call) for predicate in others) \
+                and id(call) not in seen:
+            seen.add(id(call))
+            selected.append(call)
+    return selected
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'call', 'customer', 'filter'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,205 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the PhoneRegistry class, an index from every phone number
+of the dataset to the customer and phone line that own it, so that the owner
+of a number can be found without scanning all the customers.
+
+The registry also holds the BillingCalendar followed by all the registered
+phone lines, so that they can all be advanced to a new month at once.
+"""
+from typing import TYPE_CHECKING, Optional
+from customer import Customer
+from phoneline import BillingCalendar, PhoneLine
+
+if TYPE_CHECKING:
+    from callset import CallSpace
+
+
+class PhoneRegistry:
+    """ An index of the customers of MewbileTech and their phone lines.
+
+    Customers created with a registry keep it up to date themselves, whenever
+    one of their phone lines is added or cancelled.
+
+    A detached registry only indexes customers which keep their own registry
+    (or none): its phone lines do not follow its calendar, and are advanced to
+    a new month right away by advance(). It is not kept up to date by the
+    customers, so it must only be used while they are not changed.
+
+    === Public Attributes ===
+    calendar:
+         the billing cycles started for all the registered phone lines
+    call_space:
+         the CallSpace of the calls of the registered customers, with the
+         lines version of this registry it was created for, as kept by
+         callset.space_for(), or None
+    """
+    calendar: BillingCalendar
+    call_space: Optional[tuple[int, 'CallSpace']]
+    # === Private Attributes ===
+    # _lines:
+    #     maps each registered phone number to a tuple containing the
+    #     Customer who owns it and the corresponding PhoneLine
+    # _customers:
+    #     maps the id of each registered customer to that Customer
+    # _detached:
+    #     whether this registry is detached
+    # _lines_version:
+    #     the number of times a phone line was registered or unregistered
+    _lines: dict[str, tuple[Customer, PhoneLine]]
+    _customers: dict[int, Customer]
+    _detached: bool
+    _lines_version: int
+
+    def __init__(self, detached: bool = False) -> None:
+        """ Create an empty PhoneRegistry, which is <detached> or not.
+        """
+        self._lines = {}
+        self._customers = {}
+        self._detached = detached
+        self._lines_version = 0
+        self.calendar = BillingCalendar()
+        self.call_space = None
+
+    def __getstate__(self) -> dict:
+        """ Return the state of this registry to be pickled. The CallSpace is
+        left out, as it refers to the calls by their id(), which changes when
+        they are unpickled: it is created again when needed.
+        """
+        state = self.__dict__.copy()
+        state['call_space'] = None
+        return state
+
+    def add_customer(self, customer: Customer) -> None:
+        """ Register the <customer>, without any of its phone lines.
+        """
+        self._customers[customer.get_id()] = customer
+
+    def register(self, customer: Customer, line: PhoneLine) -> None:
+        """ Record that the phone <line> is owned by <customer>, and make the
+        <line> follow the calendar of this registry.
+        """
+        self._customers[customer.get_id()] = customer
+        self._lines[line.get_number()] = (customer, line)
+        self._lines_version += 1
+        if not self._detached:
+            line.follow(self.calendar)
+
+    def advance(self, month: int, year: int) -> None:
+        """ Advance all the registered phone lines to a new month (specified by
+        <month> and <year>).
+
+        This takes constant time: each line catches up with the new month the
+        next time it is used. In a detached registry, each line is advanced
+        right away instead.
+        """
+        self.calendar.advance(month, year)
+        if self._detached:
+            for _, line in self._lines.values():
+                line.new_month(month, year)
+
+    def unregister(self, number: str) -> None:
+        """ Remove the phone line with <number> from this registry, if it is
+        registered.
+        """
+        if self._lines.pop(number, None) is not None:
+            self._lines_version += 1
+
+    def lookup(self, number: str) -> Optional[tuple[Customer, PhoneLine]]:
+        """ Return the Customer owning the phone <number> and the corresponding
+        PhoneLine, as a tuple. Return None if <number> is not registered.
+        """
+        return self._lines.get(number)
+
+    def find_customer(self, number: str) -> Optional[Customer]:
+        """ Return the Customer owning the phone <number>, or None if <number>
+        is not registered.
+        """
+        entry = self._lines.get(number)
+        if entry is None:
+            return None
+        return entry[0]
+
+    def get_customer(self, cid: int) -> Optional[Customer]:
+        """ Return the registered Customer with the <cid> id, or None if there
+        is no such customer.
+        """
+        return self._customers.get(cid)
+
+    def get_lines_version(self) -> int:
+        """ Return the number of times a phone line was registered or
+        unregistered in this registry, which changes whenever its phone lines
+        do.
+        """
+        return self._lines_version
+
+    def get_customer_count(self) -> int:
+        """ Return the number of customers in this registry.
+        """
+        return len(self._customers)
+
+    def __contains__(self, number: str) -> bool:
+        """ Check if the phone <number> is registered.
+        """
+        return number in self._lines
+
+    def __len__(self) -> int:
+        """ Return the number of phone lines in this registry.
+        """
+        return len(self._lines)
+
+
+def shared_registry(customers: list[Customer]) -> Optional[PhoneRegistry]:
+    """ Return the PhoneRegistry shared by all the <customers>, and by no other
+    customer, or None if there is no such registry (e.g. the customers were
+    not created by the same call to create_customers, or are only some of
+    them).
+    """
+    registry = customers[0].get_registry() if customers else None
+    if registry is None or registry.get_customer_count() != len(customers) \
+            or any(c.get_registry() is not registry for c in customers):
+        return None
+    return registry
+
+
+def registry_for(customers: list[Customer]) -> PhoneRegistry:
+    """ Return the PhoneRegistry shared by all the <customers>, and by no other
+    customer.
+
+    If there is no such registry, return a new detached registry of the
+    <customers>, which is not given to them: they keep their own registry.
+    This takes time proportional to the number of phone lines, so lookups of
+    a single number should scan the customers instead.
+    """
+    registry = shared_registry(customers)
+    if registry is None:
+        registry = PhoneRegistry(detached=True)
+        for customer in customers:
+            registry.add_customer(customer)
+            for number in customer.get_phone_numbers():
+                registry.register(customer, customer.get_phone_line(number))
+    return registry
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'callset', 'customer', 'phoneline'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,106 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains the snapshots of the customer model: the whole state of
+the customers after the event history was processed (phone lines, contracts,
+bills and call histories), saved into a binary file which can be restored
+much faster than processing the event history again.
+
+A snapshot file contains a header (the magic bytes, the version of the
+format, the CRC-32 checksum and the size of the payload) followed by the
+payload, which is the pickled model.
+"""
+import os
+import pickle
+import struct
+import zlib
+from typing import Any
+
+from customer import Customer
+
+MAGIC = b'CVSNAP\r\n'
+# Incremented whenever the attributes of the saved objects change
+VERSION = 9
+
+# magic, version, CRC-32 of the payload, size of the payload
+_HEADER = struct.Struct('<8sHxxIQ')
+
+
+def write_snapshot(path: str, state: Any) -> None:
+    """ Save the <state> into the snapshot file <path>.
+
+    The file is replaced atomically, so an interrupted save never leaves a
+    corrupted snapshot behind.
+    """
+    payload = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, zlib.crc32(payload),
+                                len(payload)))
+        file.write(payload)
+    os.replace(temp_path, path)
+
+
+def read_snapshot(path: str) -> Any:
+    """ Return the state saved in the snapshot file <path>.
+
+    Raise a ValueError if <path> is not a snapshot written with the current
+    version of the format, or if it is truncated or corrupted.
+
+    Precondition: <path> comes from a trusted source.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < _HEADER.size:
+        raise ValueError(f'{path} is not a snapshot')
+    magic, version, checksum, size = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a snapshot')
+    if version != VERSION:
+        raise ValueError(f'{path} is a version {version} snapshot, '
+                         f'expected version {VERSION}')
+    payload = memoryview(data)[_HEADER.size:]
+    if len(payload) != size or zlib.crc32(payload) != checksum:
+        raise ValueError(f'{path} is corrupted')
+    return pickle.loads(payload)
+
+
+def save_snapshot(path: str, customers: list[Customer]) -> None:
+    """ Save the <customers>, with their phone lines, contracts, bills and
+    call histories, into the snapshot file <path>.
+    """
+    write_snapshot(path, customers)
+
+
+def load_snapshot(path: str) -> list[Customer]:
+    """ Return the customers saved in the snapshot file <path>, in the same
+    state as when they were saved.
+
+    Raise a ValueError if <path> is not a valid snapshot.
+    """
+    return read_snapshot(path)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'os', 'pickle', 'struct', 'zlib',
+            'customer'
+        ],
+        'allowed-io': ['write_snapshot', 'read_snapshot'],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,225 @@
+"""
+CSC148, Winter 2023
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2022 Bogdan Simion, Diane Horton, Jacqueline Smith
+
+=== Module Description ===
+
+This file contains a generator of synthetic datasets, in the same format as
+dataset.json, with any number of events.
+
+The generated data follows the distributions of the sample dataset: customers
+own 1 to 5 phone lines, with a mix of prepaid, month-to-month and term
+contracts; half of the events are calls, lasting 1 to 360 seconds; every
+event happens within the Toronto map. Some phone lines are much busier than
+others. Every month of the dataset has events, and the events are in
+chronological order.
+
+The same arguments (including the seed) always generate the same dataset.
+Datasets are written to their file incrementally, so they can be much larger
+than the available memory, e.g.:
+
+    python synthetic.py 1000000 dataset-1m.json
+"""
+import datetime
+import json
+import random
+import sys
+from itertools import accumulate
+from typing import Iterator, Optional
+
+# Map lower-left and upper-right corners (long, lat)
+MAP_LOWER_LEFT = (-79.697878, 43.576959)
+MAP_UPPER_RIGHT = (-79.196382, 43.799568)
+
+# Contract types, with their share of the phone lines
+CONTRACT_MIX = [('prepaid', 0.36), ('mtm', 0.36), ('term', 0.28)]
+
+# Share of the events which are calls (the others are SMS)
+CALL_RATIO = 0.5
+
+# Range of the duration of a call, in seconds
+MIN_DURATION = 1
+MAX_DURATION = 360
+
+# Default number of events per customer, as in the sample dataset
+EVENTS_PER_CUSTOMER = 40
+
+# First month of the generated datasets
+START = datetime.datetime(2018, 1, 1)
+
+# Number of events generated at once
+_BATCH_SIZE = 10000
+
+
+def generate_customers(num_customers: int, rng: random.Random) -> list[dict]:
+    """ Return <num_customers> random customers, in the format of the
+    "customers" list of the dataset, with distinct ids and phone numbers.
+    """
+    ids = rng.sample(range(10000, 10000 + 10 * num_customers), num_customers)
+    line_counts = [rng.randint(1, 5) for _ in range(num_customers)]
+    numbers = rng.sample(range(10 ** 7), sum(line_counts))
+    contracts = rng.choices([contract for contract, _ in CONTRACT_MIX],
+                            [share for _, share in CONTRACT_MIX],
+                            k=len(numbers))
+    customers = []
+    position = 0
+    for cid, count in zip(ids, line_counts):
+        lines = []
+        for number, contract in zip(numbers[position:position + count],
+                                    contracts[position:position + count]):
+            lines.append({'number': f'{number // 10000:03}-{number % 10000:04}',
+                          'contract': contract})
+        position += count
+        customers.append({'lines': lines, 'id': cid})
+    return customers
+
+
+def _month_start(month_index: int) -> datetime.datetime:
+    """ Return the start of the month <month_index> months after START.
+    """
+    year, month = divmod(START.month - 1 + month_index, 12)
+    return START.replace(year=START.year + year, month=month + 1)
+
+
+def _random_location(rng: random.Random) -> list[float]:
+    """ Return a random [longitude, latitude] location within the map.
+    """
+    return [rng.uniform(MAP_LOWER_LEFT[0], MAP_UPPER_RIGHT[0]),
+            rng.uniform(MAP_LOWER_LEFT[1], MAP_UPPER_RIGHT[1])]
+
+
+def generate_events(customers: list[dict], num_events: int, months: int,
+                    rng: random.Random) -> Iterator[dict]:
+    """ Yield <num_events> random events between the phone lines of
+    <customers>, in the format of the "events" list of the dataset, spread
+    evenly over <months> months in chronological order.
+
+    Raise a ValueError if there are fewer than <months> events, or fewer than
+    one month, as every month has at least one event, or if the <customers>
+    own fewer than two phone lines, as every event is between two lines.
+    """
+    if months < 1 or num_events < months:
+        raise ValueError(f'cannot spread {num_events} events over {months} '
+                         f'months')
+    line_count = sum(len(cust['lines']) for cust in customers)
+    if line_count < 2:
+        raise ValueError(f'cannot generate events between {line_count} '
+                         f'phone line(s)')
+    return _generate_events(customers, num_events, months, rng)
+
+
+def _generate_events(customers: list[dict], num_events: int, months: int,
+                     rng: random.Random) -> Iterator[dict]:
+    """ Yield the events returned by generate_events(<customers>,
+    <num_events>, <months>, <rng>).
+    """
+    numbers = [line['number'] for cust in customers for line in cust['lines']]
+    # heavy-tailed activity: a few lines make many more calls than the others
+    activity = list(accumulate(rng.lognormvariate(0, 1) for _ in numbers))
+
+    produced = 0
+    for month_index in range(months):
+        start = _month_start(month_index)
+        seconds = (_month_start(month_index + 1) - start).total_seconds()
+        count = num_events * (month_index + 1) // months - produced
+        step = seconds / count
+        produced += count
+
+        for first in range(0, count, _BATCH_SIZE):
+            size = min(_BATCH_SIZE, count - first)
+            sources = rng.choices(numbers, cum_weights=activity, k=size)
+            targets = rng.choices(numbers, k=size)
+            for i in range(size):
+                # one event per step, at a random time within its step
+                offset = int((first + i + rng.random()) * step)
+                event = {'type': 'sms', 'src_number': sources[i],
+                         'dst_number': targets[i],
+                         'time': str(start + datetime.timedelta(
+                             seconds=offset))}
+                while event['dst_number'] == event['src_number']:
+                    event['dst_number'] = rng.choice(numbers)
+                if rng.random() < CALL_RATIO:
+                    event['type'] = 'call'
+                    event['duration'] = rng.randint(MIN_DURATION,
+                                                    MAX_DURATION)
+                event['src_loc'] = _random_location(rng)
+                event['dst_loc'] = _random_location(rng)
+                yield event
+
+
+def generate_dataset(num_events: int, num_customers: Optional[int] = None,
+                     months: int = 12, seed: int = 0) \
+        -> dict[str, list[dict]]:
+    """ Return a random dataset with <num_events> events over <months> months,
+    in the same format as the one returned by application.import_data().
+
+    By default, there is one customer per EVENTS_PER_CUSTOMER events.
+
+    Raise a ValueError if the events cannot be generated (see
+    generate_events()), e.g. if a single customer owns a single phone line.
+    """
+    rng = random.Random(seed)
+    customers = generate_customers(
+        num_customers or _default_customers(num_events), rng)
+    return {'events': list(generate_events(customers, num_events, months,
+                                           rng)),
+            'customers': customers}
+
+
+def write_dataset(path: str, num_events: int,
+                  num_customers: Optional[int] = None, months: int = 12,
+                  seed: int = 0) -> None:
+    """ Write into the file <path> the same dataset as
+    generate_dataset(num_events, num_customers, months, seed), without holding
+    its events in memory.
+
+    Raise a ValueError if the events cannot be generated (see
+    generate_events()), before the file is created.
+    """
+    rng = random.Random(seed)
+    customers = generate_customers(
+        num_customers or _default_customers(num_events), rng)
+    events = generate_events(customers, num_events, months, rng)
+    with open(path, 'w') as file:
+        file.write('{"events": [')
+        separator = '\n'
+        for event in events:
+            file.write(separator)
+            file.write(json.dumps(event))
+            separator = ',\n'
+        file.write('\n], "customers": ')
+        json.dump(customers, file)
+        file.write('}\n')
+
+
+def _default_customers(num_events: int) -> int:
+    """ Return the default number of customers for <num_events> events.
+    """
+    return max(2, num_events // EVENTS_PER_CUSTOMER)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        write_dataset(sys.argv[2], int(sys.argv[1]))
+    else:
+        print('usage: python synthetic.py NUM_EVENTS OUTPUT_FILE')
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'datetime', 'json', 'random', 'sys',
+            'itertools'
+        ],
+        'allowed-io': ['write_dataset'],
+        'generated-members': 'pygame.*'
+    })